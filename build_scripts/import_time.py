@@ -0,0 +1,104 @@
+"""
+Report import time of the Lambda entry point modules using ``python -X importtime``.
+
+Every module is imported in a fresh interpreter, the way a cold Lambda container does it,
+and the modules with the highest cumulative and self time are listed. With ``--budget-ms``
+the script exits with an error when importing any entry point takes longer, so cold start
+regressions are caught by the build.
+
+Usage::
+
+    PYTHONPATH=python_exercise python build_scripts/import_time.py handler deployment_hooks --budget-ms 1500
+"""
+
+import argparse
+import os
+import subprocess  # nosec B404
+import sys
+from dataclasses import dataclass
+
+
+@dataclass
+class ModuleImport:
+    """Import time of a single module in microseconds"""
+
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure(module: str, repeat: int) -> list[ModuleImport]:
+    """
+    Import module in fresh interpreters and parse the importtime report
+    :param module: name of the module to import
+    :param repeat: number of runs, the fastest run of every module is reported
+    :return: import time of the module and everything it imported
+    """
+    best: dict[str, ModuleImport] = {}
+    for _ in range(repeat):
+        result = subprocess.run(  # nosec B603
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+            # module level boto3 clients need a region, as they have in Lambda
+            env={"AWS_DEFAULT_REGION": "us-east-1", **os.environ},
+        )
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:") :].split("|")
+            depth = (len(name) - len(name.lstrip())) // 2
+            entry = ModuleImport(name.strip(), int(self_us), int(cumulative_us), depth)
+            if entry.name not in best or entry.cumulative_us < best[entry.name].cumulative_us:
+                best[entry.name] = entry
+    return list(best.values())
+
+
+def report(module: str, imports: list[ModuleImport], top: int) -> float:
+    """
+    Print the most expensive imports of the module
+    :param module: name of the measured module
+    :param imports: import times of the module and its dependencies
+    :param top: number of modules to list
+    :return: total import time of the module in milliseconds
+    """
+    total_ms = next(entry.cumulative_us for entry in imports if entry.name == module) / 1000
+    print(f"\n{module}: {total_ms:.1f} ms")
+
+    print(f"  top {top} by cumulative time (direct dependencies of {module}):")
+    direct = [entry for entry in imports if entry.depth == 1]
+    for entry in sorted(direct, key=lambda entry: entry.cumulative_us, reverse=True)[:top]:
+        print(f"    {entry.cumulative_us / 1000:8.1f} ms  {entry.name}")
+
+    print(f"  top {top} by self time:")
+    for entry in sorted(imports, key=lambda entry: entry.self_us, reverse=True)[:top]:
+        print(f"    {entry.self_us / 1000:8.1f} ms  {entry.name}")
+    return total_ms
+
+
+def main():
+    """
+    Measure entry point modules given on command line
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("modules", nargs="*", default=["handler", "stream_handler", "deployment_hooks"])
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs, the fastest is reported")
+    parser.add_argument("--top", type=int, default=10, help="number of modules listed")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail when an import takes longer")
+    arguments = parser.parse_args()
+
+    over_budget = []
+    for module in arguments.modules:
+        total_ms = report(module, measure(module, arguments.repeat), arguments.top)
+        if arguments.budget_ms is not None and total_ms > arguments.budget_ms:
+            over_budget.append(f"{module} ({total_ms:.1f} ms)")
+
+    if over_budget:
+        print(f"\nImport time over budget of {arguments.budget_ms} ms: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
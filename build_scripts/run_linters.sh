@@ -13,3 +13,7 @@ pipenv run black --check .
 pipenv run pylint ${PACKAGE_DIR}
 pipenv run isort . --check --diff
 pipenv run pytest ${UNIT_TEST_RESULTS}
+# budgets are the measured import times (~700 ms for the API and stream handlers, ~230 ms for the hooks)
+# plus a margin for noise between runs
+pipenv run python build_scripts/import_time.py handler stream_handler --budget-ms 850
+pipenv run python build_scripts/import_time.py deployment_hooks --budget-ms 300
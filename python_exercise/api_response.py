@@ -0,0 +1,222 @@
+"""
+Building of API Gateway proxy responses.
+
+Headers are built once per container and bodies are serialised as compact JSON, with
+orjson when it is installed. Items read from our own table were validated when they were
+written, so in trusted mode they are serialised directly instead of being validated again
+by the Item model.
+"""
+
+import hashlib
+import json
+import math
+import re
+from decimal import Decimal
+from http import HTTPStatus
+from typing import Any, Iterable, Optional, Sequence
+
+from botocore.exceptions import ClientError
+
+from config import TRUSTED_DB_ITEMS
+from db import VERSION_FIELD
+from errors import ItemErrorBase
+from metrics import SERIALISATION, metrics
+from models import Headers, Item, ItemsBody, ListedItem, PartialItem
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+JSON_API_HEADERS = Headers(content_type="application/vnd.api+json").dict(by_alias=True)
+
+# Fields of the Item model, the only ones returned for items
+ITEM_FIELDS = tuple(Item.model_fields)
+
+# Fields returned for items in lists, so every listed item can be fetched and updated by its id
+LISTED_ITEM_FIELDS = tuple(ListedItem.model_fields)
+
+ETAG_HEADER = "ETag"
+RETRY_AFTER_HEADER = "Retry-After"
+
+# ETag built from the version of an item
+VERSION_ETAG = re.compile(r'^"v(\d+)"$')
+
+
+def json_default(value: Any) -> Any:
+    """
+    Serialise numbers DynamoDB returns as Decimal
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> str:
+    """
+    Serialise value as compact JSON
+    :param value: value to serialise
+    :return: JSON string
+    """
+    with metrics.stage(SERIALISATION):
+        if orjson is not None:
+            return orjson.dumps(value, default=json_default).decode()  # pylint: disable=no-member
+        return json.dumps(value, separators=(",", ":"), default=json_default)
+
+
+def build_response(status_code: HTTPStatus, body: str, headers: Optional[dict[str, str]] = None) -> dict:
+    """
+    Build API Gateway proxy response
+    :param status_code: HTTP status of the response
+    :param body: serialised body
+    :param headers: headers added to the default ones
+    :return: response
+    """
+    return {"statusCode": status_code, "headers": {**JSON_API_HEADERS, **(headers or {})}, "body": body}
+
+
+def not_modified_response(etag: str) -> dict:
+    """
+    Build response telling the client its copy of the item is still current
+    :param etag: ETag of the item
+    :return: response without body
+    """
+    return {"statusCode": HTTPStatus.NOT_MODIFIED, "headers": {ETAG_HEADER: etag}, "body": ""}
+
+
+def item_etag(item: dict) -> str:
+    """
+    Build strong ETag of item from its version, items stored before versions were added get a hash of their fields
+    :param item: item data read from database, only the version is needed for versioned items
+    :return: quoted ETag
+    """
+    version = item.get(VERSION_FIELD)
+    if version is not None:
+        return f'"v{version}"'
+    return f'"{hashlib.sha256(dumps(item_data(item, trusted=True)).encode()).hexdigest()[:32]}"'
+
+
+def etag_version(if_match: str) -> Optional[int]:
+    """
+    Get version of the item from If-Match header
+    :param if_match: value of the header, a strong ETag returned for the item or *
+    :return: the version, None for * which matches any version,
+        0 for ETags not built from a version, i.e. of items stored before versions were added
+    """
+    if if_match.strip() == "*":
+        return None
+    match = VERSION_ETAG.match(if_match.strip())
+    return int(match.group(1)) if match else 0
+
+
+def is_weak_etag(etag: str) -> bool:
+    """
+    Check whether the ETag is weak, weak ETags never satisfy If-Match which requires the strong comparison
+    :param etag: value of the header
+    """
+    return etag.strip().startswith("W/")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check If-None-Match header against ETag of the item, using the weak comparison the header requires
+    :param if_none_match: value of the header, a list of ETags or *
+    :param etag: ETag of the item
+    :return: whether the client has the current item
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def item_data(item: dict, trusted: bool = TRUSTED_DB_ITEMS, fields: Optional[Sequence[str]] = None) -> dict:
+    """
+    Select the fields of the Item model from item data
+    :param item: item data read from database
+    :param trusted: skip validation of the item
+    :param fields: fields of the Item model to select, all of them when None
+    :return: item data in the shape of the Item model, or of its selected fields
+    """
+    if trusted:
+        return {field: item[field] for field in fields or ITEM_FIELDS if field in item}
+    if fields:
+        return PartialItem(**{field: item[field] for field in fields if field in item}).dict(exclude_unset=True)
+    return Item(**item).dict()
+
+
+def item_body(item: dict, trusted: bool = TRUSTED_DB_ITEMS, fields: Optional[Sequence[str]] = None) -> str:
+    """
+    Serialise single item
+    :param item: item data read from database
+    :param trusted: skip validation of the item
+    :param fields: fields of the Item model to serialise, all of them when None
+    :return: JSON string
+    """
+    if trusted:
+        return dumps(item_data(item, trusted=True, fields=fields))
+    with metrics.stage(SERIALISATION):
+        if fields:
+            return PartialItem(**{field: item[field] for field in fields if field in item}).json(exclude_unset=True)
+        return Item(**item).json()
+
+
+def items_body(items: Iterable[dict], meta: dict, trusted: bool = TRUSTED_DB_ITEMS) -> str:
+    """
+    Serialise multiple items with their id, version and modification info
+    :param items: items data read from database
+    :param meta: meta information about the items
+    :param trusted: skip validation of the items
+    :return: JSON string
+    """
+    if trusted:
+        return dumps(
+            {"data": [item_data(item, trusted=True, fields=LISTED_ITEM_FIELDS) for item in items], "meta": meta}
+        )
+    with metrics.stage(SERIALISATION):
+        return ItemsBody(data=[ListedItem(**item) for item in items], meta=meta).json(exclude_unset=True)
+
+
+def error_context(request_id: str, status: HTTPStatus, code: Any, title: str, detail: Optional[str]) -> dict:
+    """
+    Build description of a single error
+    :param request_id: id of the request that failed
+    :param status: HTTP status of the error
+    :param code: error code
+    :param title: error title
+    :param detail: error description
+    :return: error object of the errors body
+    """
+    return {"id": request_id, "code": code, "title": title, "detail": detail, "status": str(status.value)}
+
+
+def item_error(request_id: str, error: ItemErrorBase) -> dict:
+    """
+    Build description of an error raised by the service
+    :param request_id: id of the request that failed
+    :param error: the error
+    :return: error object of the errors body
+    """
+    return error_context(request_id, error.http_code, error.code, error.title, error.msg)
+
+
+def item_error_response(request_id: str, error: ItemErrorBase) -> dict:
+    """
+    Build response for an error raised by the service
+    :param request_id: id of the request that failed
+    :param error: the error
+    :return: response
+    """
+    retry_after = getattr(error, "retry_after", None)
+    headers = {RETRY_AFTER_HEADER: str(max(1, math.ceil(retry_after)))} if retry_after is not None else None
+    return build_response(error.http_code, dumps({"errors": [item_error(request_id, error)]}), headers=headers)
+
+
+def client_error_response(request_id: str, error: ClientError) -> dict:
+    """
+    Build response for an unexpected error returned by AWS
+    :param request_id: id of the request that failed
+    :param error: the error
+    :return: response
+    """
+    errors = [error_context(request_id, HTTPStatus.BAD_REQUEST, 400, "Unknown error", error.args[0])]
+    return build_response(HTTPStatus.BAD_REQUEST, dumps({"errors": errors}))
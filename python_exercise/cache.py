@@ -0,0 +1,246 @@
+"""
+Read-through caches of items and of decoded identities shared by the invocations of a warm container.
+"""
+
+import base64
+import binascii
+import copy
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from config import IDENTITY_CACHE_SIZE, ITEM_CACHE_NEGATIVE_TTL, ITEM_CACHE_SIZE, ITEM_CACHE_TTL
+from db import ItemKeys, ItemType
+from metrics import IDENTITY_CACHE_HITS, IDENTITY_CACHE_MISSES, metrics
+
+# Value cached for items that do not exist
+NOT_FOUND = "__item_not_found__"
+
+
+class CacheBackend(ABC):
+    """
+    Storage used by ItemCache, implemented in process for now and by a shared cache later
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Read value from the cache
+        :param key: cache key
+        :return: cached value or None when the key is missing or expired
+        """
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float):
+        """
+        Store value in the cache
+        :param key: cache key
+        :param value: value to store
+        :param ttl: number of seconds the value is valid for
+        """
+
+    @abstractmethod
+    def delete(self, key: str):
+        """
+        Remove value from the cache
+        :param key: cache key
+        """
+
+    @abstractmethod
+    def clear(self):
+        """
+        Remove all values from the cache
+        """
+
+
+class InMemoryBackend(CacheBackend):
+    """
+    LRU cache with expiring entries kept in the memory of the container
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._values: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            cached = self._values.get(key)
+            if cached is None:
+                return None
+            if cached[1] <= time.monotonic():
+                del self._values[key]
+                return None
+            self._values.move_to_end(key)
+            return cached[0]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + ttl)
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class ItemCache:
+    """
+    Cache of item data keyed by the primary key of the item, so entries never leak between tenants
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, negative_ttl: float = 0):
+        """
+        :param backend: storage for cached items
+        :param ttl: number of seconds items are cached for
+        :param negative_ttl: number of seconds missing items are cached for, 0 disables caching them
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(item_type: ItemType, tenant_id: str, item_id: str) -> str:
+        return ItemKeys.get_keys(item_type, tenant_id, item_id).primary
+
+    def get(self, item_type: ItemType, tenant_id: str, item_id: str) -> Optional[Any]:
+        """
+        Read item from the cache
+        :param item_type: One of the types from ItemType
+        :param tenant_id: item tenant
+        :param item_id: item id
+        :return: item data, NOT_FOUND for items known not to exist or None on a cache miss
+        """
+        value = self.backend.get(self._key(item_type, tenant_id, item_id))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, item_type: ItemType, tenant_id: str, item_id: str, item_data: dict):
+        """
+        Store item in the cache
+        :param item_type: One of the types from ItemType
+        :param tenant_id: item tenant
+        :param item_id: item id
+        :param item_data: item data, a copy is stored so later changes by the caller are not cached
+        """
+        self.backend.set(self._key(item_type, tenant_id, item_id), copy.deepcopy(item_data), self.ttl)
+
+    def set_not_found(self, item_type: ItemType, tenant_id: str, item_id: str):
+        """
+        Remember that item does not exist, if negative caching is enabled
+        :param item_type: One of the types from ItemType
+        :param tenant_id: item tenant
+        :param item_id: item id
+        """
+        if self.negative_ttl > 0:
+            self.backend.set(self._key(item_type, tenant_id, item_id), NOT_FOUND, self.negative_ttl)
+
+    def invalidate(self, item_type: ItemType, tenant_id: str, item_id: str):
+        """
+        Remove item from the cache
+        :param item_type: One of the types from ItemType
+        :param tenant_id: item tenant
+        :param item_id: item id
+        """
+        self.backend.delete(self._key(item_type, tenant_id, item_id))
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get cache counters
+        :return: hits and misses since the container started
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        """
+        Drop all cached items and reset counters
+        """
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+
+item_cache = ItemCache(InMemoryBackend(ITEM_CACHE_SIZE), ITEM_CACHE_TTL, ITEM_CACHE_NEGATIVE_TTL)
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """
+    Read expiry of a JWT without verifying it
+    :param token: the token, optionally prefixed with Bearer
+    :return: the exp claim as epoch seconds, None when the token has none or can not be decoded
+    """
+    try:
+        payload = token.rsplit(" ", 1)[-1].split(".")[1]
+        exp = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))).get("exp")
+    except (IndexError, ValueError, binascii.Error, AttributeError):
+        return None
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+class IdentityCache:
+    """
+    Cache of identities decoded from bearer tokens, keyed by a hash of the token.
+    Every identity expires with its token, tokens without expiry are never cached.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        """
+        :param backend: storage for cached identities
+        """
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str, decode: Callable[[], Any]) -> Any:
+        """
+        Get identity of the token, decoding it on a cache miss
+        :param token: bearer token sent with the request
+        :param decode: decodes the identity from the request
+        :return: the identity
+        """
+        key = hashlib.sha256(token.encode()).hexdigest()
+        cached = self.backend.get(key)
+        # the expiry is checked again against the wall clock, the backend expires entries by the monotonic one
+        if cached is not None and cached[1] > time.time():
+            self.hits += 1
+            metrics.add_count(IDENTITY_CACHE_HITS)
+            return cached[0]
+
+        self.misses += 1
+        metrics.add_count(IDENTITY_CACHE_MISSES)
+        identity = decode()
+        expires_at = token_expiry(token)
+        if expires_at is not None and expires_at > time.time():
+            self.backend.set(key, (identity, expires_at), expires_at - time.time())
+        return identity
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get cache counters
+        :return: hits and misses since the container started
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        """
+        Drop all cached identities and reset counters
+        """
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+
+identity_cache = IdentityCache(InMemoryBackend(IDENTITY_CACHE_SIZE))
@@ -10,3 +10,118 @@ from os import getenv
 #     A string specifying the name of the DynamoDB table to use
 #     The table should exist in the specified deployment environment
 TABLE_NAME = getenv("DYNAMODB_TABLE", "python-exercise")
+
+# .. envvar:: RESTRICTED_ROLE
+#     The ARN of the role assumed to access the table on behalf of a tenant
+RESTRICTED_ROLE = getenv("RESTRICTED_ROLE", "")
+
+# .. envvar:: RESTRICTED_TABLE_CACHE_SIZE
+#     Maximum number of tenants whose restricted table handles are kept in a warm container
+RESTRICTED_TABLE_CACHE_SIZE = int(getenv("RESTRICTED_TABLE_CACHE_SIZE", "64"))
+
+# .. envvar:: RESTRICTED_TABLE_CACHE_TTL
+#     Lifetime in seconds of the credentials behind a restricted table handle when they do not report
+#     their expiry, matches the default duration of an assumed role session
+RESTRICTED_TABLE_CACHE_TTL = int(getenv("RESTRICTED_TABLE_CACHE_TTL", "3600"))
+
+# .. envvar:: RESTRICTED_TABLE_REFRESH_MARGIN
+#     Number of seconds before credential expiry at which a cached table handle is replaced
+RESTRICTED_TABLE_REFRESH_MARGIN = int(getenv("RESTRICTED_TABLE_REFRESH_MARGIN", "300"))
+
+# .. envvar:: ITEM_CACHE_SIZE
+#     Maximum number of items cached in a warm container
+ITEM_CACHE_SIZE = int(getenv("ITEM_CACHE_SIZE", "1024"))
+
+# .. envvar:: ITEM_CACHE_TTL
+#     Number of seconds items are cached for
+ITEM_CACHE_TTL = float(getenv("ITEM_CACHE_TTL", "60"))
+
+# .. envvar:: ITEM_CACHE_NEGATIVE_TTL
+#     Number of seconds items that were not found are cached for, 0 disables negative caching
+ITEM_CACHE_NEGATIVE_TTL = float(getenv("ITEM_CACHE_NEGATIVE_TTL", "0"))
+
+# .. envvar:: EVENT_PARSING_MODE
+#     "full" validates API Gateway events with the whole APIGatewayProxyEventModel,
+#     "light" validates only the parts of the event the handlers use
+EVENT_PARSING_MODE = getenv("EVENT_PARSING_MODE", "full").lower()
+
+# .. envvar:: IDEMPOTENCY_TTL
+#     Number of seconds a response is replayed for requests repeating its Idempotency-Key
+IDEMPOTENCY_TTL = int(getenv("IDEMPOTENCY_TTL", "86400"))
+
+# .. envvar:: IDENTITY_CACHE_SIZE
+#     Maximum number of decoded identities kept in a warm container, each until its token expires
+IDENTITY_CACHE_SIZE = int(getenv("IDENTITY_CACHE_SIZE", "256"))
+
+# .. envvar:: DB_MAX_ATTEMPTS
+#     Maximum number of attempts of a throttled DynamoDB request, fewer when the invocation runs out of time
+DB_MAX_ATTEMPTS = int(getenv("DB_MAX_ATTEMPTS", "4"))
+
+# .. envvar:: CIRCUIT_BREAKER_THRESHOLD
+#     Number of consecutive DynamoDB requests throttled after all attempts that open the circuit breaker
+CIRCUIT_BREAKER_THRESHOLD = int(getenv("CIRCUIT_BREAKER_THRESHOLD", "5"))
+
+# .. envvar:: CIRCUIT_BREAKER_RESET_TIMEOUT
+#     Number of seconds the circuit breaker fails requests fast before letting a trial request through
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "5"))
+
+# .. envvar:: TENANT_RATE_LIMIT
+#     Number of requests per second a tenant can send to the table, 0 disables the limit.
+#     A request costs one per item it reads or writes by id, other requests cost one.
+TENANT_RATE_LIMIT = float(getenv("TENANT_RATE_LIMIT", "0"))
+
+# .. envvar:: TENANT_RATE_BURST
+#     Number of requests a tenant can send at once after being idle, 0 for one second worth of TENANT_RATE_LIMIT
+TENANT_RATE_BURST = float(getenv("TENANT_RATE_BURST", "0"))
+
+# .. envvar:: TENANT_RATE_LIMITS
+#     JSON object overriding the limits of single tenants, e.g. {"tenant": {"rate": 100, "burst": 500}}
+TENANT_RATE_LIMITS = getenv("TENANT_RATE_LIMITS", "{}")
+
+# .. envvar:: TENANT_RATE_LIMIT_MODE
+#     "local" limits the requests of every container on its own,
+#     "table" counts the requests of all containers in the table
+TENANT_RATE_LIMIT_MODE = getenv("TENANT_RATE_LIMIT_MODE", "local").lower()
+
+# .. envvar:: GSI_SHARDS
+#     Number of shards the items of a tenant are spread over in the global secondary index,
+#     more shards raise the tenant's write throughput and make listing items query every shard
+GSI_SHARDS = int(getenv("GSI_SHARDS", "1"))
+
+# .. envvar:: GSI_TENANT_SHARDS
+#     JSON object overriding GSI_SHARDS for single tenants, e.g. {"tenant": 8}.
+#     Raising the number of shards needs no migration, see shards.
+GSI_TENANT_SHARDS = getenv("GSI_TENANT_SHARDS", "{}")
+
+# .. envvar:: LOG_LEVEL
+#     Level of the logs written by the service
+LOG_LEVEL = getenv("LOG_LEVEL", "INFO")
+
+# .. envvar:: LOG_DEBUG_SAMPLE_RATE
+#     Fraction of invocations, between 0 and 1, logging at DEBUG level regardless of LOG_LEVEL
+LOG_DEBUG_SAMPLE_RATE = float(getenv("LOG_DEBUG_SAMPLE_RATE", "0"))
+
+# .. envvar:: LOG_FIELD_MAX_LENGTH
+#     Maximum number of characters of a single field in a log entry
+LOG_FIELD_MAX_LENGTH = int(getenv("LOG_FIELD_MAX_LENGTH", "2048"))
+
+# .. envvar:: TRUSTED_DB_ITEMS
+#     Whether items read from the table are returned without validating them with the Item model again
+TRUSTED_DB_ITEMS = getenv("TRUSTED_DB_ITEMS", "true").lower() == "true"
+
+# .. envvar:: DATA_COMPRESSION_THRESHOLD
+#     Item data serialised to at least this many bytes is stored compressed, 0 disables compression.
+#     Compressed items are read transparently regardless of this setting.
+DATA_COMPRESSION_THRESHOLD = int(getenv("DATA_COMPRESSION_THRESHOLD", "0"))
+
+# .. envvar:: DATA_COMPRESSION_LEVEL
+#     zlib compression level of item data, 1 is fastest and 9 compresses best
+DATA_COMPRESSION_LEVEL = int(getenv("DATA_COMPRESSION_LEVEL", "6"))
+
+# .. envvar:: METRICS_ENABLED
+#     Whether every invocation writes its stage latencies as a CloudWatch Embedded Metric Format line
+METRICS_ENABLED = getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# .. envvar:: METRICS_NAMESPACE
+#     CloudWatch namespace of the stage latency metrics
+METRICS_NAMESPACE = getenv("METRICS_NAMESPACE", "python-exercise")
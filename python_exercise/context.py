@@ -1,6 +1,126 @@
 """Variables in use during the lifecycle of an invocation request"""
 
+import json
 import logging
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
 
-# default this to the root logger
-logger = logging.getLogger()
+from config import LOG_DEBUG_SAMPLE_RATE, LOG_FIELD_MAX_LENGTH, LOG_LEVEL
+
+# Attributes every LogRecord has, anything else was passed with `extra` and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class Lazy:
+    """
+    Log field value computed only when the record is actually written, e.g.::
+
+        logger.debug("Event", extra={"event": Lazy(event.json)})
+    """
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func: Callable[..., Any], *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+
+def _truncate(value: str, max_length: int) -> str:
+    if len(value) <= max_length:
+        return value
+    return f"{value[:max_length]}...[{len(value) - max_length} more]"
+
+
+def _render(value: Any, max_length: int) -> Any:
+    """
+    Turn field value into something JSON serialisable and not longer than max_length
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return _truncate(str(value), max_length)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single line JSON objects, with the fields passed in `extra`
+    rendered and truncated only when the record is written
+    """
+
+    def __init__(self, max_field_length: int = LOG_FIELD_MAX_LENGTH):
+        super().__init__()
+        self.max_field_length = max_field_length
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": _truncate(record.getMessage(), self.max_field_length),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = _render(value, self.max_field_length)
+        if record.exc_info:
+            entry["exception"] = _truncate(self.formatException(record.exc_info), self.max_field_length)
+        return json.dumps(entry, default=str)
+
+
+def sample_log_level():
+    """
+    Decide whether the current invocation writes debug logs.
+    A LOG_DEBUG_SAMPLE_RATE fraction of invocations logs at DEBUG level, the rest at LOG_LEVEL,
+    so payloads logged at debug level are seen for some requests without paying for all of them.
+    """
+    if LOG_DEBUG_SAMPLE_RATE and random.random() < LOG_DEBUG_SAMPLE_RATE:  # nosec B311
+        logger.setLevel(logging.DEBUG)
+    else:
+        logger.setLevel(LOG_LEVEL)
+
+
+class Deadline:
+    """
+    Time the current invocation has to finish by, taken from the Lambda context
+    """
+
+    def __init__(self):
+        self._expires_at: Optional[float] = None
+
+    def start(self, context: Any):
+        """
+        Start a new invocation
+        :param context: lambda execution context, the deadline is unknown without get_remaining_time_in_millis
+        """
+        remaining = getattr(context, "get_remaining_time_in_millis", None)
+        self._expires_at = time.monotonic() + remaining() / 1000 if callable(remaining) else None
+
+    def remaining(self) -> Optional[float]:
+        """
+        Get number of seconds left until the function times out
+        :return: seconds left, None when the deadline is unknown
+        """
+        if self._expires_at is None:
+            return None
+        return self._expires_at - time.monotonic()
+
+
+deadline = Deadline()
+
+
+def _build_logger() -> logging.Logger:
+    json_logger = logging.getLogger("python_exercise")
+    json_logger.setLevel(LOG_LEVEL)
+    json_logger.propagate = False
+    if not json_logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        json_logger.addHandler(handler)
+    return json_logger
+
+
+logger = _build_logger()
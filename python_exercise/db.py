@@ -2,19 +2,56 @@
 The module contains functionality to work with DynamoDB.
 """
 
+import datetime
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from decimal import Decimal
 from enum import Enum
-from typing import Any, Mapping, Optional
+from typing import Any, Callable, Iterable, Iterator, Mapping, Optional
 
-from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import Binary
 from botocore.exceptions import ClientError
 from evertz_io_dynamo_utils.expressions import projection_expression
 from evertz_io_identity_lib.iam import restricted_table
 from evertz_io_observability.decorators import start_span
 
-from config import TABLE_NAME
-from context import logger
-from errors import ItemConflict, ItemNotFound
+from config import (
+    DATA_COMPRESSION_LEVEL,
+    DATA_COMPRESSION_THRESHOLD,
+    IDEMPOTENCY_TTL,
+    RESTRICTED_ROLE,
+    RESTRICTED_TABLE_CACHE_SIZE,
+    RESTRICTED_TABLE_CACHE_TTL,
+    RESTRICTED_TABLE_REFRESH_MARGIN,
+    TABLE_NAME,
+)
+from context import Lazy, logger
+from errors import (
+    DatabaseThrottled,
+    IdempotencyKeyInUse,
+    IdempotencyKeyReused,
+    ItemConflict,
+    ItemNotFound,
+    ItemsUnprocessed,
+    ItemVersionMismatch,
+)
+from ids import IdRange, encode_cursor
+from metrics import (
+    DYNAMODB,
+    RESTRICTED_TABLE,
+    RESTRICTED_TABLE_CACHE_HITS,
+    RESTRICTED_TABLE_CACHE_MISSES,
+    RESTRICTED_TABLE_CACHE_REFRESHES,
+    metrics,
+)
+from resilience import THROTTLED_RETRY_AFTER, THROTTLING_CANCELLATION_REASONS, backoff, call_with_retries
+from shards import gather, shard_key, shard_keys
 
 # String used as the delimiter for separating information in the overloaded keys
 KEY_DELIMITER = "#"
@@ -23,6 +60,43 @@ KEY_DELIMITER = "#"
 PK_KEY = "pk"
 DATA_ATTRIBUTE = "data"
 ITEM_ID_ATTRIBUTE = "item_id"
+GSI_PK_KEY = "gsi_pk"
+
+# Attributes replacing DATA_ATTRIBUTE for item data stored compressed, the codec marks how the data is encoded
+DATA_COMPRESSED_ATTRIBUTE = "data_compressed"
+DATA_CODEC_ATTRIBUTE = "data_codec"
+ZLIB_JSON_CODEC = "zlib+json"
+
+# Attributes of the per tenant stats item, counters are stored as <item type>_count
+STATS_COUNT_SUFFIX = "_count"
+STATS_LAST_MODIFIED_ATTRIBUTE = "last_modified"
+STATS_UPDATED_AT_ATTRIBUTE = "updated_at"
+
+# Field of item data counting the modifications of the item, the item's ETag is built from it
+VERSION_FIELD = "version"
+
+# Attributes of idempotency records, expired records are deleted by the table's time to live
+IDEMPOTENCY_REQUEST_HASH_ATTRIBUTE = "request_hash"
+EXPIRES_AT_ATTRIBUTE = "expires_at"
+
+# Attribute of rate limit windows counting the requests of the tenant
+RATE_LIMIT_COUNT_ATTRIBUTE = "request_count"
+
+# Name of the global secondary index keyed by GSI_PK_KEY and ITEM_ID_ATTRIBUTE, GSI_PK_KEY is sharded, see shards
+GSI_NAME = "gsi"
+
+# Maximum number of keys DynamoDB accepts in a single BatchGetItem request
+BATCH_GET_LIMIT = 100
+
+# Maximum number of items DynamoDB accepts in a single BatchWriteItem/TransactWriteItems request
+BATCH_WRITE_LIMIT = 25
+TRANSACT_WRITE_LIMIT = 100
+
+# Maximum number of batch write requests sent to DynamoDB in parallel
+BATCH_WRITE_CONCURRENCY = 8
+
+# Maximum number of attempts of keys/items DynamoDB returns as unprocessed from batch operations
+BATCH_MAX_ATTEMPTS = 5
 
 
 class ItemType(Enum):
@@ -31,6 +105,16 @@ class ItemType(Enum):
     """
 
     ITEM = "item"
+    # per tenant aggregates maintained from the table stream, stored without item id
+    STATS = "stats"
+    # responses of create requests by idempotency key, stored with the key in place of the item id
+    IDEMPOTENCY = "idempotency"
+    # requests of a tenant counted in a rate limit window, stored with the window number in place of the item id
+    RATE_LIMIT = "rate_limit"
+
+
+# Item types counted in the stats
+STATS_ITEM_TYPES = (ItemType.ITEM,)
 
 
 def _get_db_key(item_type: ItemType, tenant_id: str, item_id: Optional[str] = None) -> str:
@@ -47,6 +131,47 @@ def _get_db_key(item_type: ItemType, tenant_id: str, item_id: Optional[str] = No
     return f"{tenant_id}{KEY_DELIMITER}{item_type.value}"
 
 
+def parse_db_key(key: str) -> tuple[str, ItemType, Optional[str]]:
+    """
+    Split key built by _get_db_key into its parts
+    :param key: string representing the key
+    :return: tenant name, item type and item id, None when the key has no item id
+    """
+    parts = key.split(KEY_DELIMITER, 2)
+    if len(parts) < 2:
+        raise ValueError(f"Key [{key}] is not a valid item key")
+    return parts[0], ItemType(parts[1]), parts[2] if len(parts) == 3 else None
+
+
+def _chunks(values: list, size: int) -> Iterable[list]:
+    """
+    Split list into consecutive chunks of at most given size
+    :param values: list to split
+    :param size: maximum size of a single chunk
+    :return: iterable of chunks
+    """
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _request(method: Callable[..., dict], **kwargs) -> dict:
+    """
+    Send DynamoDB request, recording its duration and the capacity it consumed.
+    Throttled requests are retried, see resilience.call_with_retries.
+    :param method: boto3 method sending the request, e.g. table.get_item
+    :param kwargs: parameters of the request
+    :return: response
+    """
+
+    def send() -> dict:
+        with metrics.stage(DYNAMODB):
+            return method(ReturnConsumedCapacity="TOTAL", **kwargs)
+
+    response = call_with_retries(send)
+    metrics.add_capacity(response.get("ConsumedCapacity"))
+    return response
+
+
 @dataclass(frozen=True)
 class ItemKeys:
     """
@@ -67,10 +192,390 @@ class ItemKeys:
         :return: new object representing keys for the item
         """
         return ItemKeys(
-            primary=_get_db_key(item_type, tenant_id, item_id), global_secondary=_get_db_key(item_type, tenant_id)
+            primary=_get_db_key(item_type, tenant_id, item_id),
+            global_secondary=shard_key(_get_db_key(item_type, tenant_id), tenant_id, item_id),
         )
 
 
+@dataclass(frozen=True)
+class IdempotencyKey:
+    """
+    Idempotency key sent by the client with the hash of the request it was sent with
+    """
+
+    key: str
+    request_hash: str
+
+
+@dataclass(frozen=True)
+class ItemUpdate:
+    """
+    Changed fields of item data with the modification they are part of
+    """
+
+    changes: Mapping[str, Any]
+    modified_by: str
+    modified_at: str
+    # version of the item the changes were made to, None to change the current version,
+    # 0 for an item stored before versions were added
+    expected_version: Optional[int] = None
+
+
+# pylint: disable=too-many-instance-attributes
+class TableCache:
+    """
+    LRU cache of restricted table handles shared by the invocations of a warm container.
+
+    Every handle holds credentials of an assumed role, so it is replaced shortly before
+    the credentials expire instead of assuming the role again on every request.
+    """
+
+    def __init__(self, max_size: int, ttl: float, refresh_margin: float):
+        self.max_size = max_size
+        # lifetime of credentials that do not report their expiry
+        self.ttl = ttl
+        # handles are used only until refresh_margin seconds before credentials expire
+        self.refresh_margin = refresh_margin
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._tables: OrderedDict[tuple[str, str, str], tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, table_name: str, tenant_id: str) -> Any:
+        """
+        Get table restricted to the tenant, assuming the restricted role only when needed
+        :param table_name: name of the table
+        :param tenant_id: tenant the table access is restricted to
+        :return: boto3 Table resource
+        """
+        with metrics.stage(RESTRICTED_TABLE):
+            return self._get(table_name, tenant_id)
+
+    def _get(self, table_name: str, tenant_id: str) -> Any:
+        key = (table_name, tenant_id, RESTRICTED_ROLE)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._tables.get(key)
+            if cached and cached[1] > now:
+                self._tables.move_to_end(key)
+                self.hits += 1
+                metrics.add_count(RESTRICTED_TABLE_CACHE_HITS)
+                return cached[0]
+            if cached:
+                self.refreshes += 1
+            else:
+                self.misses += 1
+        metrics.add_count(RESTRICTED_TABLE_CACHE_REFRESHES if cached else RESTRICTED_TABLE_CACHE_MISSES)
+
+        table = restricted_table(table_name, tenant_id)
+        with self._lock:
+            self._tables[key] = (table, now + self._lifetime(table) - self.refresh_margin)
+            self._tables.move_to_end(key)
+            while len(self._tables) > self.max_size:
+                self._tables.popitem(last=False)
+        return table
+
+    def _lifetime(self, table: Any) -> float:
+        """
+        Get number of seconds the credentials of the table handle are valid for
+        :param table: boto3 Table resource
+        :return: seconds until the credentials expire, ttl when they do not report their expiry
+        """
+        # pylint: disable=protected-access
+        credentials = getattr(getattr(table.meta.client, "_request_signer", None), "_credentials", None)
+        expiry = getattr(credentials, "_expiry_time", None)
+        if not isinstance(expiry, datetime.datetime):
+            return self.ttl
+        return expiry.timestamp() - time.time()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get cache counters
+        :return: hits, misses and refreshes since the container started and current number of handles
+        """
+        return {"hits": self.hits, "misses": self.misses, "refreshes": self.refreshes, "size": len(self._tables)}
+
+    def clear(self):
+        """
+        Drop all cached handles and reset counters
+        """
+        with self._lock:
+            self._tables.clear()
+            self.hits = self.misses = self.refreshes = 0
+
+
+table_cache = TableCache(RESTRICTED_TABLE_CACHE_SIZE, RESTRICTED_TABLE_CACHE_TTL, RESTRICTED_TABLE_REFRESH_MARGIN)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _compress(item_data: Mapping[str, Any]) -> Optional[bytes]:
+    """
+    Compress item data when it is at least DATA_COMPRESSION_THRESHOLD bytes long
+    :param item_data: data to store with item
+    :return: compressed data, None when the data should be stored as a map
+    """
+    if not DATA_COMPRESSION_THRESHOLD:
+        return None
+    serialised = json.dumps(item_data, separators=(",", ":"), default=_json_default).encode()
+    if len(serialised) < DATA_COMPRESSION_THRESHOLD:
+        return None
+    return zlib.compress(serialised, DATA_COMPRESSION_LEVEL)
+
+
+def read_item_data(item: Mapping[str, Any], fields=None) -> Optional[dict[str, Any]]:
+    """
+    Get item data as it was stored, decompressing it when needed
+    :param item: item as it is stored in database
+    :param fields: fields to select from compressed data, map data is already projected by DynamoDB
+    :return: item's data
+    """
+    if DATA_COMPRESSED_ATTRIBUTE not in item:
+        return item.get(DATA_ATTRIBUTE)
+    if item.get(DATA_CODEC_ATTRIBUTE) != ZLIB_JSON_CODEC:
+        raise ValueError(f"Unknown codec [{item.get(DATA_CODEC_ATTRIBUTE)}] of item data")
+    compressed = item[DATA_COMPRESSED_ATTRIBUTE]
+    if isinstance(compressed, Binary):
+        compressed = compressed.value
+    # numbers are decoded as Decimal, the way DynamoDB returns numbers of map data
+    data = json.loads(zlib.decompress(compressed), parse_float=Decimal, parse_int=Decimal)
+    if fields:
+        return {field: data[field] for field in fields if field in data}
+    return data
+
+
+def _projection(fields, *attributes: str) -> dict[str, Any]:
+    """
+    Build projection of data fields, compressed data can not be projected by DynamoDB,
+    so it is always read whole and the fields are selected by read_item_data
+    :param fields: fields of item data to read
+    :param attributes: other attributes to read
+    :return: ProjectionExpression and ExpressionAttributeNames parameters
+    """
+    projection = projection_expression(fields, path_prefix=DATA_ATTRIBUTE)
+    projection["ProjectionExpression"] = ",".join(
+        [projection["ProjectionExpression"], DATA_COMPRESSED_ATTRIBUTE, DATA_CODEC_ATTRIBUTE, *attributes]
+    )
+    return projection
+
+
+def _build_item(item_type: ItemType, tenant_id: str, item_id: str, item_data: Mapping[str, Any] = None) -> dict:
+    """
+    Build database representation of the item
+    :param item_type: One of the types from ItemType
+    :param tenant_id: item tenant
+    :param item_id: item id
+    :param item_data: data to store with item, compressed when it exceeds DATA_COMPRESSION_THRESHOLD
+    :return: item as it is stored in database
+    """
+    keys: ItemKeys = ItemKeys.get_keys(item_type, tenant_id, item_id)
+    item = {PK_KEY: keys.primary, GSI_PK_KEY: keys.global_secondary, ITEM_ID_ATTRIBUTE: item_id}
+    if item_data:
+        compressed = _compress(item_data)
+        if compressed is None:
+            item[DATA_ATTRIBUTE] = item_data
+        else:
+            item[DATA_COMPRESSED_ATTRIBUTE] = compressed
+            item[DATA_CODEC_ATTRIBUTE] = ZLIB_JSON_CODEC
+    return item
+
+
+def _build_idempotency_record(tenant_id: str, idempotency_key: IdempotencyKey, response: Mapping[str, Any]) -> dict:
+    """
+    Build database representation of the response to a request with idempotency key
+    :param tenant_id: tenant of the request
+    :param idempotency_key: key and hash of the request
+    :param response: data returned for the request
+    :return: record as it is stored in database, not indexed by the GSI
+    """
+    record = _build_item(ItemType.IDEMPOTENCY, tenant_id, idempotency_key.key, response)
+    del record[GSI_PK_KEY]
+    record[IDEMPOTENCY_REQUEST_HASH_ATTRIBUTE] = idempotency_key.request_hash
+    record[EXPIRES_AT_ATTRIBUTE] = int(time.time()) + IDEMPOTENCY_TTL
+    return record
+
+
+def _rewrite_item(table, item_type: ItemType, tenant_id: str, item_id: str, update: ItemUpdate) -> dict[str, Any]:
+    """
+    Apply update by reading and writing the whole item, for items that can not be updated in place,
+    e.g. items with compressed data. The write is conditioned on the item not changing since it was read.
+    :param table: DynamoDB table of the tenant
+    :param item_type: One of the types from ItemType
+    :param tenant_id: item tenant
+    :param item_id: item id
+    :param update: the changes
+    :return: item's data after the update
+    """
+    key = {PK_KEY: _get_db_key(item_type, tenant_id, item_id)}
+    existing = _request(table.get_item, Key=key, ConsistentRead=True).get("Item")
+    if existing is None:
+        raise ItemNotFound(item_type.value, tenant_id, item_id)
+    data = read_item_data(existing) or {}
+    version = data.get(VERSION_FIELD)
+    if update.expected_version is not None and (version or 0) != update.expected_version:
+        raise ItemVersionMismatch(item_type.value, tenant_id, item_id)
+
+    data = {**data, **update.changes, VERSION_FIELD: (version or 0) + 1}
+    data["modification_info"] = {
+        **(data.get("modification_info") or {}),
+        "last_modified_at": update.modified_at,
+        "last_modified_by": update.modified_by,
+    }
+    if DATA_COMPRESSED_ATTRIBUTE in existing:
+        condition = Attr(DATA_COMPRESSED_ATTRIBUTE).eq(existing[DATA_COMPRESSED_ATTRIBUTE])
+    elif version is not None:
+        condition = Attr(f"{DATA_ATTRIBUTE}.{VERSION_FIELD}").eq(version)
+    else:
+        condition = Attr(PK_KEY).exists() & Attr(f"{DATA_ATTRIBUTE}.{VERSION_FIELD}").not_exists()
+    try:
+        _request(table.put_item, Item=_build_item(item_type, tenant_id, item_id, data), ConditionExpression=condition)
+    except ClientError as client_error:
+        if client_error.response.get("Error", {}).get("Code", "") == "ConditionalCheckFailedException":
+            # the item was changed since it was read
+            if update.expected_version is not None:
+                raise ItemVersionMismatch(item_type.value, tenant_id, item_id) from client_error
+            raise ItemConflict(item_type.value, tenant_id, item_id) from client_error
+        raise
+    return data
+
+
+def _query_pages(table, **kwargs) -> Iterator[list[dict]]:
+    """
+    Lazily query table page by page, the next page is requested only when the previous one is consumed
+    :param table: DynamoDB table to query
+    :param kwargs: Query parameters
+    :return: iterator over the items of every page
+    """
+    while True:
+        response = _request(table.query, **kwargs)
+        yield response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _batch_write(client, item_type: ItemType, tenant_id: str, items: list[dict]):
+    """
+    Write chunk of items with BatchWriteItem, re-submitting unprocessed items while the invocation has time left
+    :param client: DynamoDB client to use
+    :param item_type: One of the types from ItemType
+    :param tenant_id: items tenant
+    :param items: items as they are stored in database, at most BATCH_WRITE_LIMIT
+    """
+    request_items = {TABLE_NAME: [{"PutRequest": {"Item": item}} for item in items]}
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        request_items = _request(client.batch_write_item, RequestItems=request_items).get("UnprocessedItems")
+        if not request_items:
+            return
+        if attempt == BATCH_MAX_ATTEMPTS - 1 or not backoff(attempt):
+            raise ItemsUnprocessed(item_type.value, tenant_id, len(request_items[TABLE_NAME]))
+        logger.warning("Retrying unprocessed items", extra={"count": len(request_items[TABLE_NAME])})
+
+
+def _transact_write(client, item_type: ItemType, tenant_id: str, items: list[dict]) -> list[str]:
+    """
+    Write chunk of items with TransactWriteItems keeping the check that items do not exist yet.
+    Items that already exist are left out and the rest is written again.
+    :param client: DynamoDB client to use
+    :param item_type: One of the types from ItemType
+    :param tenant_id: items tenant
+    :param items: items as they are stored in database, at most TRANSACT_WRITE_LIMIT
+    :return: ids of the items that already exist
+    """
+    conflicts: list[str] = []
+    attempt = 0
+    while items:
+        # condition objects are not supported by boto3 inside TransactItems, so the expression is built by hand
+        transact_items = [
+            {
+                "Put": {
+                    "TableName": TABLE_NAME,
+                    "Item": item,
+                    "ConditionExpression": "attribute_not_exists(#pk)",
+                    "ExpressionAttributeNames": {"#pk": PK_KEY},
+                }
+            }
+            for item in items
+        ]
+        try:
+            _request(client.transact_write_items, TransactItems=transact_items)
+            return conflicts
+        except ClientError as client_error:
+            error_code = client_error.response.get("Error", {}).get("Code", "")
+            if error_code != "TransactionCanceledException":
+                raise
+            reasons = [reason.get("Code", "None") for reason in client_error.response.get("CancellationReasons", [])]
+
+        conflicting = {index for index, code in enumerate(reasons) if code == "ConditionalCheckFailed"}
+        conflicts.extend(items[index][ITEM_ID_ATTRIBUTE] for index in sorted(conflicting))
+        if not conflicting:
+            # cancelled for other reasons, e.g. throttling or a concurrent transaction on the same items
+            if attempt >= BATCH_MAX_ATTEMPTS - 1 or not backoff(attempt):
+                raise ItemsUnprocessed(item_type.value, tenant_id, len(items))
+            logger.warning("Retrying cancelled transaction", extra={"count": len(items), "reasons": Lazy(set, reasons)})
+            attempt += 1
+        items = [item for index, item in enumerate(items) if index not in conflicting]
+
+    return conflicts
+
+
+def _shard_pages(
+    item_type: ItemType, tenant_id: str, page_size: int, id_range: IdRange, fields=None
+) -> list[Iterator[list[dict]]]:
+    """
+    Build lazy queries of the tenant's items in every shard of the global secondary index
+    :param item_type: One of the types from ItemType
+    :param tenant_id: items tenant
+    :param page_size: number of items read from a shard at once
+    :param id_range: range of the ids of the items
+    :param fields: optional parameter to specify fields that should be returned for each item
+    :return: iterators over the pages of every shard
+    """
+    # item id is always needed to merge the shards and to build the cursor
+    projection = _projection(fields, ITEM_ID_ATTRIBUTE) if fields else {}
+    table = table_cache.get(TABLE_NAME, tenant_id)
+    id_condition = id_range.key_condition(ITEM_ID_ATTRIBUTE)
+    queries = []
+    for key in shard_keys(_get_db_key(item_type, tenant_id), tenant_id):
+        condition = Key(GSI_PK_KEY).eq(key)
+        if id_condition is not None:
+            condition = condition & id_condition
+        queries.append(
+            _query_pages(table, IndexName=GSI_NAME, KeyConditionExpression=condition, Limit=page_size, **projection)
+        )
+    return queries
+
+
+def _read_page(
+    item_type: ItemType, tenant_id: str, limit: int, id_range: IdRange, fields=None
+) -> tuple[list[dict[str, Any]], Optional[str]]:
+    """
+    Read one page of the tenant's items in the range of ids from all shards of the global secondary index
+    :param item_type: One of the types from ItemType
+    :param tenant_id: items tenant
+    :param limit: maximum number of items to return
+    :param id_range: range of the ids of the items
+    :param fields: optional parameter to specify fields that should be returned for each item
+    :return: items' data and cursor for the next page, None when there are no more items
+    """
+    if id_range.is_empty():
+        return [], None
+    items: list[dict[str, Any]] = []
+    for item in gather(_shard_pages(item_type, tenant_id, limit, id_range, fields), ITEM_ID_ATTRIBUTE):
+        if not id_range.contains(item[ITEM_ID_ATTRIBUTE]):
+            continue
+        items.append(read_item_data(item, fields) or {})
+        if len(items) == limit:
+            return items, encode_cursor(item[ITEM_ID_ATTRIBUTE])
+
+    return items, None
+
+
 class Db:
     """
     The class contains functionality to work with DynamoDB.
@@ -86,45 +591,402 @@ class Db:
         :param item_id: item id
         :param item_data: data to store with item
         """
-        logger.info(f"Putting item from DB for item [{item_id}] for tenant [{tenant_id}]")
-        keys: ItemKeys = ItemKeys.get_keys(item_type, tenant_id, item_id)
-        item = {PK_KEY: keys.primary, ITEM_ID_ATTRIBUTE: item_id}
-        if item_data:
-            item[DATA_ATTRIBUTE] = item_data
+        logger.info("Putting item to DB", extra={"item_id": item_id, "tenant_id": tenant_id})
+        item = _build_item(item_type, tenant_id, item_id, item_data)
         kwargs = {"Item": item, "ConditionExpression": Attr(PK_KEY).not_exists()}
         try:
-            restricted_table(TABLE_NAME, tenant_id).put_item(**kwargs)
+            _request(table_cache.get(TABLE_NAME, tenant_id).put_item, **kwargs)
         except ClientError as client_error:
             error = client_error.response.get("Error", {})
             error_code = error.get("Code", "")
-            logger.error(f"Error Code: [{error_code}]")
+            logger.error("Put item failed", extra={"error_code": error_code})
 
             if error_code == "ConditionalCheckFailedException":
                 raise ItemConflict(item_type.value, tenant_id, item_id) from client_error
             raise
 
+    @staticmethod
+    @start_span("database_put_item_idempotent")
+    def put_item_idempotent(
+        item_type: ItemType, tenant_id: str, item_id: str, item_data: Mapping[str, Any], idempotency_key: IdempotencyKey
+    ) -> tuple[dict[str, Any], bool]:
+        """
+        Store new item together with the record of its idempotency key in a single transaction.
+        When the key was already used, nothing is written and the data stored by the first
+        request is returned instead.
+        :param item_type: One of the types from ItemType
+        :param tenant_id: item tenant
+        :param item_id: item id
+        :param item_data: data to store with item, also stored as the response of the request
+        :param idempotency_key: key and hash of the request
+        :return: item data and whether it is a replay of an earlier request
+        """
+        logger.info("Putting item with idempotency key to DB", extra={"item_id": item_id, "tenant_id": tenant_id})
+        record = _build_idempotency_record(tenant_id, idempotency_key, item_data)
+        table = table_cache.get(TABLE_NAME, tenant_id)
+        # condition objects are not supported by boto3 inside TransactItems, so the expressions are built by hand
+        transact_items = [
+            {
+                "Put": {
+                    "TableName": TABLE_NAME,
+                    "Item": _build_item(item_type, tenant_id, item_id, item_data),
+                    "ConditionExpression": "attribute_not_exists(#pk)",
+                    "ExpressionAttributeNames": {"#pk": PK_KEY},
+                }
+            },
+            {
+                "Put": {
+                    "TableName": TABLE_NAME,
+                    "Item": record,
+                    # expired records stay in the table until the time to live deletes them
+                    "ConditionExpression": "attribute_not_exists(#pk) OR #expires_at < :now",
+                    "ExpressionAttributeNames": {"#pk": PK_KEY, "#expires_at": EXPIRES_AT_ATTRIBUTE},
+                    "ExpressionAttributeValues": {":now": int(time.time())},
+                }
+            },
+        ]
+        try:
+            _request(table.meta.client.transact_write_items, TransactItems=transact_items)
+            return dict(item_data), False
+        except ClientError as client_error:
+            if client_error.response.get("Error", {}).get("Code", "") != "TransactionCanceledException":
+                raise
+            reasons = [reason.get("Code", "None") for reason in client_error.response.get("CancellationReasons", [])]
+            logger.warning("Put item with idempotency key cancelled", extra={"reasons": reasons})
+            if THROTTLING_CANCELLATION_REASONS.intersection(reasons):
+                raise DatabaseThrottled(THROTTLED_RETRY_AFTER) from client_error
+            if reasons[1:2] == ["TransactionConflict"]:
+                # a concurrent request with the same key is being written
+                raise IdempotencyKeyInUse(tenant_id, idempotency_key.key) from client_error
+            if reasons[1:2] != ["ConditionalCheckFailed"]:
+                if reasons[:1] == ["ConditionalCheckFailed"]:
+                    raise ItemConflict(item_type.value, tenant_id, item_id) from client_error
+                raise
+
+        response = _request(table.get_item, Key={PK_KEY: record[PK_KEY]}, ConsistentRead=True)
+        existing = response.get("Item")
+        if existing is None:
+            # expired and deleted since the transaction was cancelled, the client can retry
+            raise IdempotencyKeyInUse(tenant_id, idempotency_key.key)
+        if existing[IDEMPOTENCY_REQUEST_HASH_ATTRIBUTE] != idempotency_key.request_hash:
+            raise IdempotencyKeyReused(tenant_id, idempotency_key.key)
+        return read_item_data(existing) or {}, True
+
+    @staticmethod
+    @start_span("database_update_item")
+    def update_item(item_type: ItemType, tenant_id: str, item_id: str, update: ItemUpdate) -> dict[str, Any]:
+        """
+        Update fields of item data in place with a single UpdateItem sending only the changed fields.
+        The version is incremented and the last modification set in the same request. When the
+        expected version is given and the item has another one, ItemVersionMismatch is raised.
+        Items that can not be updated in place are read and written whole.
+        :param item_type: One of the types from ItemType
+        :param tenant_id: item tenant
+        :param item_id: item id
+        :param update: the changes
+        :return: item's data after the update
+        """
+        logger.info("Updating item in DB", extra={"item_id": item_id, "tenant_id": tenant_id})
+        names = {"#data": DATA_ATTRIBUTE, "#version": VERSION_FIELD, "#info": "modification_info"}
+        names.update({"#at": "last_modified_at", "#by": "last_modified_by"})
+        values: dict[str, Any] = {":zero": 0, ":one": 1, ":at": update.modified_at, ":by": update.modified_by}
+        assignments = [
+            "#data.#version = if_not_exists(#data.#version, :zero) + :one",
+            "#data.#info.#at = :at",
+            "#data.#info.#by = :by",
+        ]
+        for index, (field, value) in enumerate(update.changes.items()):
+            names[f"#f{index}"] = field
+            values[f":f{index}"] = value
+            assignments.append(f"#data.#f{index} = :f{index}")
+        # nested paths can only be set inside an existing map, so compressed items fail the condition too
+        condition = "attribute_exists(#data.#info)"
+        if update.expected_version == 0:
+            condition += " AND attribute_not_exists(#data.#version)"
+        elif update.expected_version is not None:
+            condition += " AND #data.#version = :expected"
+            values[":expected"] = update.expected_version
+
+        table = table_cache.get(TABLE_NAME, tenant_id)
+        try:
+            response = _request(
+                table.update_item,
+                Key={PK_KEY: _get_db_key(item_type, tenant_id, item_id)},
+                UpdateExpression=f"SET {', '.join(assignments)}",
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues="ALL_NEW",
+            )
+            return read_item_data(response["Attributes"]) or {}
+        except ClientError as client_error:
+            if client_error.response.get("Error", {}).get("Code", "") != "ConditionalCheckFailedException":
+                raise
+
+        # the item does not exist, has another version or has to be rewritten whole, which the read tells apart
+        return _rewrite_item(table, item_type, tenant_id, item_id, update)
+
+    @staticmethod
+    @start_span("database_put_items")
+    def put_items(
+        item_type: ItemType, tenant_id: str, items: Mapping[str, Mapping[str, Any]], check_conflicts: bool = False
+    ) -> list[str]:
+        """
+        Store multiple new items in database, writing chunks of items in parallel.
+
+        BatchWriteItem can not check that items do not exist yet and overwrites existing items.
+        When check_conflicts is set TransactWriteItems is used instead, so existing items are kept
+        and reported back as conflicts.
+        :param item_type: One of the types from ItemType
+        :param tenant_id: items tenant
+        :param items: data to store with each item by item id
+        :param check_conflicts: keep existing items instead of overwriting them
+        :return: ids of the items that were not stored because they already exist
+        """
+        logger.info("Putting items to DB", extra={"count": len(items), "tenant_id": tenant_id})
+        db_items = [_build_item(item_type, tenant_id, item_id, item_data) for item_id, item_data in items.items()]
+        client = table_cache.get(TABLE_NAME, tenant_id).meta.client
+
+        if check_conflicts:
+            chunks = list(_chunks(db_items, TRANSACT_WRITE_LIMIT))
+            write = _transact_write
+        else:
+            chunks = list(_chunks(db_items, BATCH_WRITE_LIMIT))
+            write = _batch_write
+
+        conflicts: list[str] = []
+        with ThreadPoolExecutor(max_workers=min(BATCH_WRITE_CONCURRENCY, len(chunks) or 1)) as executor:
+            futures = [executor.submit(write, client, item_type, tenant_id, chunk) for chunk in chunks]
+            for future in futures:
+                conflicts.extend(future.result() or [])
+
+        if conflicts:
+            logger.error("Items already exist", extra={"count": len(conflicts), "tenant_id": tenant_id})
+        return conflicts
+
     @staticmethod
     @start_span("database_get_item")
-    def get_item(item_type: ItemType, tenant_id: str, item_id: str, fields=None) -> dict[str, Any]:
+    def get_item(
+        item_type: ItemType, tenant_id: str, item_id: str, fields=None, consistent: bool = False
+    ) -> dict[str, Any]:
         """
         Read item of the given type from database
         :param item_type: One of the types from ItemType
         :param tenant_id: item tenant
         :param item_id: item id
         :param fields: optional parameter to specify fields that should be returned for item
+        :param consistent: read the item with a strongly consistent read, reflecting all writes that succeeded before
         :return: item's data
         """
-        logger.info(f"Fetching {item_type.value} [{item_id}] from DB for tenant: [{tenant_id}]")
+        logger.info(
+            "Fetching item from DB", extra={"item_type": item_type.value, "item_id": item_id, "tenant_id": tenant_id}
+        )
 
         keys: ItemKeys = ItemKeys.get_keys(item_type, tenant_id, item_id)
-        kwargs: dict[str, Any] = {"Key": {PK_KEY: keys.primary}}
+        kwargs: dict[str, Any] = {"Key": {PK_KEY: keys.primary}, "ConsistentRead": consistent}
 
         if fields:
-            kwargs.update(projection_expression(fields, path_prefix=DATA_ATTRIBUTE))
+            # the key is projected too, so items without any of the fields are told apart from missing ones
+            kwargs.update(_projection(fields, PK_KEY))
 
-        response = restricted_table(TABLE_NAME, tenant_id).get_item(**kwargs)
+        response = _request(table_cache.get(TABLE_NAME, tenant_id).get_item, **kwargs)
 
         if response.get("Item") is None:
             raise ItemNotFound(item_type.value, tenant_id, item_id)
 
-        return response.get("Item").get("data")
+        return read_item_data(response.get("Item"), fields) or {}
+
+    @staticmethod
+    @start_span("database_batch_get_items")
+    def batch_get_items(
+        item_type: ItemType, tenant_id: str, item_ids: Iterable[str], fields=None
+    ) -> dict[str, dict[str, Any]]:
+        """
+        Read multiple items of the given type from database using BatchGetItem
+        :param item_type: One of the types from ItemType
+        :param tenant_id: items tenant
+        :param item_ids: ids of the items to read, duplicates are ignored
+        :param fields: optional parameter to specify fields that should be returned for each item
+        :return: items' data by item id, items that do not exist are omitted
+        """
+        unique_ids = list(dict.fromkeys(item_ids))
+        logger.info(
+            "Fetching items from DB",
+            extra={"item_type": item_type.value, "count": len(unique_ids), "tenant_id": tenant_id},
+        )
+
+        table = table_cache.get(TABLE_NAME, tenant_id)
+        request_options: dict[str, Any] = {}
+        if fields:
+            # item id is always needed to match returned data with the requested ids
+            request_options.update(_projection(fields, ITEM_ID_ATTRIBUTE))
+
+        items: dict[str, dict[str, Any]] = {}
+        for chunk in _chunks(unique_ids, BATCH_GET_LIMIT):
+            keys = [{PK_KEY: ItemKeys.get_keys(item_type, tenant_id, item_id).primary} for item_id in chunk]
+            request_items = {TABLE_NAME: {"Keys": keys, **request_options}}
+
+            for attempt in range(BATCH_MAX_ATTEMPTS):
+                response = _request(table.meta.client.batch_get_item, RequestItems=request_items)
+                for item in response.get("Responses", {}).get(TABLE_NAME, []):
+                    items[item[ITEM_ID_ATTRIBUTE]] = read_item_data(item, fields) or {}
+
+                request_items = response.get("UnprocessedKeys")
+                if not request_items:
+                    break
+                if attempt == BATCH_MAX_ATTEMPTS - 1 or not backoff(attempt):
+                    raise ItemsUnprocessed(item_type.value, tenant_id, len(request_items[TABLE_NAME]["Keys"]))
+                logger.warning("Retrying unprocessed keys", extra={"count": len(request_items[TABLE_NAME]["Keys"])})
+
+        return items
+
+    @staticmethod
+    def iter_items(
+        item_type: ItemType, tenant_id: str, page_size: int = 100, fields=None, cursor: Optional[str] = None
+    ) -> Iterator[tuple[dict[str, Any], str]]:
+        """
+        Stream all tenant's items of the given type, keeping at most two pages of every shard in memory
+        :param item_type: One of the types from ItemType
+        :param tenant_id: items tenant
+        :param page_size: number of items read from database at once
+        :param fields: optional parameter to specify fields that should be returned for each item
+        :param cursor: cursor returned with an item of the previous run, None to start from the beginning
+        :return: iterator over items' data with cursors to resume the iteration after each item
+        """
+        logger.info("Iterating items from DB", extra={"item_type": item_type.value, "tenant_id": tenant_id})
+
+        shard_pages = _shard_pages(item_type, tenant_id, page_size, IdRange.after_cursor(cursor), fields)
+        for item in gather(shard_pages, ITEM_ID_ATTRIBUTE, prefetch=True):
+            yield read_item_data(item, fields) or {}, encode_cursor(item[ITEM_ID_ATTRIBUTE])
+
+    @staticmethod
+    @start_span("database_query_items")
+    def query_items(
+        item_type: ItemType, tenant_id: str, limit: int, cursor: Optional[str] = None, fields=None
+    ) -> tuple[list[dict[str, Any]], Optional[str]]:
+        """
+        Read one page of the tenant's items of the given type using the global secondary index
+        :param item_type: One of the types from ItemType
+        :param tenant_id: items tenant
+        :param limit: maximum number of items to return
+        :param cursor: cursor returned with the previous page, None to start from the beginning
+        :param fields: optional parameter to specify fields that should be returned for each item
+        :return: items' data and cursor for the next page, None when there are no more items
+        """
+        logger.info("Querying items from DB", extra={"item_type": item_type.value, "tenant_id": tenant_id})
+        return _read_page(item_type, tenant_id, limit, IdRange.after_cursor(cursor), fields)
+
+    @staticmethod
+    @start_span("database_query_items_in_range")
+    def query_items_in_range(
+        item_type: ItemType, tenant_id: str, limit: int, id_range: IdRange
+    ) -> tuple[list[dict[str, Any]], Optional[str]]:
+        """
+        Read one page of the tenant's items in a range of ids with a key condition on the global secondary index,
+        e.g. the items created in a time range, see IdRange.created
+        :param item_type: One of the types from ItemType
+        :param tenant_id: items tenant
+        :param limit: maximum number of items to return
+        :param id_range: range of the ids of the items, starting after the item of the cursor
+        :return: items' data and cursor for the next page, None when there are no more items
+        """
+        logger.info("Querying items in range from DB", extra={"tenant_id": tenant_id, "id_range": id_range})
+        return _read_page(item_type, tenant_id, limit, id_range)
+
+    @staticmethod
+    @start_span("database_update_stats")
+    def update_stats(tenant_id: str, counts: Mapping[ItemType, int], last_modified: Optional[Mapping[str, Any]] = None):
+        """
+        Apply changes of a batch of stream records to the tenant's stats item with a single update.
+        Counters are incremented atomically, last modification is replaced only by a newer one,
+        so batches of different shards can be applied in any order.
+        :param tenant_id: tenant the stats belong to
+        :param counts: change of the number of items by item type
+        :param last_modified: latest modification in the batch, with "at", "by" and "item_id"
+        """
+        logger.info("Updating stats in DB", extra={"tenant_id": tenant_id})
+        names = {"#updated_at": STATS_UPDATED_AT_ATTRIBUTE}
+        values: dict[str, Any] = {":updated_at": datetime.datetime.utcnow().isoformat()}
+        additions = []
+        for index, (item_type, count) in enumerate(counts.items()):
+            if count:
+                names[f"#count{index}"] = f"{item_type.value}{STATS_COUNT_SUFFIX}"
+                values[f":count{index}"] = count
+                additions.append(f"#count{index} :count{index}")
+        add_expression = f" ADD {', '.join(additions)}" if additions else ""
+
+        table = table_cache.get(TABLE_NAME, tenant_id)
+        key = {PK_KEY: _get_db_key(ItemType.STATS, tenant_id)}
+        if last_modified:
+            try:
+                _request(
+                    table.update_item,
+                    Key=key,
+                    UpdateExpression=f"SET #updated_at = :updated_at, #last_modified = :last_modified{add_expression}",
+                    ConditionExpression="attribute_not_exists(#last_modified) OR #last_modified.#at < :at",
+                    ExpressionAttributeNames={**names, "#last_modified": STATS_LAST_MODIFIED_ATTRIBUTE, "#at": "at"},
+                    ExpressionAttributeValues={**values, ":last_modified": last_modified, ":at": last_modified["at"]},
+                )
+                return
+            except ClientError as client_error:
+                if client_error.response.get("Error", {}).get("Code", "") != "ConditionalCheckFailedException":
+                    raise
+                # a newer modification was already stored, only the counters are updated
+
+        _request(
+            table.update_item,
+            Key=key,
+            UpdateExpression=f"SET #updated_at = :updated_at{add_expression}",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+    @staticmethod
+    @start_span("database_add_rate_limit_usage")
+    def add_rate_limit_usage(tenant_id: str, window: int, cost: int, limit: int, expires_at: int) -> bool:
+        """
+        Atomically count requests of the tenant in a rate limit window, unless they exceed its limit
+        :param tenant_id: tenant sending the requests
+        :param window: number of the window
+        :param cost: number of requests to count
+        :param limit: maximum number of requests in the window
+        :param expires_at: epoch time after which the window is deleted by the table's time to live
+        :return: whether the requests fit into the limit, nothing is counted otherwise
+        """
+        try:
+            _request(
+                table_cache.get(TABLE_NAME, tenant_id).update_item,
+                Key={PK_KEY: _get_db_key(ItemType.RATE_LIMIT, tenant_id, str(window))},
+                UpdateExpression="ADD #count :cost SET #expires_at = :expires_at",
+                ConditionExpression="attribute_not_exists(#count) OR #count <= :remaining",
+                ExpressionAttributeNames={"#count": RATE_LIMIT_COUNT_ATTRIBUTE, "#expires_at": EXPIRES_AT_ATTRIBUTE},
+                ExpressionAttributeValues={":cost": cost, ":remaining": limit - cost, ":expires_at": expires_at},
+            )
+        except ClientError as client_error:
+            if client_error.response.get("Error", {}).get("Code", "") != "ConditionalCheckFailedException":
+                raise
+            return False
+        return True
+
+    @staticmethod
+    @start_span("database_get_stats")
+    def get_stats(tenant_id: str) -> dict[str, Any]:
+        """
+        Read the tenant's stats item
+        :param tenant_id: tenant the stats belong to
+        :return: number of items by item type, last modification and time of the last update,
+            zero counts when nothing was recorded for the tenant yet
+        """
+        logger.info("Fetching stats from DB", extra={"tenant_id": tenant_id})
+        response = _request(
+            table_cache.get(TABLE_NAME, tenant_id).get_item, Key={PK_KEY: _get_db_key(ItemType.STATS, tenant_id)}
+        )
+        item = response.get("Item") or {}
+        return {
+            "counts": {
+                item_type.value: int(item.get(f"{item_type.value}{STATS_COUNT_SUFFIX}", 0))
+                for item_type in STATS_ITEM_TYPES
+            },
+            "last_modified": item.get(STATS_LAST_MODIFIED_ATTRIBUTE),
+            "updated_at": item.get(STATS_UPDATED_AT_ATTRIBUTE),
+        }
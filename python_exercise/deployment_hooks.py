@@ -2,6 +2,7 @@
 
 import boto3
 
+# created during the init phase and reused by all invocations of the container
 codedeploy = boto3.client("codedeploy")
 
 # EVENT
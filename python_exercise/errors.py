@@ -44,3 +44,150 @@ class ItemConflict(ItemErrorBase):
     def __init__(self, item_type: str, tenant: str, item_id: str):
         self.msg = f"Item of type {item_type} [{tenant}:{item_id}] already exists."
         super().__init__(self.msg)
+
+
+class ItemVersionMismatch(ItemErrorBase):
+    """
+    Raised when the `Item` was changed since the version the client sent in If-Match
+    """
+
+    http_code = HTTPStatus.PRECONDITION_FAILED
+
+    def __init__(self, item_type: str, tenant: str, item_id: str):
+        self.msg = f"Item of type {item_type} [{tenant}:{item_id}] version mismatch, it was changed since."
+        super().__init__(self.msg)
+
+
+class ItemsUnprocessed(ItemErrorBase):
+    """
+    Raised when DynamoDB keeps returning part of a batch request as unprocessed
+    after all retries were used
+    """
+
+    http_code = HTTPStatus.SERVICE_UNAVAILABLE
+
+    def __init__(self, item_type: str, tenant: str, count: int):
+        self.msg = f"{count} items of type {item_type} [{tenant}] could not be processed, retry later."
+        super().__init__(self.msg)
+
+
+class DatabaseOverloaded(ItemErrorBase):
+    """
+    Base of the errors raised when the table can not take more requests at the moment
+    """
+
+    def __init__(self, msg: str, retry_after: float):
+        self.msg = msg
+        self.retry_after = retry_after
+        super().__init__(self.msg)
+
+
+class DatabaseThrottled(DatabaseOverloaded):
+    """
+    Raised when DynamoDB kept throttling a request after all retries were used
+    """
+
+    code = "DatabaseThrottled"
+    title = "Database Throttled"
+    http_code = HTTPStatus.TOO_MANY_REQUESTS
+
+    def __init__(self, retry_after: float):
+        super().__init__("Requests to the database are throttled, retry later.", retry_after)
+
+
+class DatabaseUnavailable(DatabaseOverloaded):
+    """
+    Raised while the circuit breaker is open after repeated throttling
+    """
+
+    code = "DatabaseUnavailable"
+    title = "Database Unavailable"
+    http_code = HTTPStatus.SERVICE_UNAVAILABLE
+
+    def __init__(self, retry_after: float):
+        super().__init__("The database is overloaded, retry later.", retry_after)
+
+
+class TenantRateLimited(DatabaseOverloaded):
+    """
+    Raised when the tenant sent more requests than its share of the table allows
+    """
+
+    code = "TenantRateLimited"
+    title = "Tenant Rate Limited"
+    http_code = HTTPStatus.TOO_MANY_REQUESTS
+
+    def __init__(self, tenant: str, retry_after: float):
+        super().__init__(f"Rate limit of tenant [{tenant}] exceeded, retry later.", retry_after)
+
+
+class InvalidCursor(ItemErrorBase):
+    """
+    Raised when a pagination cursor was not returned by a previous request
+    """
+
+    http_code = HTTPStatus.BAD_REQUEST
+
+    def __init__(self, cursor: str):
+        self.msg = f"Cursor [{cursor}] is not valid."
+        super().__init__(self.msg)
+
+
+class InvalidQueryParameters(ItemErrorBase):
+    """
+    Raised when query parameters of the request are missing or not valid
+    """
+
+    http_code = HTTPStatus.BAD_REQUEST
+
+    def __init__(self, names: list[str]):
+        self.msg = f"Query parameters [{','.join(names)}] are not valid."
+        super().__init__(self.msg)
+
+
+class IdempotencyKeyReused(ItemErrorBase):
+    """
+    Raised when an idempotency key is sent again with a different request
+    """
+
+    http_code = HTTPStatus.UNPROCESSABLE_ENTITY
+
+    def __init__(self, tenant: str, key: str):
+        self.msg = f"Idempotency key [{tenant}:{key}] was already used for a different request."
+        super().__init__(self.msg)
+
+
+class IdempotencyKeyInUse(ItemErrorBase):
+    """
+    Raised when a request with the same idempotency key is still being processed
+    """
+
+    http_code = HTTPStatus.CONFLICT
+
+    def __init__(self, tenant: str, key: str):
+        self.msg = f"Request with idempotency key [{tenant}:{key}] is being processed, retry later."
+        super().__init__(self.msg)
+
+
+class InvalidFields(ItemErrorBase):
+    """
+    Raised when fields requested for a sparse fieldset are not fields of the Item model
+    """
+
+    http_code = HTTPStatus.BAD_REQUEST
+
+    def __init__(self, fields: list[str]):
+        self.msg = f"Fields [{','.join(fields)}] are not valid."
+        super().__init__(self.msg)
+
+
+class InvalidIdempotencyKey(ItemErrorBase):
+    """
+    Raised when the Idempotency-Key header is empty or too long
+    """
+
+    http_code = HTTPStatus.BAD_REQUEST
+
+    def __init__(self, key: str):
+        self.msg = f"Idempotency key [{key}] must have between 1 and 255 characters."
+        super().__init__(self.msg)
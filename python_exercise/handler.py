@@ -5,10 +5,9 @@ API Gateway Handlers
 This module contains functions that handle incoming invocations from API Gateway
 """
 
-import json
 from http import HTTPStatus
+from typing import Any, Optional
 
-from aws_lambda_powertools.utilities.parser import event_parser
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from botocore.exceptions import ClientError
 from evertz_io_identity_lib.event import get_identity_from_event
@@ -16,18 +15,143 @@ from evertz_io_observability.decorators import join_trace
 from evertz_io_observability.otel_collector import export_trace
 from evertz_io_observability.target_services import ExportService
 from lambda_event_sources.event_sources import EventSource
+from pydantic import BaseModel, ValidationError
 
-from context import logger
+from api_response import (
+    ETAG_HEADER,
+    ITEM_FIELDS,
+    build_response,
+    client_error_response,
+    dumps,
+    etag_matches,
+    item_body,
+    item_error,
+    item_error_response,
+    item_etag,
+    items_body,
+    not_modified_response,
+)
+from cache import identity_cache, item_cache
+from context import logger, sample_log_level
 from db import Db
-from errors import ItemConflict, ItemNotFound
-from models import ErrorsBody, Headers, Item, ItemIdPathParam, ItemModel
+from errors import InvalidFields, InvalidIdempotencyKey, InvalidQueryParameters, ItemErrorBase
+from metrics import IDENTITY, instrument, metrics
+from models import (
+    BatchCreateQueryParam,
+    FieldsQueryParam,
+    ItemIdPathParam,
+    ItemIdsQueryParam,
+    ItemModel,
+    ItemPatchModel,
+    ItemsModel,
+    ListItemsQueryParam,
+    event_model,
+)
 from service import Service
 
+AUTHORIZATION_HEADER = "Authorization"
+# Request header making create requests safe to retry
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Response header set when the response was stored by an earlier request with the same key
+IDEMPOTENT_REPLAYED_HEADER = "Idempotent-Replayed"
+# Request header with the ETags of the copies of an item the client has
+IF_NONE_MATCH_HEADER = "If-None-Match"
+# Request header with the ETag of the item the changes were made to
+IF_MATCH_HEADER = "If-Match"
+
+
+def _header(headers: Optional[dict[str, str]], name: str) -> Optional[str]:
+    """
+    Get request header, header names are compared case-insensitively
+
+    :param headers: request headers
+    :param name: name of the header
+    :return: value of the header, None when the request has none
+    """
+    for header_name, value in (headers or {}).items():
+        if header_name.lower() == name.lower():
+            return value
+    return None
+
+
+def _idempotency_key(headers: Optional[dict[str, str]]) -> Optional[str]:
+    """
+    Get idempotency key sent with the request
+
+    :param headers: request headers
+    :return: the key, None when the request has none
+    """
+    value = _header(headers, IDEMPOTENCY_KEY_HEADER)
+    if value is not None and not 0 < len(value) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise InvalidIdempotencyKey(value)
+    return value
+
+
+def _decode_identity(event: ItemModel) -> Any:
+    """
+    Decode identity of the caller, lightweight events keep the event as it was received,
+    so it does not have to be serialised back into a dict
+
+    :param event: parsed event
+    :return: identity with the caller's tenant and user
+    """
+    raw_event = getattr(event, "raw_event", None)
+    return get_identity_from_event(event=raw_event if raw_event is not None else event.dict(), verify=False)
+
+
+def _identity(event: ItemModel) -> Any:
+    """
+    Get identity of the caller, decoded identities are cached by bearer token until the token expires
+
+    :param event: parsed event
+    :return: identity with the caller's tenant and user
+    """
+    with metrics.stage(IDENTITY):
+        token = _header(event.headers, AUTHORIZATION_HEADER)
+        if token is None:
+            return _decode_identity(event)
+        return identity_cache.get(token, lambda: _decode_identity(event))
+
+
+def _query_parameters(model: type[BaseModel], query_string_parameters: Optional[dict[str, str]]) -> Any:
+    """
+    Validate query parameters of the request
+
+    :param model: model of the query parameters
+    :param query_string_parameters: query parameters of the request
+    :return: the validated parameters
+    """
+    try:
+        return model.validate(query_string_parameters or {})
+    except ValidationError as error:
+        names = sorted({str(detail["loc"][0]) for detail in error.errors() if detail["loc"]})
+        raise InvalidQueryParameters(names) from error
+
+
+def _fields(query_string_parameters: Optional[dict[str, str]]) -> Optional[list[str]]:
+    """
+    Get fields of the sparse fieldset requested by the client
+
+    :param query_string_parameters: query parameters of the request
+    :return: the fields of the Item model to return, None for all of them
+    """
+    try:
+        fields = FieldsQueryParam.validate(query_string_parameters or {}).fields
+    except ValidationError as error:
+        # fields only fail validation when none are selected, e.g. fields= or fields=,
+        raise InvalidFields([(query_string_parameters or {}).get("fields", "")]) from error
+    if fields is not None:
+        unknown = [field for field in fields if field not in ITEM_FIELDS]
+        if unknown:
+            raise InvalidFields(unknown)
+    return fields
+
 
 # pylint: disable=no-value-for-parameter
 @export_trace(export_service=ExportService.OTEL_COLLECTOR_LAYER)
 @join_trace(event_source=EventSource.API_GATEWAY_REQUEST)
-@event_parser(model=ItemModel)
+@instrument("create_item", model=event_model(ItemModel))
 def create_item(event: ItemModel, context: LambdaContext) -> dict:
     """
     Create item
@@ -35,58 +159,39 @@ def create_item(event: ItemModel, context: LambdaContext) -> dict:
     :param event: event with data to process
     :param context: lambda execution context
     """
-    logger.info(f"Event: {event}")
-    logger.info(f"Context: {context}")
+    sample_log_level()
+    logger.debug("Event", extra={"event": event})
+    logger.debug("Context", extra={"context": context})
 
-    identity = get_identity_from_event(event=event.dict(), verify=False)
+    identity = _identity(event)
     tenant_id = identity.tenant
     item_data = event.body.dict()
     request_id = event.requestContext.requestId
 
     # Database served as dependency injection here, so it will be easier to test this or mock it base on level 0
-    service = Service(Db(), tenant_id, identity.sub)
-    logger.info(f"Creating Item {item_data}")
-    logger.info(f"With Tenant Context: [{tenant_id}]")
+    service = Service(Db(), tenant_id, identity.sub, item_cache)
+    logger.info("Creating item", extra={"tenant_id": tenant_id})
     try:
-        item = service.create_item(item=item_data)
-        response = {
-            "statusCode": HTTPStatus.OK,
-            "headers": Headers(content_type="application/vnd.api+json").dict(by_alias=True),
-            "body": json.dumps(item, indent=4),
-        }
-    except ItemConflict as error:
-        error_context = {
-            "id": request_id,
-            "code": error.code,
-            "title": error.title,
-            "detail": error.msg,
-            "status": "409",
-        }
-        response = {
-            "statusCode": HTTPStatus.CONFLICT,
-            "headers": Headers(content_type="application/vnd.api+json").dict(by_alias=True),
-            "body": ErrorsBody(errors=[error_context]).json(),
-        }
+        idempotency_key = _idempotency_key(event.headers)
+        if idempotency_key is None:
+            item = service.create_item(item=item_data)
+            response = build_response(HTTPStatus.OK, dumps(item), headers={ETAG_HEADER: item_etag(item)})
+        else:
+            item, replayed = service.create_item_idempotent(item=item_data, idempotency_key=idempotency_key)
+            response = build_response(HTTPStatus.OK, dumps(item), headers={ETAG_HEADER: item_etag(item)})
+            if replayed:
+                response["headers"][IDEMPOTENT_REPLAYED_HEADER] = "true"
+    except ItemErrorBase as error:
+        response = item_error_response(request_id, error)
     except ClientError as error:
-        error_context = {
-            "id": request_id,
-            "code": 400,
-            "title": "Unknown error",
-            "detail": error.args[0],
-            "status": "400",
-        }
-        response = {
-            "statusCode": HTTPStatus.BAD_REQUEST,
-            "headers": Headers(content_type="application/vnd.api+json").dict(by_alias=True),
-            "body": ErrorsBody(errors=[error_context]).json(),
-        }
+        response = client_error_response(request_id, error)
     return response
 
 
 # pylint: disable=no-value-for-parameter
 @export_trace(export_service=ExportService.OTEL_COLLECTOR_LAYER)
 @join_trace(event_source=EventSource.API_GATEWAY_REQUEST)
-@event_parser(model=ItemModel)
+@instrument("get_item", model=event_model(ItemModel))
 def get_item(event: ItemModel, context: LambdaContext) -> dict:
     """
     Retrieve an item
@@ -94,50 +199,209 @@ def get_item(event: ItemModel, context: LambdaContext) -> dict:
     :param event: event with data to process
     :param context: lambda execution context
     """
-    logger.info(f"Event: {event}")
-    logger.info(f"Context: {context}")
-    identity = get_identity_from_event(event=event.dict(), verify=False)
+    sample_log_level()
+    logger.debug("Event", extra={"event": event})
+    logger.debug("Context", extra={"context": context})
+    identity = _identity(event)
     path_parameters = ItemIdPathParam.validate(event.pathParameters)
     item_id = path_parameters.item_id
     tenant_id = identity.tenant
     request_id = event.requestContext.requestId
 
-    logger.info(f"Getting Item: [{item_id}]")
-    logger.info(f"With Tenant Context: [{tenant_id}]")
+    logger.info("Getting item", extra={"item_id": item_id, "tenant_id": tenant_id})
+
+    # Database served as dependency injection here, so it will be easier to test this or mock it base on level 0
+    service = Service(Db(), tenant_id, identity.sub, item_cache)
+    try:
+        fields = _fields(event.queryStringParameters)
+        # clients polling for changes send the ETag they have, which is checked without reading the whole item
+        if_none_match = _header(event.headers, IF_NONE_MATCH_HEADER)
+        etag = service.get_item_etag(item_id=item_id) if if_none_match is not None else None
+        if etag is not None and etag_matches(if_none_match, etag):
+            response = not_modified_response(etag)
+        else:
+            existing_item, etag = service.get_item_with_etag(item_id=item_id, fields=fields)
+            response = build_response(
+                HTTPStatus.OK, item_body(existing_item, fields=fields), headers={ETAG_HEADER: etag}
+            )
+    except ItemErrorBase as error:
+        response = item_error_response(request_id, error)
+    except ClientError as error:
+        response = client_error_response(request_id, error)
+    return response
+
+
+# pylint: disable=no-value-for-parameter
+@export_trace(export_service=ExportService.OTEL_COLLECTOR_LAYER)
+@join_trace(event_source=EventSource.API_GATEWAY_REQUEST)
+@instrument("update_item", model=event_model(ItemPatchModel))
+def update_item(event: ItemPatchModel, context: LambdaContext) -> dict:
+    """
+    Change some fields of an item
+
+    :param event: event with the changed fields
+    :param context: lambda execution context
+    """
+    sample_log_level()
+    logger.debug("Event", extra={"event": event})
+    logger.debug("Context", extra={"context": context})
+    identity = _identity(event)
+    item_id = ItemIdPathParam.validate(event.pathParameters).item_id
+    tenant_id = identity.tenant
+    request_id = event.requestContext.requestId
+    changes = event.body.dict(exclude_unset=True) if event.body is not None else {}
+
+    logger.info("Updating item", extra={"item_id": item_id, "tenant_id": tenant_id})
+
+    # Database served as dependency injection here, so it will be easier to test this or mock it base on level 0
+    service = Service(Db(), tenant_id, identity.sub, item_cache)
+    try:
+        removed = [field for field, value in changes.items() if value is None]
+        if removed:
+            # fields of the Item model are required, so they can not be removed
+            raise InvalidFields(removed)
+        if changes:
+            item = service.update_item(
+                item_id=item_id, changes=changes, if_match=_header(event.headers, IF_MATCH_HEADER)
+            )
+        else:
+            item = service.get_item(item_id=item_id)
+        response = build_response(HTTPStatus.OK, item_body(item), headers={ETAG_HEADER: item_etag(item)})
+    except ItemErrorBase as error:
+        response = item_error_response(request_id, error)
+    except ClientError as error:
+        response = client_error_response(request_id, error)
+    return response
+
+
+# pylint: disable=no-value-for-parameter
+@export_trace(export_service=ExportService.OTEL_COLLECTOR_LAYER)
+@join_trace(event_source=EventSource.API_GATEWAY_REQUEST)
+@instrument("get_item_stats", model=event_model(ItemModel))
+def get_item_stats(event: ItemModel, context: LambdaContext) -> dict:
+    """
+    Retrieve the tenant's item counts and last modification
+
+    :param event: event with data to process
+    :param context: lambda execution context
+    """
+    sample_log_level()
+    logger.debug("Event", extra={"event": event})
+    logger.debug("Context", extra={"context": context})
+    identity = _identity(event)
+    tenant_id = identity.tenant
+    request_id = event.requestContext.requestId
+
+    logger.info("Getting item stats", extra={"tenant_id": tenant_id})
 
     # Database served as dependency injection here, so it will be easier to test this or mock it base on level 0
     service = Service(Db(), tenant_id, identity.sub)
     try:
-        existing_item = service.get_item(item_id=item_id)
-        response = {
-            "statusCode": HTTPStatus.OK,
-            "headers": Headers(content_type="application/vnd.api+json").dict(by_alias=True),
-            "body": Item(**existing_item).json(),
-        }
-    except ItemNotFound as error:
-        error_context = {
-            "id": request_id,
-            "code": error.code,
-            "title": error.title,
-            "detail": error.msg,
-            "status": "404",
-        }
-        response = {
-            "statusCode": HTTPStatus.NOT_FOUND,
-            "headers": Headers(content_type="application/vnd.api+json").dict(by_alias=True),
-            "body": ErrorsBody(errors=[error_context]).json(),
-        }
+        response = build_response(HTTPStatus.OK, dumps(service.get_stats()))
+    except ItemErrorBase as error:
+        response = item_error_response(request_id, error)
+    except ClientError as error:
+        response = client_error_response(request_id, error)
+    return response
+
+
+def _get_items_by_ids(service: Service, query_parameters: ItemIdsQueryParam) -> str:
+    """
+    Build response body with the items given by ids
+
+    :param service: service scoped to the tenant
+    :param query_parameters: ids of the items to get
+    """
+    item_ids = list(dict.fromkeys(query_parameters.ids))
+    existing_items = service.get_items(item_ids=item_ids)
+    return items_body(
+        [existing_items[item_id] for item_id in item_ids if item_id in existing_items],
+        meta={"not_found": [item_id for item_id in item_ids if item_id not in existing_items]},
+    )
+
+
+def _list_items(service: Service, query_parameters: ListItemsQueryParam) -> str:
+    """
+    Build response body with a page of tenant's items
+
+    :param service: service scoped to the tenant
+    :param query_parameters: page size, cursor and creation time range
+    """
+    items, cursor = service.list_items(
+        limit=query_parameters.limit,
+        cursor=query_parameters.cursor,
+        created_after=query_parameters.created_after,
+        created_before=query_parameters.created_before,
+    )
+    return items_body(items, meta={"cursor": cursor})
+
+
+# pylint: disable=no-value-for-parameter
+@export_trace(export_service=ExportService.OTEL_COLLECTOR_LAYER)
+@join_trace(event_source=EventSource.API_GATEWAY_REQUEST)
+@instrument("get_items", model=event_model(ItemModel))
+def get_items(event: ItemModel, context: LambdaContext) -> dict:
+    """
+    Retrieve multiple items, either the ones given by ids or a page of all tenant's items
+
+    :param event: event with data to process
+    :param context: lambda execution context
+    """
+    sample_log_level()
+    logger.debug("Event", extra={"event": event})
+    logger.debug("Context", extra={"context": context})
+    identity = _identity(event)
+    query_string_parameters = event.queryStringParameters or {}
+    tenant_id = identity.tenant
+    request_id = event.requestContext.requestId
+
+    logger.info("Getting items", extra={"query": query_string_parameters, "tenant_id": tenant_id})
+
+    # Database served as dependency injection here, so it will be easier to test this or mock it base on level 0
+    service = Service(Db(), tenant_id, identity.sub, item_cache)
+    try:
+        if "ids" in query_string_parameters:
+            body = _get_items_by_ids(service, _query_parameters(ItemIdsQueryParam, query_string_parameters))
+        else:
+            body = _list_items(service, _query_parameters(ListItemsQueryParam, query_string_parameters))
+        response = build_response(HTTPStatus.OK, body)
+    except ItemErrorBase as error:
+        response = item_error_response(request_id, error)
+    except ClientError as error:
+        response = client_error_response(request_id, error)
+    return response
+
+
+# pylint: disable=no-value-for-parameter
+@export_trace(export_service=ExportService.OTEL_COLLECTOR_LAYER)
+@join_trace(event_source=EventSource.API_GATEWAY_REQUEST)
+@instrument("create_items", model=event_model(ItemsModel))
+def create_items(event: ItemsModel, context: LambdaContext) -> dict:
+    """
+    Create multiple items in bulk
+
+    :param event: event with data to process
+    :param context: lambda execution context
+    """
+    sample_log_level()
+    logger.debug("Event", extra={"event": event})
+    logger.debug("Context", extra={"context": context})
+
+    identity = _identity(event)
+    tenant_id = identity.tenant
+    items_data = [item.dict() for item in event.body]
+    query_parameters = BatchCreateQueryParam.validate(event.queryStringParameters or {})
+    request_id = event.requestContext.requestId
+
+    # Database served as dependency injection here, so it will be easier to test this or mock it base on level 0
+    service = Service(Db(), tenant_id, identity.sub, item_cache)
+    logger.info("Creating items", extra={"count": len(items_data), "tenant_id": tenant_id})
+    try:
+        items, conflicts = service.create_items(items=items_data, check_conflicts=query_parameters.check_conflicts)
+        errors = [item_error(request_id, error) for error in conflicts]
+        response = build_response(HTTPStatus.OK, dumps({"data": items, "meta": {"conflicts": errors}}))
+    except ItemErrorBase as error:
+        response = item_error_response(request_id, error)
     except ClientError as error:
-        error_context = {
-            "id": request_id,
-            "code": 400,
-            "title": "Unknown error",
-            "detail": error.args[0],
-            "status": "400",
-        }
-        response = {
-            "statusCode": HTTPStatus.BAD_REQUEST,
-            "headers": Headers(content_type="application/vnd.api+json").dict(by_alias=True),
-            "body": ErrorsBody(errors=[error_context]).json(),
-        }
+        response = client_error_response(request_id, error)
     return response
@@ -0,0 +1,226 @@
+"""
+Time ordered item ids.
+
+New items get version 7 UUIDs, which start with the millisecond the item was created at, so ids
+sort in the order the items were created and stay valid UUIDs for clients. The global secondary
+index sorts a tenant's items by id, which turns reading the items created in a time range into
+a key condition on the id. Items created before with random version 4 ids are never part of
+a time range.
+"""
+
+import base64
+import binascii
+import datetime
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from boto3.dynamodb.conditions import Key
+
+from errors import InvalidCursor
+
+UUID_VERSION = 7
+
+# Maximum value of the 12 bit counter ordering ids created in the same millisecond
+MAX_SEQUENCE = 0xFFF
+
+
+class TimeOrderedIds:
+    """
+    Generator of version 7 UUIDs, ids created by the same generator are strictly increasing.
+    The 12 bits after the timestamp count the ids of the same millisecond from a random start,
+    the remaining 62 bits are random.
+    """
+
+    def __init__(self):
+        self._last_ms = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def new(self) -> uuid.UUID:
+        """
+        Create id
+        """
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                # starting in the lower half leaves room for the ids of the same millisecond
+                self._sequence = random.getrandbits(11)  # nosec B311
+            elif self._sequence < MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                # the counter overflowed or the clock went back, the timestamp is moved forward instead
+                self._last_ms += 1
+                self._sequence = 0
+            timestamp, sequence = self._last_ms, self._sequence
+        return uuid.UUID(
+            int=timestamp << 80
+            | UUID_VERSION << 76
+            | sequence << 64
+            | 0b10 << 62
+            | random.getrandbits(62)  # nosec B311
+        )
+
+
+time_ordered_ids = TimeOrderedIds()
+
+
+def new_item_id() -> str:
+    """
+    Create id of a new item
+    """
+    return str(time_ordered_ids.new())
+
+
+def is_time_ordered(item_id: str) -> bool:
+    """
+    Check whether the item id is a version 7 UUID, i.e. its position reflects the time the item was created
+    :param item_id: id of the item
+    """
+    try:
+        return uuid.UUID(item_id).version == UUID_VERSION
+    except ValueError:
+        return False
+
+
+def encode_cursor(item_id: str) -> str:
+    """
+    Build opaque pagination cursor pointing after the given item
+    :param item_id: id of the last item of a page
+    :return: cursor
+    """
+    return base64.urlsafe_b64encode(item_id.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Read item id from pagination cursor.
+    Only the item id is taken from the cursor, keys are built for the tenant of the request,
+    so a cursor can never be used to read items of another tenant.
+    :param cursor: cursor returned with the previous page
+    :return: id of the item the next page starts after
+    """
+    try:
+        item_id = base64.b64decode(cursor.encode(), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeError) as error:
+        raise InvalidCursor(cursor) from error
+    if not item_id:
+        raise InvalidCursor(cursor)
+    return item_id
+
+
+def _epoch_ms(value: datetime.datetime) -> int:
+    """
+    Convert time to milliseconds since the epoch, times without timezone are UTC like the modification info
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def first_id(created_at: datetime.datetime) -> str:
+    """
+    Get the lowest id an item created at the time can have
+    :param created_at: time the item was created at, with millisecond precision
+    """
+    return str(uuid.UUID(int=_epoch_ms(created_at) << 80 | UUID_VERSION << 76 | 0b10 << 62))
+
+
+def last_id(created_at: datetime.datetime) -> str:
+    """
+    Get the highest id an item created at the time can have
+    :param created_at: time the item was created at, with millisecond precision
+    """
+    return str(
+        uuid.UUID(
+            int=_epoch_ms(created_at) << 80 | UUID_VERSION << 76 | MAX_SEQUENCE << 64 | 0b10 << 62 | (1 << 62) - 1
+        )
+    )
+
+
+@dataclass(frozen=True)
+class IdRange:
+    """
+    Range of item ids read from the global secondary index
+    :param after: id the range starts after, e.g. the last id of the previous page
+    :param start: first id of the range
+    :param end: last id of the range
+    :param time_ordered: whether only version 7 ids are in the range
+    """
+
+    after: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    time_ordered: bool = False
+
+    @staticmethod
+    def after_cursor(cursor: Optional[str]) -> "IdRange":
+        """
+        Build range of all ids after the item of the cursor
+        :param cursor: cursor returned with the previous page, None to start from the beginning
+        """
+        return IdRange(after=decode_cursor(cursor) if cursor else None)
+
+    @staticmethod
+    def created(
+        created_after: Optional[datetime.datetime], created_before: Optional[datetime.datetime], cursor: Optional[str]
+    ) -> "IdRange":
+        """
+        Build range of the ids of items created in a time range
+        :param created_after: the items were created at or after this time, None for no bound
+        :param created_before: the items were created before this time, None for no bound
+        :param cursor: cursor returned with the previous page, None to start from the beginning
+        """
+        return IdRange(
+            after=decode_cursor(cursor) if cursor else None,
+            start=first_id(created_after) if created_after is not None else None,
+            end=last_id(created_before - datetime.timedelta(milliseconds=1)) if created_before is not None else None,
+            time_ordered=True,
+        )
+
+    def key_condition(self, attribute: str) -> Optional[Any]:
+        """
+        Build key condition selecting the range
+        :param attribute: name of the sort key holding the ids
+        :return: condition or None when the range is not bounded
+        """
+        key = Key(attribute)
+        low = self.start
+        if self.after is not None and (low is None or self.after >= low):
+            if self.end is None:
+                return key.gt(self.after)
+            # the item the range starts after is read too, contains leaves it out
+            low = self.after
+        if low is not None and self.end is not None:
+            return key.between(low, self.end)
+        if low is not None:
+            return key.gte(low)
+        if self.end is not None:
+            return key.lte(self.end)
+        return None
+
+    def is_empty(self) -> bool:
+        """
+        Check whether no id can be in the range
+        """
+        if self.end is None:
+            return False
+        if self.after is not None and (self.start is None or self.after >= self.start):
+            return self.after >= self.end
+        return self.start is not None and self.start > self.end
+
+    def contains(self, item_id: str) -> bool:
+        """
+        Check whether the id is in the range
+        :param item_id: id of the item
+        """
+        return (
+            (self.after is None or item_id > self.after)
+            and (self.start is None or item_id >= self.start)
+            and (self.end is None or item_id <= self.end)
+            and (not self.time_ordered or is_time_ordered(item_id))
+        )
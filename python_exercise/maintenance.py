@@ -0,0 +1,333 @@
+"""
+Maintenance jobs running over the whole table, e.g. backfills and migrations.
+
+Items are read with a parallel Scan, every segment is processed by its own thread and
+the capacity consumed by all segments and the writes of the callback is limited together,
+so a job does not throttle the live traffic. Progress is checkpointed per segment, so a crashed run can be resumed.
+Items of the last processed page may be passed to the callback again after a resume,
+so callbacks have to be idempotent.
+
+Usage::
+
+    python maintenance.py backfill-global-secondary --checkpoint backfill.json
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from config import TABLE_NAME
+from context import logger
+from db import GSI_PK_KEY, PK_KEY, ItemKeys, ItemType, parse_db_key
+from resilience import is_throttling
+
+# Defaults for the scan
+DEFAULT_TOTAL_SEGMENTS = 8
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_CAPACITY_PER_SECOND = 100.0
+MIN_CAPACITY_PER_SECOND = 5.0
+
+# Number of seconds all segments pause after a request was throttled
+THROTTLE_PAUSE = 1.0
+
+
+# Callback processing single item, receives tenant, type and the raw item as stored in database,
+# returns the capacity units consumed by its writes, so they are limited together with the scan.
+# Writes are sent straight to the table, the ClientError of a throttled write pauses the scan and runs it again.
+ItemCallback = Callable[[str, ItemType, dict[str, Any]], Optional[float]]
+
+
+class CapacityRateLimiter:
+    """
+    Limits capacity units consumed per second by all segments together.
+
+    The rate is adapted additive-increase/multiplicative-decrease style: it grows slowly
+    while requests succeed and is halved whenever DynamoDB throttles a request.
+    """
+
+    def __init__(
+        self, capacity_per_second: float, min_capacity_per_second: float = MIN_CAPACITY_PER_SECOND, step: float = 1.0
+    ):
+        self.max_rate = capacity_per_second
+        self.min_rate = min(min_capacity_per_second, capacity_per_second)
+        self.rate = capacity_per_second
+        self.step = step
+        self._next_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, capacity_units: float):
+        """
+        Account capacity consumed by a request and wait until it fits into the current rate
+        :param capacity_units: capacity units reported by DynamoDB for the request
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + capacity_units / self.rate
+            self.rate = min(self.max_rate, self.rate + self.step)
+        if start > now:
+            time.sleep(start - now)
+
+    def throttled(self):
+        """
+        Slow down and pause all segments after DynamoDB throttled a request
+        """
+        with self._lock:
+            self._next_time = max(self._next_time, time.monotonic()) + THROTTLE_PAUSE
+            self.rate = max(self.min_rate, self.rate / 2)
+            logger.warning("Scan throttled", extra={"capacity_per_second": self.rate})
+
+
+class FileCheckpoints:
+    """
+    Progress of every segment stored in a JSON file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._segments: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as checkpoint_file:
+                self._segments = json.load(checkpoint_file)
+
+    def get(self, segment: int) -> dict[str, Any]:
+        """
+        Read progress of the segment
+        :param segment: segment number
+        :return: dict with optional "start_key" to continue from and "done" flag
+        """
+        return self._segments.get(str(segment), {})
+
+    def save(self, segment: int, start_key: Optional[dict], done: bool = False):
+        """
+        Store progress of the segment, the file is replaced atomically
+        :param segment: segment number
+        :param start_key: key to continue the segment from
+        :param done: whether the whole segment was processed
+        """
+        with self._lock:
+            self._segments[str(segment)] = {"start_key": start_key, "done": done}
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as checkpoint_file:
+                json.dump(self._segments, checkpoint_file)
+            os.replace(temporary_path, self.path)
+
+
+@dataclass
+class ScanStats:
+    """
+    Number of items processed by the scan grouped by tenant and item type
+    """
+
+    items: Counter = field(default_factory=Counter)
+    consumed_capacity: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, groups: Counter, capacity_units: float):
+        """
+        Add results of a single page
+        :param groups: number of items by (tenant, item type)
+        :param capacity_units: capacity consumed by the page and the writes of its items
+        """
+        with self._lock:
+            self.items.update(groups)
+            self.consumed_capacity += capacity_units
+
+
+@dataclass(frozen=True)
+class _Scan:
+    """
+    Settings and state shared by all segments of a scan
+    """
+
+    table: Any
+    total_segments: int
+    page_size: int
+    callback: ItemCallback
+    limiter: CapacityRateLimiter
+    checkpoints: Optional[FileCheckpoints]
+    stats: ScanStats
+
+
+def _process_item(scan: _Scan, tenant_id: str, item_type: ItemType, item: dict[str, Any]) -> float:
+    """
+    Run callback for a single item, again after a pause when its writes were throttled
+    :param scan: scan the item was read by
+    :param tenant_id: tenant of the item
+    :param item_type: type of the item
+    :param item: the raw item
+    :return: capacity units consumed by the callback
+    """
+    while True:
+        try:
+            return scan.callback(tenant_id, item_type, item) or 0.0
+        except ClientError as client_error:
+            if not is_throttling(client_error):
+                raise
+            scan.limiter.throttled()
+            scan.limiter.consume(0)
+
+
+def _scan_segment(scan: _Scan, segment: int):
+    """
+    Process all items of a single segment
+    :param scan: scan the segment belongs to
+    :param segment: segment number
+    """
+    checkpoints = scan.checkpoints
+    progress = checkpoints.get(segment) if checkpoints else {}
+    if progress.get("done"):
+        logger.info("Segment already done", extra={"segment": segment})
+        return
+
+    kwargs: dict[str, Any] = {
+        "Segment": segment,
+        "TotalSegments": scan.total_segments,
+        "Limit": scan.page_size,
+        "ReturnConsumedCapacity": "TOTAL",
+    }
+    if progress.get("start_key"):
+        kwargs["ExclusiveStartKey"] = progress["start_key"]
+
+    while True:
+        try:
+            response = scan.table.scan(**kwargs)
+        except ClientError as client_error:
+            if not is_throttling(client_error):
+                raise
+            scan.limiter.throttled()
+            scan.limiter.consume(0)
+            continue
+
+        capacity_units = response.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0)
+        groups: Counter = Counter()
+        for item in response.get("Items", []):
+            try:
+                tenant_id, item_type, _ = parse_db_key(item[PK_KEY])
+            except ValueError:
+                logger.warning("Skipping item with unknown key", extra={"key": item[PK_KEY]})
+                continue
+            capacity_units += _process_item(scan, tenant_id, item_type, item)
+            groups[(tenant_id, item_type)] += 1
+        scan.stats.add(groups, capacity_units)
+
+        start_key = response.get("LastEvaluatedKey")
+        if checkpoints:
+            checkpoints.save(segment, start_key, done=start_key is None)
+        if start_key is None:
+            return
+        kwargs["ExclusiveStartKey"] = start_key
+        scan.limiter.consume(capacity_units)
+
+
+# pylint: disable=too-many-arguments
+def parallel_scan(
+    callback: ItemCallback,
+    *,
+    total_segments: int = DEFAULT_TOTAL_SEGMENTS,
+    checkpoint_path: Optional[str] = None,
+    capacity_per_second: float = DEFAULT_CAPACITY_PER_SECOND,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    table=None,
+) -> ScanStats:
+    """
+    Run callback for every item in the table
+    :param callback: function called with tenant, item type and the raw item
+    :param total_segments: number of segments scanned in parallel
+    :param checkpoint_path: JSON file to store progress in, the scan resumes from it if it exists.
+        Resuming requires the same total_segments as the original run.
+    :param capacity_per_second: maximum capacity units consumed per second by the scan and the writes of callback
+    :param page_size: number of items read by a single Scan request
+    :param table: table to scan, defaults to TABLE_NAME
+    :return: number of processed items by tenant and item type
+    """
+    scan = _Scan(
+        table=table or boto3.resource("dynamodb").Table(TABLE_NAME),
+        total_segments=total_segments,
+        page_size=page_size,
+        callback=callback,
+        limiter=CapacityRateLimiter(capacity_per_second),
+        checkpoints=FileCheckpoints(checkpoint_path) if checkpoint_path else None,
+        stats=ScanStats(),
+    )
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        futures = [executor.submit(_scan_segment, scan, segment) for segment in range(total_segments)]
+        for future in futures:
+            future.result()
+
+    stats = scan.stats
+    logger.info(
+        "Scan finished",
+        extra={"count": sum(stats.items.values()), "consumed_capacity": stats.consumed_capacity},
+    )
+    return stats
+
+
+def backfill_global_secondary(table) -> ItemCallback:
+    """
+    Build callback writing the global secondary key to items stored before it was written by Db
+    :param table: table to update
+    :return: callback for parallel_scan
+    """
+
+    def _backfill(tenant_id: str, item_type: ItemType, item: dict[str, Any]) -> Optional[float]:
+        _, _, item_id = parse_db_key(item[PK_KEY])
+        # idempotency records are never read through the GSI
+        if item_id is None or GSI_PK_KEY in item or item_type in (ItemType.IDEMPOTENCY, ItemType.RATE_LIMIT):
+            return None
+        response = table.update_item(
+            Key={PK_KEY: item[PK_KEY]},
+            UpdateExpression="SET #gsi_pk = :gsi_pk",
+            ConditionExpression="attribute_exists(#pk)",
+            ExpressionAttributeNames={"#gsi_pk": GSI_PK_KEY, "#pk": PK_KEY},
+            ExpressionAttributeValues={":gsi_pk": ItemKeys.get_keys(item_type, tenant_id, item_id).global_secondary},
+            ReturnConsumedCapacity="TOTAL",
+        )
+        return response.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0)
+
+    return _backfill
+
+
+JOBS = {"backfill-global-secondary": backfill_global_secondary}
+
+
+def main():
+    """
+    Run maintenance job from command line
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("job", choices=sorted(JOBS))
+    parser.add_argument("--segments", type=int, default=DEFAULT_TOTAL_SEGMENTS)
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--capacity", type=float, default=DEFAULT_CAPACITY_PER_SECOND)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    arguments = parser.parse_args()
+
+    table = boto3.resource("dynamodb").Table(TABLE_NAME)
+    stats = parallel_scan(
+        JOBS[arguments.job](table),
+        total_segments=arguments.segments,
+        checkpoint_path=arguments.checkpoint,
+        capacity_per_second=arguments.capacity,
+        page_size=arguments.page_size,
+        table=table,
+    )
+    for (tenant_id, item_type), count in sorted(
+        stats.items.items(), key=lambda group: (group[0][0], group[0][1].value)
+    ):
+        print(f"{tenant_id}\t{item_type.value}\t{count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Per invocation latency metrics of the request stages, written as CloudWatch Embedded Metric Format.
+
+Every entry point invocation writes a single EMF line to stdout, which CloudWatch Logs turns into
+metrics, so no collector or extra API calls are needed. Durations of a stage are summed over all
+its occurrences in the invocation, e.g. every DynamoDB request, including requests made in parallel.
+"""
+
+import json
+import sys
+import threading
+import time
+from functools import lru_cache, wraps
+from typing import Callable, Optional, Union
+
+from aws_lambda_powertools.utilities.parser import parse
+
+from config import METRICS_ENABLED, METRICS_NAMESPACE
+from context import deadline
+
+# Stages of a request
+EVENT_PARSE = "event_parse"
+IDENTITY = "identity"
+RESTRICTED_TABLE = "restricted_table"
+DYNAMODB = "dynamodb"
+SERIALISATION = "serialisation"
+
+# Metric with the capacity units reported by DynamoDB through ReturnConsumedCapacity
+CONSUMED_CAPACITY = "consumed_capacity"
+
+# Metrics counting lookups of the decoded identity cache
+IDENTITY_CACHE_HITS = "identity_cache_hits"
+IDENTITY_CACHE_MISSES = "identity_cache_misses"
+
+# Metrics counting lookups of the restricted table handle cache
+RESTRICTED_TABLE_CACHE_HITS = "restricted_table_cache_hits"
+RESTRICTED_TABLE_CACHE_MISSES = "restricted_table_cache_misses"
+RESTRICTED_TABLE_CACHE_REFRESHES = "restricted_table_cache_refreshes"
+
+DIMENSIONS = ["operation", "cold_start"]
+
+
+@lru_cache(maxsize=64)
+def _metric_directives(stages: tuple[str, ...], counters: tuple[str, ...]) -> str:
+    """
+    Serialised CloudWatchMetrics directives, built once for every combination of recorded metrics
+    :param stages: names of the stages recorded in an invocation
+    :param counters: names of the counters recorded in an invocation
+    """
+    definitions = [{"Name": "duration", "Unit": "Milliseconds"}]
+    for name in stages:
+        definitions.append({"Name": name, "Unit": "Milliseconds"})
+        definitions.append({"Name": f"{name}_count", "Unit": "Count"})
+    for name in counters:
+        definitions.append({"Name": name, "Unit": "Count"})
+    directives = [{"Namespace": METRICS_NAMESPACE, "Dimensions": [DIMENSIONS], "Metrics": definitions}]
+    return json.dumps(directives, separators=(",", ":"))
+
+
+class _Stage:
+    """
+    Context manager adding its duration to the stage
+    """
+
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder: "MetricsRecorder", name: str):
+        self.recorder = recorder
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.add_duration(self.name, time.perf_counter() - self.start)
+
+
+class MetricsRecorder:
+    """
+    Collects stage durations, consumed capacity and other counters of the current invocation
+    """
+
+    def __init__(self, output=None):
+        self.output = output
+        self.cold_start = True
+        self.operation: Optional[str] = None
+        self._start = 0.0
+        # total duration in seconds and number of occurrences by stage
+        self._stages: dict[str, list] = {}
+        self._counters: dict[str, float] = {CONSUMED_CAPACITY: 0}
+        self._lock = threading.Lock()
+
+    def start(self, operation: str):
+        """
+        Start recording a new invocation
+        :param operation: name of the invoked entry point
+        """
+        self.operation = operation
+        self._stages = {}
+        self._counters = {CONSUMED_CAPACITY: 0}
+        self._start = time.perf_counter()
+
+    def stage(self, name: str) -> _Stage:
+        """
+        Time a stage, e.g.::
+
+            with metrics.stage(DYNAMODB):
+                table.get_item(Key=key)
+
+        :param name: name of the stage
+        """
+        return _Stage(self, name)
+
+    def add_duration(self, name: str, seconds: float):
+        """
+        Add duration of a single occurrence of the stage
+        :param name: name of the stage
+        :param seconds: duration in seconds
+        """
+        with self._lock:
+            stage = self._stages.setdefault(name, [0.0, 0])
+            stage[0] += seconds
+            stage[1] += 1
+
+    def add_capacity(self, consumed_capacity: Union[dict, list, None]):
+        """
+        Add capacity consumed by a DynamoDB request
+        :param consumed_capacity: ConsumedCapacity of the response, a list for batch requests
+        """
+        if not consumed_capacity:
+            return
+        if isinstance(consumed_capacity, dict):
+            consumed_capacity = [consumed_capacity]
+        self.add_count(
+            CONSUMED_CAPACITY, sum(float(capacity.get("CapacityUnits", 0)) for capacity in consumed_capacity)
+        )
+
+    def add_count(self, name: str, value: float = 1):
+        """
+        Add to a counter of the invocation
+        :param name: name of the counter
+        :param value: amount to add
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def line(self) -> str:
+        """
+        Build the EMF line of the current invocation, only the values are formatted per invocation
+        """
+        values = "".join(
+            f',"{name}":{seconds * 1000:.3f},"{name}_count":{count}' for name, (seconds, count) in self._stages.items()
+        )
+        counters = "".join(f',"{name}":{value}' for name, value in self._counters.items())
+        directives = _metric_directives(tuple(self._stages), tuple(self._counters))
+        return (
+            f'{{"_aws":{{"Timestamp":{int(time.time() * 1000)},"CloudWatchMetrics":{directives}}},'
+            f'"operation":{json.dumps(self.operation)},"cold_start":"{str(self.cold_start).lower()}",'
+            f'"duration":{(time.perf_counter() - self._start) * 1000:.3f}{values}{counters}}}\n'
+        )
+
+    def flush(self):
+        """
+        Write the EMF entry of the current invocation, later invocations of the container are warm
+        """
+        if METRICS_ENABLED and self.operation is not None:
+            output = self.output or sys.stdout
+            output.write(self.line())
+        self.operation = None
+        self.cold_start = False
+
+
+metrics = MetricsRecorder()
+
+
+def instrument(operation: str, model=None) -> Callable:
+    """
+    Decorate entry point to record its metrics, the event is parsed into the model as the first stage
+    :param operation: name of the entry point, used as the operation dimension
+    :param model: pydantic model of the event, None to pass the event as it is
+    """
+
+    def decorator(handler: Callable) -> Callable:
+        @wraps(handler)
+        def wrapper(event, context):
+            metrics.start(operation)
+            deadline.start(context)
+            try:
+                if model is not None:
+                    with metrics.stage(EVENT_PARSE):
+                        event = parse(event=event, model=model)
+                return handler(event, context)
+            finally:
+                metrics.flush()
+
+        return wrapper
+
+    return decorator
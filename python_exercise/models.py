@@ -2,10 +2,18 @@
 Models for AWS ApiGateway and Lambda request and response
 """
 
-from typing import Optional
+from datetime import datetime
+from typing import Any, Optional
 
-from aws_lambda_powertools.utilities.parser.models import APIGatewayProxyEventModel
-from pydantic import BaseModel, Field, Json
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel,
+    DynamoDBStreamChangedRecordModel,
+    DynamoDBStreamModel,
+    DynamoDBStreamRecordModel,
+)
+from pydantic import BaseModel, Field, Json, PrivateAttr, create_model, field_validator, model_validator
+
+from config import EVENT_PARSING_MODE
 
 
 class Item(BaseModel):
@@ -15,12 +23,56 @@ class Item(BaseModel):
     text: str
 
 
+# Item model with every field optional, validates the fields selected by sparse fieldsets
+PartialItem = create_model(
+    "PartialItem", **{name: (Optional[field.annotation], None) for name, field in Item.model_fields.items()}
+)
+
+
 class ItemIdPathParam(BaseModel):
     """Item Id Path parameter inside ApiGateway event"""
 
     item_id: str
 
 
+class ItemIdsQueryParam(BaseModel):
+    """Comma separated Item Ids query parameter inside ApiGateway event"""
+
+    # at most as many ids as a single BatchGetItem request reads
+    ids: list[str] = Field(min_length=1, max_length=100)
+
+    @field_validator("ids", mode="before")
+    @classmethod
+    def split_ids(cls, value):
+        """Split comma separated ids"""
+        if isinstance(value, str):
+            return [item_id.strip() for item_id in value.split(",") if item_id.strip()]
+        return value
+
+
+class FieldsQueryParam(BaseModel):
+    """Comma separated fields of the Item model to return inside ApiGateway event, all fields when missing"""
+
+    fields: Optional[list[str]] = Field(default=None, min_length=1)
+
+    @field_validator("fields", mode="before")
+    @classmethod
+    def split_fields(cls, value):
+        """Split comma separated fields"""
+        if isinstance(value, str):
+            return [field.strip() for field in value.split(",") if field.strip()]
+        return value
+
+
+class ListItemsQueryParam(BaseModel):
+    """Pagination and creation time range query parameters inside ApiGateway event"""
+
+    limit: int = Field(default=25, ge=1, le=100)
+    cursor: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+
 class RequestContext(BaseModel):
     """Model for request context inside ApiGateway event"""
 
@@ -34,6 +86,115 @@ class ItemModel(APIGatewayProxyEventModel):
     body: Optional[Json[Item]]  # type: ignore[assignment]
 
 
+class ItemsModel(APIGatewayProxyEventModel):
+    """ApiGateway event schema for bulk requests"""
+
+    # pylint: disable=unsubscriptable-object
+    body: Optional[Json[list[Item]]]  # type: ignore[assignment]
+
+
+class ItemPatchModel(APIGatewayProxyEventModel):
+    """ApiGateway event schema for partial updates"""
+
+    # pylint: disable=unsubscriptable-object
+    body: Optional[Json[PartialItem]]  # type: ignore[assignment,valid-type]
+
+
+class LightRequestContext(BaseModel):
+    """Parts of the request context inside ApiGateway event used by the handlers"""
+
+    requestId: str
+    authorizer: Optional[dict[str, Any]] = None
+
+
+class LightEventModel(BaseModel):
+    """
+    Parts of the ApiGateway event used by the handlers, the rest of the event is not validated.
+    The event as it was received is kept, so identity is read from it without serialising the model.
+    """
+
+    headers: Optional[dict[str, str]] = None
+    queryStringParameters: Optional[dict[str, str]] = None
+    pathParameters: Optional[dict[str, str]] = None
+    requestContext: LightRequestContext
+    _raw_event: dict = PrivateAttr(default_factory=dict)
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def keep_raw_event(cls, value, handler):
+        """Keep the event the model was validated from"""
+        event = handler(value)
+        if isinstance(value, dict):
+            event._raw_event = value  # pylint: disable=protected-access
+        return event
+
+    @property
+    def raw_event(self) -> dict:
+        """ApiGateway event as it was received"""
+        return self._raw_event
+
+
+class LightItemModel(LightEventModel):
+    """Lightweight ApiGateway event schema"""
+
+    # pylint: disable=unsubscriptable-object
+    body: Optional[Json[Item]] = None
+
+
+class LightItemsModel(LightEventModel):
+    """Lightweight ApiGateway event schema for bulk requests"""
+
+    # pylint: disable=unsubscriptable-object
+    body: Optional[Json[list[Item]]] = None
+
+
+class LightItemPatchModel(LightEventModel):
+    """Lightweight ApiGateway event schema for partial updates"""
+
+    # pylint: disable=unsubscriptable-object
+    body: Optional[Json[PartialItem]] = None  # type: ignore[valid-type]
+
+
+# Lightweight variants of the event models, used in the light parsing mode
+LIGHT_EVENT_MODELS = {ItemModel: LightItemModel, ItemsModel: LightItemsModel, ItemPatchModel: LightItemPatchModel}
+
+
+def event_model(model: type[BaseModel]) -> type[BaseModel]:
+    """
+    Select model validating events of an entry point
+    :param model: full model of the event
+    :return: the full model, or its lightweight variant when EVENT_PARSING_MODE is light
+    """
+    if EVENT_PARSING_MODE == "light":
+        return LIGHT_EVENT_MODELS.get(model, model)
+    return model
+
+
+class BatchCreateQueryParam(BaseModel):
+    """Bulk create query parameters inside ApiGateway event"""
+
+    check_conflicts: bool = False
+
+
+class StreamChangedRecordModel(DynamoDBStreamChangedRecordModel):
+    """DynamoDB stream record change"""
+
+    # the parent declares a date, which rejects the epoch seconds with time of day that the stream sends
+    ApproximateCreationDateTime: Optional[datetime] = None  # type: ignore[assignment]
+
+
+class StreamRecordModel(DynamoDBStreamRecordModel):
+    """DynamoDB stream record"""
+
+    dynamodb: StreamChangedRecordModel
+
+
+class StreamModel(DynamoDBStreamModel):
+    """DynamoDB stream event schema"""
+
+    Records: list[StreamRecordModel]  # type: ignore[assignment]
+
+
 class Headers(BaseModel):
     """Response headers"""
 
@@ -49,3 +210,18 @@ class ErrorsBody(BaseModel):
     """Errors"""
 
     errors: list
+
+
+class ListedItem(Item):
+    """Item returned in a list, with the id, version and modification info needed to fetch or update it"""
+
+    id: str
+    version: Optional[int] = None
+    modification_info: Optional[dict[str, Any]] = None
+
+
+class ItemsBody(BaseModel):
+    """Multiple items response"""
+
+    data: list[ListedItem]
+    meta: dict
@@ -0,0 +1,203 @@
+"""
+Per tenant fair-share rate limits of the requests sent to the shared table.
+
+Every tenant gets a token bucket refilled at its rate up to its burst, Service takes tokens from it
+before every Db call, so a tenant running a bulk job is rejected with 429 long before the table
+throttles the requests of the other tenants.
+
+In "local" mode buckets live in the memory of the container, so the limit applies to every container
+on its own and costs nothing but a lock. In "table" mode the requests of all containers are counted
+by atomic counters of fixed windows in the table, one window holds the tenant's burst and lasts
+burst / rate seconds. A container that saw a window full rejects the tenant's requests without
+asking the table again until the window ends.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Mapping, Optional
+
+from config import TENANT_RATE_BURST, TENANT_RATE_LIMIT, TENANT_RATE_LIMIT_MODE, TENANT_RATE_LIMITS
+from context import logger
+from db import Db
+from errors import TenantRateLimited
+from metrics import metrics
+
+LOCAL = "local"
+TABLE = "table"
+
+# Counter of the EMF line
+TENANT_RATE_LIMITED = "tenant_rate_limited"
+
+# Maximum number of tenants whose buckets are kept in a warm container
+MAX_TENANTS = 1024
+
+# Seconds rate limit windows are kept in the table after they end
+WINDOW_RETENTION = 60
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Rate limit of a tenant
+    :param rate: number of requests per second, 0 for no limit
+    :param burst: number of requests that can be sent at once after being idle
+    """
+
+    rate: float
+    burst: float
+
+    @property
+    def window(self) -> float:
+        """
+        Length in seconds of the windows counting the requests in table mode
+        """
+        return self.burst / self.rate
+
+
+def rate_limit(rate: float, burst: float = 0) -> RateLimit:
+    """
+    Build rate limit, the burst is one second worth of requests when it is not set
+    :param rate: number of requests per second, 0 for no limit
+    :param burst: number of requests that can be sent at once, 0 for the default
+    """
+    return RateLimit(rate=rate, burst=burst or max(rate, 1))
+
+
+def parse_limits(value: str) -> dict[str, RateLimit]:
+    """
+    Parse limits of single tenants as set in TENANT_RATE_LIMITS
+    :param value: JSON object mapping tenant to an object with rate and optional burst
+    :return: limits by tenant
+    """
+    return {tenant: rate_limit(limit["rate"], limit.get("burst", 0)) for tenant, limit in json.loads(value).items()}
+
+
+class TokenBucket:
+    """
+    Tokens of a single tenant
+    """
+
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated_at = now
+
+    def take(self, limit: RateLimit, cost: float, now: float) -> float:
+        """
+        Take tokens for requests when the bucket has enough of them
+        :param limit: rate limit of the tenant
+        :param cost: number of tokens to take
+        :param now: current time.monotonic()
+        :return: 0 when the tokens were taken, otherwise seconds until the bucket has enough of them
+        """
+        self.tokens = min(limit.burst, self.tokens + (now - self.updated_at) * limit.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / limit.rate
+
+
+class TenantRateLimiter:
+    """
+    Rate limits of all tenants
+    """
+
+    def __init__(self, default: RateLimit, limits: Mapping[str, RateLimit], mode: str = LOCAL):
+        """
+        :param default: limit of the tenants without their own limit
+        :param limits: limits by tenant
+        :param mode: "local" to limit requests of this container, "table" to limit requests of all containers
+        """
+        self.default = default
+        self.limits = dict(limits)
+        self.mode = mode
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        # end of the last window found full by tenant, in table mode
+        self._full_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def limit(self, tenant_id: str) -> Optional[RateLimit]:
+        """
+        Get rate limit of the tenant
+        :param tenant_id: tenant sending the requests
+        :return: the limit, None when the tenant's requests are not limited
+        """
+        limit = self.limits.get(tenant_id, self.default)
+        return limit if limit.rate > 0 else None
+
+    def acquire(self, tenant_id: str, cost: float = 1):
+        """
+        Admit requests of the tenant, a single call costs at most the tenant's whole burst
+        :param tenant_id: tenant sending the requests
+        :param cost: number of requests
+        :raises TenantRateLimited: when the tenant has no capacity left for the requests
+        """
+        limit = self.limit(tenant_id)
+        if limit is None:
+            return
+        cost = min(cost, limit.burst)
+        if self.mode == TABLE:
+            retry_after = self._acquire_table(tenant_id, limit, cost)
+        else:
+            retry_after = self._acquire(tenant_id, limit, cost)
+        if retry_after:
+            metrics.add_count(TENANT_RATE_LIMITED)
+            logger.debug("Tenant rate limited", extra={"tenant_id": tenant_id, "retry_after": retry_after})
+            raise TenantRateLimited(tenant_id, retry_after)
+
+    def _acquire(self, tenant_id: str, limit: RateLimit, cost: float) -> float:
+        """
+        Take tokens from the tenant's bucket in this container
+        :return: 0 when the requests are admitted, otherwise seconds until they would be
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(tenant_id)
+            if bucket is None:
+                bucket = self._buckets[tenant_id] = TokenBucket(limit.burst, now)
+                if len(self._buckets) > MAX_TENANTS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(tenant_id)
+            return bucket.take(limit, cost, now)
+
+    def _acquire_table(self, tenant_id: str, limit: RateLimit, cost: float) -> float:
+        """
+        Count requests in the tenant's current window in the table
+        :return: 0 when the requests are admitted, otherwise seconds until the window ends
+        """
+        now = time.time()
+        full_until = self._full_until.get(tenant_id, 0.0)
+        if now < full_until:
+            return full_until - now
+
+        window = int(now // limit.window)
+        window_end = (window + 1) * limit.window
+        if Db.add_rate_limit_usage(
+            tenant_id=tenant_id,
+            window=window,
+            cost=int(cost),
+            limit=int(limit.burst),
+            expires_at=int(window_end) + WINDOW_RETENTION,
+        ):
+            return 0.0
+        self._full_until[tenant_id] = window_end
+        return window_end - now
+
+    def clear(self):
+        """
+        Forget the usage of all tenants
+        """
+        with self._lock:
+            self._buckets.clear()
+            self._full_until.clear()
+
+
+tenant_rate_limiter = TenantRateLimiter(
+    rate_limit(TENANT_RATE_LIMIT, TENANT_RATE_BURST), parse_limits(TENANT_RATE_LIMITS), TENANT_RATE_LIMIT_MODE
+)
@@ -0,0 +1,190 @@
+"""
+Resilience of DynamoDB requests under throttling.
+
+Throttled requests are retried with jittered exponential backoff while the invocation has time
+left for another attempt. Requests still throttled after the last attempt count towards a circuit
+breaker shared by the invocations of a warm container. While it is open requests fail fast instead
+of adding load to a hot partition, and clients are told when to retry.
+
+The retries of the SDK are turned off by AWS_MAX_ATTEMPTS=1 in the template, so every attempt
+is made here and counted by the circuit breaker and the metrics.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from botocore.exceptions import ClientError
+
+from config import CIRCUIT_BREAKER_RESET_TIMEOUT, CIRCUIT_BREAKER_THRESHOLD, DB_MAX_ATTEMPTS
+from context import deadline, logger
+from errors import DatabaseThrottled, DatabaseUnavailable
+from metrics import metrics
+
+# Error codes DynamoDB returns when a request was throttled
+THROTTLING_ERROR_CODES = {"ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded"}
+# Reasons of cancelled transactions DynamoDB returns when a part of the transaction was throttled
+THROTTLING_CANCELLATION_REASONS = {"ProvisionedThroughputExceeded", "ThrottlingError"}
+
+# Counters of the EMF line
+DB_RETRIES = "db_retries"
+DB_THROTTLED = "db_throttled"
+CIRCUIT_BREAKER_OPENED = "circuit_breaker_opened"
+CIRCUIT_BREAKER_REJECTIONS = "circuit_breaker_rejections"
+
+# Backoff of the retries in seconds, full jitter up to min(cap, base * 2 ** attempt)
+RETRY_BACKOFF_BASE = 0.05
+RETRY_BACKOFF_CAP = 1.0
+
+# Seconds left after the last attempt to send the response before the function times out
+DEADLINE_MARGIN = 0.5
+
+# Seconds clients are asked to wait when their request was throttled
+THROTTLED_RETRY_AFTER = 1.0
+
+
+def is_throttling(error: ClientError) -> bool:
+    """
+    Check whether DynamoDB throttled the request
+    :param error: error returned by DynamoDB
+    """
+    return error.response.get("Error", {}).get("Code", "") in THROTTLING_ERROR_CODES
+
+
+class CircuitBreaker:
+    """
+    Breaker opened by consecutive throttled requests. Once the reset timeout passes a single
+    trial request is let through, it closes the breaker when it succeeds and opens it again otherwise.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        """
+        :param threshold: number of consecutive throttled requests opening the breaker
+        :param reset_timeout: number of seconds the breaker stays open before a trial request
+        """
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Decide whether a request can be sent
+        :return: False while the breaker is open
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # a trial that never reported back does not block the breaker for longer than the timeout
+            if self._trial_at is not None and now - self._trial_at < self.reset_timeout:
+                return False
+            self._trial_at = now
+            return True
+
+    def retry_after(self) -> float:
+        """
+        Get number of seconds until the breaker lets a request through
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def success(self):
+        """
+        Record request that was not throttled, closing the breaker
+        """
+        with self._lock:
+            self.failures = 0
+            self.opened_at = self._trial_at = None
+
+    def failure(self) -> bool:
+        """
+        Record request that was still throttled after all attempts
+        :return: whether the breaker was opened by it
+        """
+        with self._lock:
+            self.failures += 1
+            self._trial_at = None
+            if self.failures < self.threshold:
+                return False
+            self.opened_at = time.monotonic()
+            return True
+
+    def stats(self) -> dict[str, object]:
+        """
+        Get state of the breaker
+        :return: whether it is open and the number of consecutive throttled requests
+        """
+        with self._lock:
+            return {"open": self.opened_at is not None, "failures": self.failures}
+
+
+circuit_breaker = CircuitBreaker(CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_RESET_TIMEOUT)
+
+
+def retry_delay(attempt: int) -> Optional[float]:
+    """
+    Pick delay before the next attempt of a request, exponential backoff with full jitter
+    :param attempt: number of the attempt that just failed, starting from 0
+    :return: seconds to wait, None when the invocation has no time left for another attempt
+    """
+    delay = random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2**attempt))  # nosec B311
+    remaining = deadline.remaining()
+    if remaining is not None and remaining - delay < DEADLINE_MARGIN:
+        return None
+    return delay
+
+
+def backoff(attempt: int) -> bool:
+    """
+    Wait before the next attempt of a request, e.g. of the part of a batch DynamoDB returned unprocessed
+    :param attempt: number of the attempt that just failed, starting from 0
+    :return: False without waiting when the invocation has no time left for another attempt
+    """
+    delay = retry_delay(attempt)
+    if delay is None:
+        return False
+    time.sleep(delay)
+    return True
+
+
+def call_with_retries(send: Callable[[], dict]) -> dict:
+    """
+    Send DynamoDB request, retrying it while it is throttled
+    :param send: sends the request
+    :return: response
+    :raises DatabaseUnavailable: when the circuit breaker is open
+    :raises DatabaseThrottled: when the request was throttled by the last attempt
+    """
+    if not circuit_breaker.allow():
+        metrics.add_count(CIRCUIT_BREAKER_REJECTIONS)
+        raise DatabaseUnavailable(circuit_breaker.retry_after())
+
+    attempt = 0
+    while True:
+        try:
+            response = send()
+        except ClientError as client_error:
+            if not is_throttling(client_error):
+                circuit_breaker.success()
+                raise
+            metrics.add_count(DB_THROTTLED)
+            delay = retry_delay(attempt)
+            attempt += 1
+            if attempt >= DB_MAX_ATTEMPTS or delay is None:
+                if circuit_breaker.failure():
+                    metrics.add_count(CIRCUIT_BREAKER_OPENED)
+                    logger.warning("Circuit breaker opened", extra=circuit_breaker.stats())
+                raise DatabaseThrottled(THROTTLED_RETRY_AFTER) from client_error
+            metrics.add_count(DB_RETRIES)
+            time.sleep(delay)
+            continue
+        circuit_breaker.success()
+        return response
@@ -3,43 +3,260 @@ Manage items.
 """
 
 import datetime
-import uuid
+import hashlib
+import json
+import time
+from typing import IO, Optional
 
 from evertz_io_observability.decorators import start_span
 
+from api_response import dumps, etag_version, is_weak_etag, item_etag
+from cache import NOT_FOUND, ItemCache
 from context import logger
-from db import Db, ItemType
+from db import VERSION_FIELD, Db, IdempotencyKey, ItemType, ItemUpdate
+from errors import IdempotencyKeyReused, ItemConflict, ItemNotFound, ItemVersionMismatch, TenantRateLimited
+from ids import IdRange, new_item_id
+from rate_limit import tenant_rate_limiter
 
 
 class Service:
     """Manager Context for Item Actions"""
 
-    def __init__(self, database: Db, tenant_id: str, user_id: str):
+    def __init__(self, database: Db, tenant_id: str, user_id: str, cache: Optional[ItemCache] = None):
         self.tenant_id = tenant_id
         self.user_id = user_id
         self.database = database
+        self.cache = cache
+
+    def _admit(self, cost: int = 1):
+        """
+        Take the tenant's share of the table for a database call, before any work is done for it
+
+        :param cost: The number of items the call reads or writes by id, 1 for other calls
+        :raises TenantRateLimited: when the tenant sent more requests than its rate limit allows
+        """
+        tenant_rate_limiter.acquire(self.tenant_id, cost)
 
     @start_span("service_get_item")
-    def get_item(self, item_id: str) -> dict:
+    def get_item(self, item_id: str, fields: Optional[list[str]] = None) -> dict:
         """
         Get an item using a tenant id to scope the lookup
 
         :param item_id: The id of the user to fetch
-        :return: The full info of the item
+        :param fields: The fields to read, together with the version of the item, None to read the whole item
+        :return: The full info of the item, or only its selected fields
         """
-        logger.info(f"Getting item: {item_id}")
-        return self.database.get_item(item_type=ItemType.ITEM, tenant_id=self.tenant_id, item_id=item_id)
+        logger.info("Getting item", extra={"item_id": item_id, "fields": fields})
+        if self.cache is None:
+            return self._read_item(item_id, fields)
 
-    @start_span("service_create_item")
-    def create_item(self, item: dict) -> dict:
+        cached = self.cache.get(ItemType.ITEM, self.tenant_id, item_id)
+        if cached == NOT_FOUND:
+            raise ItemNotFound(ItemType.ITEM.value, self.tenant_id, item_id)
+        if cached is not None:
+            return cached
+
+        if fields:
+            # partial items are not cached, a cached item is always whole
+            try:
+                return self._read_item(item_id, fields)
+            except ItemNotFound:
+                self.cache.set_not_found(ItemType.ITEM, self.tenant_id, item_id)
+                raise
+
+        self._admit()
+        try:
+            item = self.database.get_item(item_type=ItemType.ITEM, tenant_id=self.tenant_id, item_id=item_id)
+        except ItemNotFound:
+            self.cache.set_not_found(ItemType.ITEM, self.tenant_id, item_id)
+            raise
+        self.cache.set(ItemType.ITEM, self.tenant_id, item_id, item)
+        return item
+
+    def _read_item(self, item_id: str, fields: Optional[list[str]] = None) -> dict:
         """
-        Create item
+        Read an item from database, projecting the selected fields and the version
 
-        :param item: the item data to be saved
+        :param item_id: The id of the item
+        :param fields: The fields to read, None to read the whole item
+        :return: The item data
+        """
+        if fields:
+            fields = list(dict.fromkeys([*fields, VERSION_FIELD]))
+        self._admit()
+        return self.database.get_item(item_type=ItemType.ITEM, tenant_id=self.tenant_id, item_id=item_id, fields=fields)
 
-        :return: Dict
+    @start_span("service_get_item_etag")
+    def get_item_etag(self, item_id: str) -> str:
+        """
+        Get ETag of an item reading only its version, so checking whether a client's copy is current is cheap.
+        The version is read consistently from database, as the cached item may have been changed by another container,
+        a cached item with another version is dropped.
+
+        :param item_id: The id of the item
+        :return: The ETag of the item
+        """
+        logger.info("Getting item ETag", extra={"item_id": item_id})
+        self._admit()
+        try:
+            version = self.database.get_item(
+                item_type=ItemType.ITEM,
+                tenant_id=self.tenant_id,
+                item_id=item_id,
+                fields=[VERSION_FIELD],
+                consistent=True,
+            )
+        except ItemNotFound:
+            if self.cache is not None:
+                self.cache.invalidate(ItemType.ITEM, self.tenant_id, item_id)
+            raise
+        if VERSION_FIELD not in version:
+            # the item was stored before versions were added, its ETag is a hash of the whole item,
+            # which is only changed by an update adding the version
+            return item_etag(self.get_item(item_id))
+        if self.cache is not None:
+            cached = self.cache.get(ItemType.ITEM, self.tenant_id, item_id)
+            if cached is not None and (cached == NOT_FOUND or cached.get(VERSION_FIELD) != version[VERSION_FIELD]):
+                self.cache.invalidate(ItemType.ITEM, self.tenant_id, item_id)
+        return item_etag(version)
+
+    @start_span("service_get_item_with_etag")
+    def get_item_with_etag(self, item_id: str, fields: Optional[list[str]] = None) -> tuple[dict, str]:
+        """
+        Get an item together with its ETag, the ETag of the whole item also for a sparse fieldset,
+        so clients can send it in If-None-Match whichever fields they read
+
+        :param item_id: The id of the item
+        :param fields: The fields to read, None to read the whole item
+        :return: The item, or only its selected fields, and the ETag of the item
+        """
+        item = self.get_item(item_id, fields)
+        if not fields or VERSION_FIELD in item:
+            return item, item_etag(item)
+        # the item was stored before versions were added, its ETag is a hash of the whole item
+        return item, item_etag(self.get_item(item_id))
+
+    @start_span("service_get_items")
+    def get_items(self, item_ids: list[str]) -> dict[str, dict]:
+        """
+        Get multiple items in a single database round trip using a tenant id to scope the lookup
+
+        :param item_ids: The ids of the items to fetch
+        :return: The full info of the found items by item id
+        """
+        logger.info("Getting items", extra={"count": len(item_ids)})
+        if self.cache is None:
+            self._admit(len(item_ids))
+            return self.database.batch_get_items(item_type=ItemType.ITEM, tenant_id=self.tenant_id, item_ids=item_ids)
+
+        items = {}
+        missing_ids = []
+        for item_id in dict.fromkeys(item_ids):
+            cached = self.cache.get(ItemType.ITEM, self.tenant_id, item_id)
+            if cached is None:
+                missing_ids.append(item_id)
+            elif cached != NOT_FOUND:
+                items[item_id] = cached
+
+        if missing_ids:
+            self._admit(len(missing_ids))
+            fetched = self.database.batch_get_items(
+                item_type=ItemType.ITEM, tenant_id=self.tenant_id, item_ids=missing_ids
+            )
+            for item_id in missing_ids:
+                if item_id in fetched:
+                    self.cache.set(ItemType.ITEM, self.tenant_id, item_id, fetched[item_id])
+                else:
+                    self.cache.set_not_found(ItemType.ITEM, self.tenant_id, item_id)
+            items.update(fetched)
+        return items
+
+    @start_span("service_list_items")
+    def list_items(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        created_after: Optional[datetime.datetime] = None,
+        created_before: Optional[datetime.datetime] = None,
+    ) -> tuple[list[dict], Optional[str]]:
+        """
+        List items of the tenant page by page, only the items created in the time range when it is given.
+        Items are found by creation time only when they have time ordered ids, see ids.
+
+        :param limit: The maximum number of items to return
+        :param cursor: The cursor returned with the previous page
+        :param created_after: The items were created at or after this time
+        :param created_before: The items were created before this time
+        :return: The full info of the items and the cursor for the next page
+        """
+        logger.info(
+            "Listing items", extra={"limit": limit, "created_after": created_after, "created_before": created_before}
+        )
+        if created_after is None and created_before is None:
+            self._admit()
+            return self.database.query_items(
+                item_type=ItemType.ITEM, tenant_id=self.tenant_id, limit=limit, cursor=cursor
+            )
+
+        id_range = IdRange.created(created_after, created_before, cursor)
+        self._admit()
+        return self.database.query_items_in_range(
+            item_type=ItemType.ITEM, tenant_id=self.tenant_id, limit=limit, id_range=id_range
+        )
+
+    @start_span("service_get_stats")
+    def get_stats(self) -> dict:
+        """
+        Get the tenant's item counts and last modification maintained from the table stream
+
+        :return: The stats of the tenant
+        """
+        logger.info("Getting stats")
+        self._admit()
+        return self.database.get_stats(tenant_id=self.tenant_id)
+
+    @start_span("service_export_items")
+    def export_items(
+        self, output: IO[str], page_size: int = 100, cursor: Optional[str] = None, deadline: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        Write all items of the tenant to output as newline-delimited JSON, one item at a time
+
+        :param output: The file-like object to write to
+        :param page_size: The number of items read from database at once
+        :param cursor: The cursor returned by the previous export, None to start from the beginning
+        :param deadline: The time.monotonic() value after which the export stops, None to export everything
+        :return: The cursor to resume the export from, None when all items were exported
+        """
+        logger.info("Exporting items", extra={"cursor": cursor})
+        self._admit()
+        for index, (item, item_cursor) in enumerate(
+            self.database.iter_items(
+                item_type=ItemType.ITEM, tenant_id=self.tenant_id, page_size=page_size, cursor=cursor
+            )
+        ):
+            # every page read from database is admitted, the export stops at the limit with the cursor to resume from
+            if index and index % page_size == 0:
+                try:
+                    self._admit()
+                except TenantRateLimited:
+                    logger.info("Export stopped at rate limit", extra={"cursor": item_cursor})
+                    return item_cursor
+            output.write(dumps(item))
+            output.write("\n")
+            # at least one item is exported by every call, so resumed exports always make progress
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.info("Export stopped at deadline", extra={"cursor": item_cursor})
+                return item_cursor
+        return None
+
+    def _new_item(self, item: dict) -> dict:
+        """
+        Add id, version and modification info to item that is about to be created
+
+        :param item: the item data to be saved
+        :return: the same item with generated fields
         """
-        logger.info(f"Creating Item: {item}")
         now = datetime.datetime.utcnow().isoformat()
         item["modification_info"] = {
             "created_at": now,
@@ -48,8 +265,23 @@ class Service:
             "last_modified_by": self.user_id,
         }
 
-        item["id"] = str(uuid.uuid4())
+        item["id"] = new_item_id()
+        item[VERSION_FIELD] = 1
+        return item
+
+    @start_span("service_create_item")
+    def create_item(self, item: dict) -> dict:
+        """
+        Create item
+
+        :param item: the item data to be saved
+
+        :return: Dict
+        """
+        logger.debug("Creating item", extra={"item": item})
+        item = self._new_item(item)
 
+        self._admit()
         try:
             self.database.put_item(
                 item_type=ItemType.ITEM, tenant_id=self.tenant_id, item_id=item["id"], item_data=item
@@ -58,4 +290,100 @@ class Service:
             print(error)
             # tests errors here
             raise error
+        if self.cache is not None:
+            self.cache.set(ItemType.ITEM, self.tenant_id, item["id"], item)
+        return item
+
+    @start_span("service_create_item_idempotent")
+    def create_item_idempotent(self, item: dict, idempotency_key: str) -> tuple[dict, bool]:
+        """
+        Create item at most once for the idempotency key, repeated requests get the item created by the first one.
+        Retries landing on the same warm container are answered from the cache without reading the table.
+
+        :param item: the item data to be saved
+        :param idempotency_key: the key sent by the client with the request
+        :return: the item and whether it was created by an earlier request
+        """
+        logger.debug("Creating item with idempotency key", extra={"item": item, "idempotency_key": idempotency_key})
+        request = json.dumps({"user_id": self.user_id, "item": item}, sort_keys=True, default=str)
+        key = IdempotencyKey(idempotency_key, hashlib.sha256(request.encode()).hexdigest())
+
+        if self.cache is not None:
+            cached = self.cache.get(ItemType.IDEMPOTENCY, self.tenant_id, idempotency_key)
+            if cached is not None and cached != NOT_FOUND:
+                if cached["request_hash"] != key.request_hash:
+                    raise IdempotencyKeyReused(self.tenant_id, idempotency_key)
+                return cached["item"], True
+
+        item = self._new_item(item)
+        self._admit()
+        item, replayed = self.database.put_item_idempotent(
+            item_type=ItemType.ITEM, tenant_id=self.tenant_id, item_id=item["id"], item_data=item, idempotency_key=key
+        )
+        if self.cache is not None:
+            self.cache.set(
+                ItemType.IDEMPOTENCY, self.tenant_id, idempotency_key, {"request_hash": key.request_hash, "item": item}
+            )
+            if not replayed:
+                self.cache.set(ItemType.ITEM, self.tenant_id, item["id"], item)
+        return item, replayed
+
+    @start_span("service_update_item")
+    def update_item(self, item_id: str, changes: dict, if_match: Optional[str] = None) -> dict:
+        """
+        Change some fields of an item, keeping its other fields
+
+        :param item_id: The id of the item to change
+        :param changes: The new values of the changed fields
+        :param if_match: The strong ETag of the item the changes were made to, None or * to change any version
+        :return: The full info of the changed item
+        :raises ItemVersionMismatch: when the item was changed since the ETag or the ETag is weak
+        """
+        logger.info("Updating item", extra={"item_id": item_id, "fields": list(changes)})
+        if if_match is not None and is_weak_etag(if_match):
+            raise ItemVersionMismatch(ItemType.ITEM.value, self.tenant_id, item_id)
+        expected_version = etag_version(if_match) if if_match is not None else None
+        if expected_version == 0 and if_match.strip() != self.get_item_etag(item_id):
+            # the ETag of an item stored before versions were added is a hash of the whole item,
+            # the item keeps it until the first update adds the version
+            raise ItemVersionMismatch(ItemType.ITEM.value, self.tenant_id, item_id)
+        update = ItemUpdate(
+            changes=changes,
+            modified_by=self.user_id,
+            modified_at=datetime.datetime.utcnow().isoformat(),
+            expected_version=expected_version,
+        )
+        self._admit()
+        if self.cache is not None:
+            self.cache.invalidate(ItemType.ITEM, self.tenant_id, item_id)
+        item = self.database.update_item(
+            item_type=ItemType.ITEM, tenant_id=self.tenant_id, item_id=item_id, update=update
+        )
+        if self.cache is not None:
+            self.cache.set(ItemType.ITEM, self.tenant_id, item_id, item)
         return item
+
+    @start_span("service_create_items")
+    def create_items(self, items: list[dict], check_conflicts: bool = False) -> tuple[list[dict], list[ItemConflict]]:
+        """
+        Create multiple items in bulk
+
+        :param items: the items data to be saved
+        :param check_conflicts: make sure existing items are never overwritten, this is slower
+
+        :return: created items and conflict errors for the items that were not created
+        """
+        logger.info("Creating items", extra={"count": len(items)})
+        new_items = {item["id"]: item for item in map(self._new_item, items)}
+        self._admit(len(new_items))
+
+        conflicting_ids = self.database.put_items(
+            item_type=ItemType.ITEM, tenant_id=self.tenant_id, items=new_items, check_conflicts=check_conflicts
+        )
+        conflicts = [ItemConflict(ItemType.ITEM.value, self.tenant_id, item_id) for item_id in conflicting_ids]
+        for item_id in conflicting_ids:
+            del new_items[item_id]
+        if self.cache is not None:
+            for item_id, item in new_items.items():
+                self.cache.set(ItemType.ITEM, self.tenant_id, item_id, item)
+        return list(new_items.values()), conflicts
@@ -0,0 +1,97 @@
+"""
+Write sharding of the tenants' keys in the global secondary index.
+
+All items of a tenant indexed under a single key land on a single partition of the index, which
+caps the tenant's write throughput. Items of tenants given more shards are indexed under the key
+suffixed with a shard picked by a hash of the item id, and reads query all shards of the tenant
+in parallel and merge their items in order of the index sort key.
+
+Shard 0 is the key without suffix, so the items stay readable when the number of shards of a tenant
+is raised and nothing has to be rewritten. Items of the shards dropped by lowering it are not read
+until they are indexed again.
+"""
+
+import heapq
+import json
+import zlib
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from operator import itemgetter
+from typing import Iterator, Optional
+
+from config import GSI_SHARDS, GSI_TENANT_SHARDS
+
+# String separating the shard from the key
+SHARD_DELIMITER = "#"
+
+# Number of shards by tenant, overriding GSI_SHARDS
+tenant_shards: dict[str, int] = {tenant: int(count) for tenant, count in json.loads(GSI_TENANT_SHARDS).items()}
+
+
+def shard_count(tenant_id: str) -> int:
+    """
+    Get number of shards the tenant's items are indexed under
+    :param tenant_id: tenant name
+    """
+    return max(1, tenant_shards.get(tenant_id, GSI_SHARDS))
+
+
+def shard_key(key: str, tenant_id: str, item_id: str) -> str:
+    """
+    Build index key of an item
+    :param key: key of all the tenant's items of the same type
+    :param tenant_id: tenant name
+    :param item_id: id of the item, picks the shard
+    :return: key of the item's shard
+    """
+    shard = zlib.crc32(item_id.encode()) % shard_count(tenant_id)
+    return f"{key}{SHARD_DELIMITER}{shard}" if shard else key
+
+
+def shard_keys(key: str, tenant_id: str) -> list[str]:
+    """
+    Build index keys of all shards
+    :param key: key of all the tenant's items of the same type
+    :param tenant_id: tenant name
+    :return: keys of the shards, starting with the key itself
+    """
+    return [key] + [f"{key}{SHARD_DELIMITER}{shard}" for shard in range(1, shard_count(tenant_id))]
+
+
+def _shard_items(executor: Executor, pages: Iterator[list[dict]], future: Future, prefetch: bool) -> Iterator[dict]:
+    """
+    Iterate over items of a single shard
+    :param executor: executor reading the pages
+    :param pages: lazy iterator over the pages of the shard
+    :param future: request of the first page
+    :param prefetch: whether the next page is requested while the current one is consumed
+    """
+    page: Optional[list[dict]] = future.result()
+    while page is not None:
+        if prefetch:
+            future = executor.submit(next, pages, None)
+            yield from page
+            page = future.result()
+        else:
+            yield from page
+            page = next(pages, None)
+
+
+def gather(shard_pages: list[Iterator[list[dict]]], sort_key: str, prefetch: bool = False) -> Iterator[dict]:
+    """
+    Merge items of all shards in order of the sort key, the first pages of all shards are requested at once
+    :param shard_pages: lazy iterators over the pages of every shard, each sorted by the sort key
+    :param sort_key: attribute the items are sorted by
+    :param prefetch: whether the next page of a shard is requested while its current page is consumed
+    :return: iterator over the items of all shards
+    """
+    if len(shard_pages) == 1 and not prefetch:
+        for page in shard_pages[0]:
+            yield from page
+        return
+
+    with ThreadPoolExecutor(max_workers=len(shard_pages)) as executor:
+        futures = [executor.submit(next, pages, None) for pages in shard_pages]
+        yield from heapq.merge(
+            *(_shard_items(executor, pages, future, prefetch) for pages, future in zip(shard_pages, futures)),
+            key=itemgetter(sort_key),
+        )
@@ -0,0 +1,103 @@
+"""
+DynamoDB Stream Handlers
+------------------------
+
+This module contains functions that handle batches of records from the table's stream.
+
+Changes of every tenant in a batch are coalesced and applied to the tenant's stats item with
+a single update, so reading the stats does not need to scan the tenant's items. Stream records
+are delivered at least once, a batch retried after a failure can be counted again.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.types import TypeDeserializer
+from evertz_io_observability.decorators import start_span
+from evertz_io_observability.otel_collector import export_trace
+from evertz_io_observability.target_services import ExportService
+
+from context import logger, sample_log_level
+from db import PK_KEY, STATS_ITEM_TYPES, Db, ItemType, parse_db_key, read_item_data
+from metrics import instrument
+from models import StreamModel, StreamRecordModel
+
+# Change of the number of items by stream event name
+COUNT_CHANGES = {"INSERT": 1, "MODIFY": 0, "REMOVE": -1}
+
+_deserializer = TypeDeserializer()
+
+
+@dataclass
+class TenantChanges:
+    """
+    Changes of a single tenant's items coalesced from a batch of stream records
+    """
+
+    counts: Counter = field(default_factory=Counter)
+    last_modified: Optional[dict[str, Any]] = None
+
+    def add(self, event_name: str, item_type: ItemType, item_id: str, new_image: Optional[dict]):
+        """
+        Account a single stream record
+        :param event_name: INSERT, MODIFY or REMOVE
+        :param item_type: type of the changed item
+        :param item_id: id of the changed item
+        :param new_image: item as stored after the change in DynamoDB JSON, None when it was removed
+        """
+        self.counts[item_type] += COUNT_CHANGES[event_name]
+        if not new_image:
+            return
+        item = {name: _deserializer.deserialize(value) for name, value in new_image.items()}
+        modification_info = (read_item_data(item) or {}).get("modification_info") or {}
+        modified_at = modification_info.get("last_modified_at")
+        if modified_at and (self.last_modified is None or modified_at > self.last_modified["at"]):
+            self.last_modified = {
+                "at": modified_at,
+                "by": modification_info.get("last_modified_by"),
+                "item_id": item_id,
+            }
+
+
+def aggregate(records: Iterable[StreamRecordModel]) -> dict[str, TenantChanges]:
+    """
+    Coalesce stream records by tenant
+    :param records: records of a single batch
+    :return: changes by tenant, only records of the item types counted in the stats are kept
+    """
+    changes: dict[str, TenantChanges] = {}
+    for record in records:
+        key = record.dynamodb.Keys[PK_KEY]["S"]
+        try:
+            tenant_id, item_type, item_id = parse_db_key(key)
+        except ValueError:
+            logger.warning("Skipping record with unknown key", extra={"key": key})
+            continue
+        if item_id is None or item_type not in STATS_ITEM_TYPES:
+            continue
+        changes.setdefault(tenant_id, TenantChanges()).add(
+            record.eventName, item_type, item_id, record.dynamodb.NewImage
+        )
+    return changes
+
+
+# pylint: disable=no-value-for-parameter
+@export_trace(export_service=ExportService.OTEL_COLLECTOR_LAYER)
+@start_span("process_stream")
+@instrument("process_stream", model=StreamModel)
+def process_stream(event: StreamModel, context: LambdaContext):
+    """
+    Update stats of the tenants whose items changed
+
+    :param event: batch of stream records
+    :param context: lambda execution context
+    """
+    sample_log_level()
+    logger.debug("Context", extra={"context": context})
+
+    changes = aggregate(event.Records)
+    logger.info("Processing stream batch", extra={"records": len(event.Records), "tenants": len(changes)})
+    for tenant_id, tenant_changes in changes.items():
+        Db.update_stats(tenant_id, tenant_changes.counts, tenant_changes.last_modified)
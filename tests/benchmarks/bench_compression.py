@@ -0,0 +1,94 @@
+"""
+Benchmark of item data compression, comparing capacity units saved with CPU time spent.
+
+Items of several sizes are stored as a map and compressed, for every size the DynamoDB item size,
+write and read capacity units of a single item and the time to compress and decompress it are
+reported. Text payloads compress well, the random ones show the cost when little is saved.
+
+Usage::
+
+    PYTHONPATH=python_exercise:. python tests/benchmarks/bench_compression.py
+"""
+
+import base64
+import math
+import random
+import timeit
+from unittest.mock import patch
+
+from boto3.dynamodb.types import TypeSerializer
+
+import db
+from db import ItemType
+from tests.data.data_constants import ITEM_ID, TENANT_ID
+
+WORDS = "the item was created by the user and describes the state of the asset in the media library".split()
+
+
+def text_payload(size: int) -> dict:
+    rng = random.Random(size)
+    text = " ".join(rng.choice(WORDS) for _ in range(size // 5))[:size]
+    return {"success": True, "text": text, "id": ITEM_ID}
+
+
+def random_payload(size: int) -> dict:
+    text = base64.b64encode(random.Random(size).randbytes(size * 3 // 4)).decode()
+    return {"success": True, "text": text, "id": ITEM_ID}
+
+
+def _value_size(value: dict) -> int:
+    """
+    Approximate size of an attribute value as DynamoDB accounts it
+    """
+    kind, content = next(iter(value.items()))
+    if kind == "S":
+        return len(content.encode())
+    if kind == "B":
+        return len(content)
+    if kind == "N":
+        return len(content) // 2 + 1
+    if kind == "BOOL":
+        return 1
+    if kind == "M":
+        return 3 + sum(len(name.encode()) + 1 + _value_size(nested) for name, nested in content.items())
+    raise ValueError(kind)
+
+
+def item_size(item: dict) -> int:
+    """
+    Approximate size of an item as DynamoDB accounts it
+    """
+    serializer = TypeSerializer()
+    serialised = {name: serializer.serialize(value) for name, value in item.items()}
+    for value in serialised.values():
+        if "B" in value:
+            value["B"] = bytes(value["B"])
+    return sum(len(name.encode()) + _value_size(value) for name, value in serialised.items())
+
+
+def bench(name: str, payload: dict, number: int):
+    plain = db._build_item(ItemType.ITEM, TENANT_ID, ITEM_ID, payload)  # pylint: disable=protected-access
+    with patch("db.DATA_COMPRESSION_THRESHOLD", 1):
+        compressed = db._build_item(ItemType.ITEM, TENANT_ID, ITEM_ID, payload)  # pylint: disable=protected-access
+        compress_time = min(timeit.repeat(lambda: db._compress(payload), number=number, repeat=3)) / number
+
+    decompress_time = min(timeit.repeat(lambda: db.read_item_data(compressed), number=number, repeat=3)) / number
+    plain_size, compressed_size = item_size(plain), item_size(compressed)
+    print(
+        f"{name:<14} {plain_size / 1024:8.1f} -> {compressed_size / 1024:6.1f} KB"
+        f"  WCU {math.ceil(plain_size / 1024):4d} -> {math.ceil(compressed_size / 1024):3d}"
+        f"  RCU {math.ceil(plain_size / 4096):3d} -> {math.ceil(compressed_size / 4096):3d}"
+        f"  compress {compress_time * 1e6:8.1f} us  decompress {decompress_time * 1e6:8.1f} us"
+    )
+
+
+def main():
+    print(f"zlib level {db.DATA_COMPRESSION_LEVEL}, capacity units of a single strongly consistent request")
+    for size in (1024, 4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024):
+        number = max(10, 2_000_000 // size)
+        bench(f"text {size // 1024} KB", text_payload(size), number)
+        bench(f"random {size // 1024} KB", random_payload(size), number)
+
+
+if __name__ == "__main__":
+    main()
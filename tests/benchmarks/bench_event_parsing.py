@@ -0,0 +1,58 @@
+"""
+Benchmark of API Gateway event parsing, comparing the full and the light parsing mode.
+
+Every request is parsed into its model and the caller's identity is read from it, which is
+all the work done before a handler reaches Service. Full mode validates the whole
+APIGatewayProxyEventModel and serialises it back into a dict for the identity, light mode
+validates only the parts the handlers use and reads the identity from the received event.
+The work is CPU bound, so the reported latency is the CPU time spent per request.
+
+Usage::
+
+    PYTHONPATH=python_exercise:. python tests/benchmarks/bench_event_parsing.py --output parsing.json
+"""
+
+import json
+
+from aws_lambda_powertools.utilities.parser import parse
+from evertz_io_identity_lib.event import get_identity_from_event
+
+from models import ItemModel, LightItemModel
+from tests.benchmarks.harness import Scenario, run
+from tests.data.data_constants import ITEM_ID
+from tests.data.events import JWTS, build_api_gateway_event
+
+# Sizes of the request body in bytes, from a typical item to one close to the item size limit
+BODY_SIZES = {"1kb": 1024, "32kb": 32 * 1024, "256kb": 256 * 1024}
+
+
+def _event(body_size: int) -> dict:
+    body = json.dumps({"success": True, "text": "x" * body_size})
+    event, _ = build_api_gateway_event(
+        path=f"/items/{ITEM_ID}", method="POST", path_params={"item_id": ITEM_ID}, body=body
+    )
+    event["headers"]["Authorization"] = JWTS["IdToken"]
+    return event
+
+
+def parse_full(event: dict):
+    parsed = parse(event=event, model=ItemModel)
+    return parsed, get_identity_from_event(event=parsed.dict(), verify=False)
+
+
+def parse_light(event: dict):
+    parsed = parse(event=event, model=LightItemModel)
+    return parsed, get_identity_from_event(event=parsed.raw_event, verify=False)
+
+
+def scenarios() -> list[Scenario]:
+    result = []
+    for size_name, size in BODY_SIZES.items():
+        event = _event(size)
+        result.append(Scenario(f"full_{size_name}", lambda event=event: parse_full(event)))
+        result.append(Scenario(f"light_{size_name}", lambda event=event: parse_light(event)))
+    return result
+
+
+if __name__ == "__main__":
+    run(scenarios(), __doc__)
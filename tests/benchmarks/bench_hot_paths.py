@@ -0,0 +1,148 @@
+"""
+Benchmark of the request hot paths against a moto backed DynamoDB table.
+
+Handlers are run end to end with API Gateway events, Service and Db are measured in isolation,
+so a regression can be attributed to a layer. Moto adds its own overhead to every DynamoDB call,
+so absolute numbers are only comparable between runs on the same machine.
+
+Usage::
+
+    PYTHONPATH=python_exercise:. python tests/benchmarks/bench_hot_paths.py --output results.json
+    PYTHONPATH=python_exercise:. python tests/benchmarks/bench_hot_paths.py --baseline results.json
+"""
+
+import itertools
+import json
+import os
+import uuid
+from functools import wraps
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+from config import TABLE_NAME
+from context import logger
+from metrics import metrics
+from tests.benchmarks.harness import Scenario, run
+from tests.data.data_constants import TENANT_ID
+from tests.data.events import JWTS, build_api_gateway_event
+
+# Number of items read and written by the batch scenarios
+BATCH_SIZE = 25
+
+
+def _no_span(*_args, **_kwargs):
+    def decorator(func):
+        @wraps(func)
+        def decorated(*args, **kwargs):
+            return func(*args, **kwargs)
+
+        return decorated
+
+    return decorator
+
+
+def _create_table():
+    return boto3.resource("dynamodb", region_name="us-east-1").create_table(
+        TableName=TABLE_NAME,
+        AttributeDefinitions=[
+            {"AttributeName": "pk", "AttributeType": "S"},
+            {"AttributeName": "gsi_pk", "AttributeType": "S"},
+            {"AttributeName": "item_id", "AttributeType": "S"},
+        ],
+        KeySchema=[{"AttributeName": "pk", "KeyType": "HASH"}],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "gsi",
+                "KeySchema": [
+                    {"AttributeName": "gsi_pk", "KeyType": "HASH"},
+                    {"AttributeName": "item_id", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def _event(path: str, method: str, **kwargs):
+    event, context = build_api_gateway_event(path=path, method=method, **kwargs)
+    event["headers"]["Authorization"] = JWTS["IdToken"]
+    return event, context
+
+
+def _new_item(index: int) -> dict:
+    return {"success": True, "text": f"Item {index}"}
+
+
+def scenarios() -> list[Scenario]:
+    """
+    Build scenarios, must be called with the table mocked and handler importable
+    """
+    # pylint: disable=import-outside-toplevel
+    import handler
+    from cache import item_cache
+    from db import Db, ItemType
+    from service import Service
+
+    database = Db()
+    service = Service(database, TENANT_ID, "benchmark", item_cache)
+    counter = itertools.count()
+
+    item_ids = [service.create_item(_new_item(index))["id"] for index in range(BATCH_SIZE)]
+    item_id = item_ids[0]
+
+    def _new_items():
+        return [_new_item(next(counter)) for _ in range(BATCH_SIZE)]
+
+    create_event = _event("/create_item", "POST", body=json.dumps(_new_item(0)))
+    get_event = _event(f"/get_item/{item_id}", "GET", path_params={"item_id": item_id})
+    get_items_event = _event("/items", "GET", query_params={"ids": ",".join(item_ids)})
+    list_items_event = _event("/items", "GET", query_params={"limit": str(BATCH_SIZE)})
+    create_items_event = _event("/items:batch", "POST", body=json.dumps(_new_items()))
+
+    # Reads run first, so the writes do not grow the table they query
+    return [
+        Scenario("handler.get_item (cache hit)", lambda: handler.get_item(*get_event)),
+        Scenario("handler.get_item (cache miss)", lambda: handler.get_item(*get_event), setup=item_cache.clear),
+        Scenario("handler.get_items (batch)", lambda: handler.get_items(*get_items_event), setup=item_cache.clear),
+        Scenario("handler.get_items (list)", lambda: handler.get_items(*list_items_event)),
+        Scenario("service.get_item (cache hit)", lambda: service.get_item(item_id)),
+        Scenario("service.get_item (cache miss)", lambda: service.get_item(item_id), setup=item_cache.clear),
+        Scenario("service.get_items (batch)", lambda: service.get_items(item_ids), setup=item_cache.clear),
+        Scenario("db.get_item", lambda: database.get_item(ItemType.ITEM, TENANT_ID, item_id)),
+        Scenario("db.batch_get_items", lambda: database.batch_get_items(ItemType.ITEM, TENANT_ID, item_ids)),
+        Scenario("db.query_items", lambda: database.query_items(ItemType.ITEM, TENANT_ID, limit=BATCH_SIZE)),
+        Scenario("handler.create_item", lambda: handler.create_item(*create_event)),
+        Scenario("handler.create_items (batch)", lambda: handler.create_items(*create_items_event)),
+        Scenario("service.create_item", lambda: service.create_item(_new_item(next(counter)))),
+        Scenario("service.create_items (batch)", lambda: service.create_items(_new_items())),
+        Scenario(
+            "db.put_item",
+            lambda: database.put_item(ItemType.ITEM, TENANT_ID, str(uuid.uuid4()), _new_item(next(counter))),
+        ),
+        Scenario(
+            "db.put_items (batch)",
+            lambda: database.put_items(ItemType.ITEM, TENANT_ID, {str(uuid.uuid4()): item for item in _new_items()}),
+        ),
+    ]
+
+
+def main():
+    """
+    Run benchmark with DynamoDB and tracing mocked
+    """
+    with mock_aws(), open(os.devnull, "w", encoding="utf-8") as devnull:
+        # Logs and metrics are still formatted, as they are in Lambda, but not printed between the results
+        logger.handlers[0].setStream(devnull)
+        metrics.output = devnull
+        table = _create_table()
+        with patch("db.restricted_table", return_value=table), patch(
+            "evertz_io_observability.decorators.start_span", _no_span
+        ):
+            run(scenarios(), description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+
+
+if __name__ == "__main__":
+    main()
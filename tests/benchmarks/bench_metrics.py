@@ -0,0 +1,48 @@
+"""
+Micro-benchmark of the per invocation overhead of the stage metrics, which has to stay under 50 us.
+
+An invocation with the stages of a get_item request, two DynamoDB requests and the EMF line
+written to /dev/null is measured with and without metrics enabled.
+
+Usage::
+
+    PYTHONPATH=python_exercise:. python tests/benchmarks/bench_metrics.py
+"""
+
+import os
+import sys
+import timeit
+from unittest.mock import patch
+
+from metrics import DYNAMODB, EVENT_PARSE, IDENTITY, RESTRICTED_TABLE, SERIALISATION, MetricsRecorder
+
+BUDGET_US = 50.0
+
+
+def invocation(recorder: MetricsRecorder):
+    recorder.start("get_item")
+    for stage in (EVENT_PARSE, IDENTITY, RESTRICTED_TABLE, DYNAMODB, DYNAMODB, SERIALISATION):
+        with recorder.stage(stage):
+            pass
+    recorder.add_capacity({"TableName": "python-exercise", "CapacityUnits": 0.5})
+    recorder.add_capacity({"TableName": "python-exercise", "CapacityUnits": 0.5})
+    recorder.flush()
+
+
+def main():
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        recorder = MetricsRecorder(output=devnull)
+        number = 20000
+        enabled = min(timeit.repeat(lambda: invocation(recorder), number=number, repeat=5)) / number
+        with patch("metrics.METRICS_ENABLED", False):
+            disabled = min(timeit.repeat(lambda: invocation(recorder), number=number, repeat=5)) / number
+
+    print(f"metrics enabled  {enabled * 1e6:8.2f} us/invocation")
+    print(f"metrics disabled {disabled * 1e6:8.2f} us/invocation")
+    if enabled * 1e6 > BUDGET_US:
+        print(f"Over budget of {BUDGET_US} us")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
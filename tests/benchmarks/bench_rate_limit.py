@@ -0,0 +1,108 @@
+"""
+Benchmark of the per tenant rate limiter.
+
+The noisy neighbour simulation sends the requests of one tenant running a bulk job and of a few
+tenants with normal traffic to a table that throttles everything above its capacity, on a simulated
+clock, and reports the share of every tenant's requests the table served with and without the
+limiter. The scenarios measure the cost of admitting and of rejecting a request in local mode.
+
+Usage::
+
+    PYTHONPATH=python_exercise:. python tests/benchmarks/bench_rate_limit.py --output rate_limit.json
+"""
+
+import random
+from unittest.mock import patch
+
+from errors import TenantRateLimited
+from rate_limit import TenantRateLimiter, TokenBucket, rate_limit
+from tests.benchmarks.harness import Scenario, run
+
+# Requests per second the simulated table serves before throttling
+TABLE_CAPACITY = 1000
+# Requests per second sent by every tenant
+OFFERED_LOAD = {"noisy": 5000, "quiet-1": 100, "quiet-2": 100, "quiet-3": 100}
+# Limit of every tenant when the limiter is enabled
+TENANT_LIMIT = rate_limit(250, 50)
+SIMULATED_SECONDS = 10
+STEP = 0.001
+
+
+def simulate(limiter: TenantRateLimiter) -> dict[str, dict[str, float]]:
+    """
+    Send the offered load to the simulated table
+    :param limiter: limiter admitting the requests
+    :return: share of the requests served, rejected by the limiter and throttled by the table by tenant
+    """
+    table = rate_limit(TABLE_CAPACITY, TABLE_CAPACITY / 10)
+    table_bucket = TokenBucket(table.burst, 0.0)
+    counts = {tenant: {"sent": 0, "served": 0, "rate_limited": 0, "throttled": 0} for tenant in OFFERED_LOAD}
+    owed = dict.fromkeys(OFFERED_LOAD, 0.0)
+    tenants = list(OFFERED_LOAD)
+    order = random.Random(0)
+    with patch("rate_limit.time.monotonic") as monotonic:
+        for step in range(int(SIMULATED_SECONDS / STEP)):
+            now = monotonic.return_value = step * STEP
+            # tenants send in random order, so none of them is favoured by the table
+            order.shuffle(tenants)
+            for tenant in tenants:
+                owed[tenant] += OFFERED_LOAD[tenant] * STEP
+                while owed[tenant] >= 1:
+                    owed[tenant] -= 1
+                    counts[tenant]["sent"] += 1
+                    try:
+                        limiter.acquire(tenant)
+                    except TenantRateLimited:
+                        counts[tenant]["rate_limited"] += 1
+                        continue
+                    if table_bucket.take(table, 1, now):
+                        counts[tenant]["throttled"] += 1
+                    else:
+                        counts[tenant]["served"] += 1
+    return {
+        tenant: {name: value / count["sent"] for name, value in count.items() if name != "sent"}
+        for tenant, count in counts.items()
+    }
+
+
+def print_isolation():
+    for name, limiter in (
+        ("without limiter", TenantRateLimiter(rate_limit(0), {})),
+        ("with limiter", TenantRateLimiter(TENANT_LIMIT, {})),
+    ):
+        print(f"Noisy neighbour {name}, table capacity {TABLE_CAPACITY} requests/s")
+        for tenant, shares in simulate(limiter).items():
+            print(
+                f"  {tenant:<10} {OFFERED_LOAD[tenant]:6d} requests/s  served {shares['served']:7.1%}"
+                f"  rate limited {shares['rate_limited']:7.1%}  throttled {shares['throttled']:7.1%}"
+            )
+    print()
+
+
+def _rejecting_limiter() -> TenantRateLimiter:
+    limiter = TenantRateLimiter(rate_limit(1, 1), {})
+    limiter.acquire("noisy")
+    return limiter
+
+
+def _reject(limiter: TenantRateLimiter):
+    try:
+        limiter.acquire("noisy")
+    except TenantRateLimited:
+        pass
+
+
+def scenarios() -> list[Scenario]:
+    unlimited = TenantRateLimiter(rate_limit(0), {})
+    admitting = TenantRateLimiter(rate_limit(1e9, 1e9), {})
+    rejecting = _rejecting_limiter()
+    return [
+        Scenario("acquire_unlimited", lambda: unlimited.acquire("quiet")),
+        Scenario("acquire_admitted", lambda: admitting.acquire("quiet")),
+        Scenario("acquire_rejected", lambda: _reject(rejecting)),
+    ]
+
+
+if __name__ == "__main__":
+    print_isolation()
+    run(scenarios(), __doc__)
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark of response building, comparing the per-request pydantic round trips
+handlers used before with the api_response module.
+
+Usage::
+
+    PYTHONPATH=python_exercise:. python tests/benchmarks/bench_responses.py
+"""
+
+import json
+import timeit
+from http import HTTPStatus
+
+import api_response
+from models import Headers, Item
+
+ITEM = {
+    "success": True,
+    "text": "Hello " * 50,
+    "id": "e430716c-53c2-4adc-879c-f6f8aeb8ec08",
+    "modification_info": {
+        "created_at": "2024-01-01T00:00:00",
+        "created_by": "f4db93cc-69d6-42f8-9ce7-895776f177f5",
+        "last_modified_at": "2024-01-01T00:00:00",
+        "last_modified_by": "f4db93cc-69d6-42f8-9ce7-895776f177f5",
+    },
+}
+
+
+def pydantic_get_response():
+    return {
+        "statusCode": HTTPStatus.OK,
+        "headers": Headers(content_type="application/vnd.api+json").dict(by_alias=True),
+        "body": Item(**ITEM).json(),
+    }
+
+
+def fast_get_response():
+    return api_response.build_response(HTTPStatus.OK, api_response.item_body(ITEM))
+
+
+def pydantic_create_response():
+    return {
+        "statusCode": HTTPStatus.OK,
+        "headers": Headers(content_type="application/vnd.api+json").dict(by_alias=True),
+        "body": json.dumps(ITEM, indent=4),
+    }
+
+
+def fast_create_response():
+    return api_response.build_response(HTTPStatus.OK, api_response.dumps(ITEM))
+
+
+def bench(name, func, number=20000):
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{name:<28} {best * 1e6:8.2f} us/call")
+    return best
+
+
+def main():
+    print(f"encoder: {'orjson' if api_response.orjson is not None else 'json'}")
+    for operation, before, after in (
+        ("get_item", pydantic_get_response, fast_get_response),
+        ("create_item", pydantic_create_response, fast_create_response),
+    ):
+        assert json.loads(before()["body"]) == json.loads(after()["body"])
+        before_time = bench(f"{operation} (pydantic)", before)
+        after_time = bench(f"{operation} (api_response)", after)
+        print(f"{operation:<28} {before_time / after_time:8.2f}x faster")
+
+
+if __name__ == "__main__":
+    main()
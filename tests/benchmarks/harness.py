@@ -0,0 +1,176 @@
+"""
+Minimal benchmark harness measuring throughput, latency percentiles and memory allocated per call.
+
+Results are written as JSON, so they can be stored as a baseline and later runs compared against it.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+# Number of calls measured with tracemalloc, tracing slows the calls down so they are not timed
+ALLOCATION_SAMPLES = 50
+
+
+@dataclass
+class Scenario:
+    """
+    Single benchmarked operation
+    :param name: unique name, used to match results with the baseline
+    :param func: operation to measure
+    :param setup: called before every call of func, its time is not measured
+    """
+
+    name: str
+    func: Callable[[], Any]
+    setup: Optional[Callable[[], Any]] = None
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile
+    :param sorted_values: measured values in ascending order
+    :param fraction: percentile as fraction, e.g. 0.95
+    """
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _call(scenario: Scenario) -> int:
+    if scenario.setup is not None:
+        scenario.setup()
+    start = time.perf_counter_ns()
+    scenario.func()
+    return time.perf_counter_ns() - start
+
+
+def _allocated_per_call(scenario: Scenario) -> tuple[float, float]:
+    """
+    Measure memory allocated by the scenario, returns average peak bytes and retained blocks per call
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for _ in range(ALLOCATION_SAMPLES):
+            if scenario.setup is not None:
+                scenario.setup()
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            scenario.func()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return sum(peaks) / len(peaks), retained_blocks / ALLOCATION_SAMPLES
+
+
+def measure(scenario: Scenario, iterations: int, warmup: int) -> dict[str, float]:
+    """
+    Run the scenario and summarise its performance
+    :param scenario: scenario to run
+    :param iterations: number of measured calls
+    :param warmup: number of calls made before measuring, e.g. to fill caches
+    :return: ops/sec, latency percentiles in microseconds and allocations per call
+    """
+    for _ in range(warmup):
+        _call(scenario)
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        latencies = sorted(_call(scenario) for _ in range(iterations))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    allocated_bytes, retained_blocks = _allocated_per_call(scenario)
+    return {
+        "iterations": iterations,
+        "ops_per_sec": iterations / (sum(latencies) / 1e9),
+        "p50_us": percentile(latencies, 0.50) / 1000,
+        "p95_us": percentile(latencies, 0.95) / 1000,
+        "p99_us": percentile(latencies, 0.99) / 1000,
+        "allocated_bytes_per_call": allocated_bytes,
+        "retained_blocks_per_call": retained_blocks,
+    }
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """
+    Find scenarios slower than in the baseline
+    :param results: results of the current run by scenario name
+    :param baseline: stored results by scenario name
+    :param threshold: allowed relative slowdown of the median latency, e.g. 0.1 for 10 %
+    :return: descriptions of regressed scenarios
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["p50_us"], result["p50_us"]
+        change = (after - before) / before if before else 0.0
+        print(f"{name:<40} p50 {before:10.1f} -> {after:10.1f} us  {change:+7.1%}")
+        if change > threshold:
+            regressions.append(f"{name} ({change:+.1%})")
+    return regressions
+
+
+def _print_result(name: str, result: dict[str, float]):
+    print(
+        f"{name:<40} {result['ops_per_sec']:10.1f} ops/s"
+        f"  p50 {result['p50_us']:9.1f}  p95 {result['p95_us']:9.1f}  p99 {result['p99_us']:9.1f} us"
+        f"  {result['allocated_bytes_per_call'] / 1024:8.1f} KiB/call"
+    )
+
+
+def run(scenarios: list[Scenario], description: str):
+    """
+    Run scenarios selected on command line, store results and compare them with the baseline
+    :param scenarios: all available scenarios
+    :param description: description shown in the command line help
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("scenarios", nargs="*", help="names of the scenarios to run, all by default")
+    parser.add_argument("--iterations", type=int, default=500, help="number of measured calls per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="number of calls before measuring")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    parser.add_argument("--baseline", default=None, help="JSON file with results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative slowdown of p50 latency")
+    arguments = parser.parse_args()
+
+    selected = [scenario for scenario in scenarios if not arguments.scenarios or scenario.name in arguments.scenarios]
+    results = {}
+    for scenario in selected:
+        results[scenario.name] = measure(scenario, arguments.iterations, arguments.warmup)
+        _print_result(scenario.name, results[scenario.name])
+
+    if arguments.output:
+        report = {
+            "metadata": {
+                "created_at": datetime.now(tz=timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "results": results,
+        }
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        print()
+        regressions = compare(results, baseline, arguments.threshold)
+        if regressions:
+            print(f"\nMedian latency regressed by more than {arguments.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
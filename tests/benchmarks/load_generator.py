@@ -0,0 +1,356 @@
+"""
+Load generator replaying synthetic API Gateway events against the handler entry points.
+
+Every worker process plays a single Lambda execution environment, handling one request at a time,
+so the number of processes corresponds to the concurrency of the function. Requests are a mix of
+create_item and get_item calls of many tenants, the items read are picked with Zipfian popularity.
+The concurrency is raised step by step and throughput, latency histograms and throttled requests
+are reported for every step, together with the peak memory of the workers, as a basis for the
+function's MemorySize and reserved concurrency.
+
+DynamoDB is either a shared local endpoint, e.g. DynamoDB Local or a moto server, given by
+``--endpoint-url``, or an in-process moto table per worker. The latter has no contention on the
+database side, so it shows the cost of the Lambda code alone.
+
+Usage::
+
+    PYTHONPATH=python_exercise:. python tests/benchmarks/load_generator.py --concurrency 1 2 4 8 --output load.json
+    PYTHONPATH=python_exercise:. python tests/benchmarks/load_generator.py --endpoint-url http://localhost:8000
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import resource
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from http import HTTPStatus
+from typing import Any, Optional
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+from config import TABLE_NAME
+from context import logger
+from metrics import metrics
+from resilience import THROTTLING_ERROR_CODES
+from tests.benchmarks.harness import percentile
+from tests.data.events import build_api_gateway_event, id_token
+
+# Upper bounds of the latency histogram buckets in milliseconds
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, float("inf"))
+
+# Status codes the handlers answer with when DynamoDB or the function is throttled
+THROTTLED_STATUS_CODES = {HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE}
+
+
+@dataclass(frozen=True)
+class Workload:
+    """
+    Mix of requests sent by every worker
+    :param tenants: number of tenants sending requests
+    :param items_per_tenant: number of items stored for every tenant before the run
+    :param create_ratio: fraction of requests creating an item, the rest reads items
+    :param zipf_exponent: skew of item popularity, 0 reads all items equally often
+    :param payload_sizes: sizes of item text in bytes, every created item uses one of them
+    :param seed: seed of the random generators, every worker derives its own from it
+    """
+
+    tenants: int = 50
+    items_per_tenant: int = 20
+    create_ratio: float = 0.2
+    zipf_exponent: float = 1.1
+    payload_sizes: tuple[int, ...] = (100, 1000, 10000)
+    seed: int = 0
+
+    def tenant_ids(self) -> list[str]:
+        """
+        Deterministic tenant ids, so all workers use the same ones
+        """
+        return [str(uuid.uuid5(uuid.NAMESPACE_OID, f"tenant-{index}")) for index in range(self.tenants)]
+
+    def item_ids(self) -> list[tuple[str, str]]:
+        """
+        Deterministic (tenant id, item id) pairs of the items stored before the run, most popular first
+        """
+        keys = [
+            (tenant_id, str(uuid.uuid5(uuid.NAMESPACE_OID, f"{tenant_id}-{index}")))
+            for index in range(self.items_per_tenant)
+            for tenant_id in self.tenant_ids()
+        ]
+        random.Random(self.seed).shuffle(keys)
+        return keys
+
+
+class ZipfSampler:
+    """
+    Picks indexes 0..n-1 with probability proportional to 1 / (index + 1) ** exponent
+    """
+
+    def __init__(self, n: int, exponent: float, rng: random.Random):
+        self.cumulative_weights = list(itertools.accumulate(1 / (rank**exponent) for rank in range(1, n + 1)))
+        self.rng = rng
+
+    def sample(self) -> int:
+        """
+        Pick an index
+        """
+        return bisect.bisect(self.cumulative_weights, self.rng.random() * self.cumulative_weights[-1])
+
+
+@dataclass
+class WorkerResult:
+    """
+    Requests made by a single worker during a step
+    """
+
+    latencies_ms: dict[str, list[float]] = field(default_factory=lambda: {"create_item": [], "get_item": []})
+    statuses: Counter = field(default_factory=Counter)
+    throttled: int = 0
+    max_rss_mb: float = 0.0
+
+
+def _no_span(*_args, **_kwargs):
+    def decorator(func):
+        @wraps(func)
+        def decorated(*args, **kwargs):
+            return func(*args, **kwargs)
+
+        return decorated
+
+    return decorator
+
+
+def _table(endpoint_url: Optional[str]):
+    """
+    Get the table, create it and the global secondary index when it does not exist yet
+    """
+    dynamodb = boto3.resource("dynamodb", region_name="us-east-1", endpoint_url=endpoint_url)
+    if TABLE_NAME in [table.name for table in dynamodb.tables.all()]:
+        return dynamodb.Table(TABLE_NAME)
+    return dynamodb.create_table(
+        TableName=TABLE_NAME,
+        AttributeDefinitions=[
+            {"AttributeName": "pk", "AttributeType": "S"},
+            {"AttributeName": "gsi_pk", "AttributeType": "S"},
+            {"AttributeName": "item_id", "AttributeType": "S"},
+        ],
+        KeySchema=[{"AttributeName": "pk", "KeyType": "HASH"}],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "gsi",
+                "KeySchema": [
+                    {"AttributeName": "gsi_pk", "KeyType": "HASH"},
+                    {"AttributeName": "item_id", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def _seed(workload: Workload):
+    """
+    Store the items read by the workload
+    """
+    # pylint: disable=import-outside-toplevel
+    from db import Db, ItemType
+
+    items: dict[str, dict[str, Any]] = {}
+    for tenant_id, item_id in workload.item_ids():
+        items.setdefault(tenant_id, {})[item_id] = {"id": item_id, "success": True, "text": "x" * 100}
+    for tenant_id, tenant_items in items.items():
+        Db.put_items(ItemType.ITEM, tenant_id, tenant_items)
+
+
+def _start_environment(endpoint_url: Optional[str], workload: Workload):
+    """
+    Mock tracing and point the handlers to the local table, runs once in every process.
+    Without endpoint the process gets its own moto table with the workload's items.
+    """
+    if endpoint_url is None:
+        mock_aws().start()
+    patch("db.restricted_table", return_value=_table(endpoint_url)).start()
+    patch("evertz_io_observability.decorators.start_span", _no_span).start()
+    # logs and metrics are still formatted, as they are in Lambda, but not printed between the results
+    devnull = open(os.devnull, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+    logger.handlers[0].setStream(devnull)
+    metrics.output = devnull
+    if endpoint_url is None:
+        _seed(workload)
+
+
+class RequestMix:
+    """
+    Generates the events of a single worker
+    """
+
+    def __init__(self, workload: Workload, worker: int):
+        self.workload = workload
+        self.rng = random.Random(f"{workload.seed}-{worker}")
+        self.keys = workload.item_ids()
+        self.tenant_ids = workload.tenant_ids()
+        self.tokens = {tenant_id: id_token(tenant_id, str(uuid.uuid4())) for tenant_id in self.tenant_ids}
+        self.popularity = ZipfSampler(len(self.keys), workload.zipf_exponent, self.rng)
+
+    def next_request(self) -> tuple[str, dict, Any]:
+        """
+        Build the next request
+        :return: name of the handler, API Gateway event and Lambda context
+        """
+        if self.rng.random() < self.workload.create_ratio:
+            tenant_id = self.rng.choice(self.tenant_ids)
+            body = json.dumps({"success": True, "text": "x" * self.rng.choice(self.workload.payload_sizes)})
+            operation = "create_item"
+            event, context = build_api_gateway_event(path="/create_item", method="POST", body=body)
+        else:
+            tenant_id, item_id = self.keys[self.popularity.sample()]
+            operation = "get_item"
+            event, context = build_api_gateway_event(
+                path=f"/get_item/{item_id}", method="GET", path_params={"item_id": item_id}
+            )
+        event["headers"]["Authorization"] = self.tokens[tenant_id]
+        return operation, event, context
+
+
+def _drive(workload: Workload, worker: int, duration: float) -> WorkerResult:
+    """
+    Send requests one after another for the given time
+    :param workload: mix of requests
+    :param worker: worker number, used to derive the random seed
+    :param duration: number of seconds to send requests for
+    """
+    # pylint: disable=import-outside-toplevel
+    import handler
+
+    requests = RequestMix(workload, worker)
+    result = WorkerResult()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        operation, event, context = requests.next_request()
+
+        start = time.perf_counter_ns()
+        response = getattr(handler, operation)(event, context)
+        result.latencies_ms[operation].append((time.perf_counter_ns() - start) / 1e6)
+
+        result.statuses[int(response["statusCode"])] += 1
+        if response["statusCode"] in THROTTLED_STATUS_CODES or any(
+            code in response["body"] for code in THROTTLING_ERROR_CODES
+        ):
+            result.throttled += 1
+
+    result.max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def histogram(latencies_ms: list[float]) -> dict[str, int]:
+    """
+    Count latencies by bucket
+    :param latencies_ms: latencies in milliseconds
+    :return: count by bucket upper bound
+    """
+    counts = Counter(bisect.bisect_left(HISTOGRAM_BUCKETS_MS, latency) for latency in latencies_ms)
+    return {f"<={bound}ms": counts[index] for index, bound in enumerate(HISTOGRAM_BUCKETS_MS)}
+
+
+def run_step(endpoint_url: Optional[str], workload: Workload, concurrency: int, duration: float) -> dict[str, Any]:
+    """
+    Run the workload with the given number of worker processes
+    :return: summary of the step
+    """
+    with ProcessPoolExecutor(
+        max_workers=concurrency,
+        initializer=_start_environment,
+        initargs=(endpoint_url, workload),
+    ) as executor:
+        results = list(executor.map(_drive, [workload] * concurrency, range(concurrency), [duration] * concurrency))
+
+    operations = {}
+    for operation in ("create_item", "get_item"):
+        latencies = sorted(itertools.chain.from_iterable(result.latencies_ms[operation] for result in results))
+        if not latencies:
+            continue
+        operations[operation] = {
+            "requests": len(latencies),
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "histogram": histogram(latencies),
+        }
+    requests = sum(operation["requests"] for operation in operations.values())
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput": requests / duration,
+        "operations": operations,
+        "statuses": dict(sum((result.statuses for result in results), Counter())),
+        "throttled": sum(result.throttled for result in results),
+        "max_rss_mb": max(result.max_rss_mb for result in results),
+    }
+
+
+def _print_step(step: dict[str, Any]):
+    latencies = "  ".join(
+        f"{operation} p50 {summary['p50_ms']:7.1f} p99 {summary['p99_ms']:7.1f} ms"
+        for operation, summary in step["operations"].items()
+    )
+    print(
+        f"concurrency {step['concurrency']:3d}  {step['throughput']:8.1f} req/s  {latencies}"
+        f"  throttled {step['throttled']}  rss {step['max_rss_mb']:.0f} MB"
+    )
+
+
+def main():
+    """
+    Run the load test from command line
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to step through"
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds every step runs for")
+    parser.add_argument("--endpoint-url", default=None, help="shared local DynamoDB, in-process moto when not given")
+    parser.add_argument("--tenants", type=int, default=Workload.tenants)
+    parser.add_argument("--items-per-tenant", type=int, default=Workload.items_per_tenant)
+    parser.add_argument("--create-ratio", type=float, default=Workload.create_ratio)
+    parser.add_argument("--zipf-exponent", type=float, default=Workload.zipf_exponent)
+    parser.add_argument("--payload-sizes", type=int, nargs="+", default=list(Workload.payload_sizes))
+    parser.add_argument("--seed", type=int, default=Workload.seed)
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    arguments = parser.parse_args()
+
+    workload = Workload(
+        tenants=arguments.tenants,
+        items_per_tenant=arguments.items_per_tenant,
+        create_ratio=arguments.create_ratio,
+        zipf_exponent=arguments.zipf_exponent,
+        payload_sizes=tuple(arguments.payload_sizes),
+        seed=arguments.seed,
+    )
+    if arguments.endpoint_url is not None:
+        with patch("db.restricted_table", return_value=_table(arguments.endpoint_url)):
+            _seed(workload)
+
+    steps = []
+    for concurrency in arguments.concurrency:
+        steps.append(run_step(arguments.endpoint_url, workload, concurrency, arguments.duration))
+        _print_step(steps[-1])
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            json.dump(
+                {"workload": asdict(workload), "duration": arguments.duration, "steps": steps}, output_file, indent=2
+            )
+
+
+if __name__ == "__main__":
+    main()
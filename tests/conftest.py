@@ -1,126 +1,50 @@
-import datetime
-import uuid
+import json
 
+import boto3
 import pytest
+from moto import mock_aws
 
+from config import TABLE_NAME
 from models import Item, ItemIdPathParam
-from tests.data.data_constants import ITEM_ID
+from tests.data.data_constants import ITEM_ID, TENANT_ID
+from tests.data.events import JWTS, build_api_gateway_event, build_stream_record
 
 
 @pytest.fixture()
 def jwts():
-    yield {
-        "AccessToken": "eyJraWQiOiI0WE15dEpYRVE0bWNiSkhXQjRQYW5uNW91VXptU2MyenVWNmRpRk5TNmd3PSIsImFsZyI6IlJTMjU2In0.eyJzdWIiOiIwYWQ0OGYxZS02OWVjLTRhZjgtOWUwZS03MTUxYjNmNDA2NjIiLCJldmVudF9pZCI6IjllM2M2MmFmLTljMGYtMTFlOC1iMDY0LTJiMDU2YTAxM2MzZCIsInRva2VuX3VzZSI6ImFjY2VzcyIsInNjb3BlIjoiYXdzLmNvZ25pdG8uc2lnbmluLnVzZXIuYWRtaW4iLCJhdXRoX3RpbWUiOjE1MzM4NDUxNTIsImlzcyI6Imh0dHBzOlwvXC9jb2duaXRvLWlkcC5ldS13ZXN0LTEuYW1hem9uYXdzLmNvbVwvZXUtd2VzdC0xX3VjMHFsbWp0WCIsImV4cCI6MTUzMzg0ODc1MiwiaWF0IjoxNTMzODQ1MTUzLCJqdGkiOiI5ZDk2YTAyOS1mMmE2LTRjNjMtYjYyNy05NTY0OWQxYWUxMGIiLCJjbGllbnRfaWQiOiI1M3Zob3Y1cjBhdTZycjBqNzAzcmxtMDNsNSIsInVzZXJuYW1lIjoicm9vdCJ9.SdMk9ve6RIMN1TO1IVGMek0A1gZTLctrZrmCCJnE7Tba3DKXymGnfrOBNg1-eQgchUfvXwaVkgQZpE03-kwZpTe8hmhfVjd0AhIpRAE1_lv3tC_cnwsnIX-CmaWe6A1i1vLR91LjTg6joHqV8eUTHNNWCWKcoPpim2-B05e6yUk4fRX-hKTtHafpQRIdMpn2Wpp1PMkgq4vmyMzvU0-aZspzAlH0_CONjDWSa-pNvTaYwR41RZ_N09hlOPmY2fstAGymbA1LryjfX1lAZKi2Mq-RvHbZ_BAY8Eu96g8EnfaXsUd2FoxJRSDMIrN6zmENq40wMoYWi9shpFijd9g0Dg",
-        "ExpiresIn": 3600,
-        "TokenType": "Bearer",
-        "RefreshToken": "eyJjdHkiOiJKV1QiLCJlbmMiOiJBMjU2R0NNIiwiYWxnIjoiUlNBLU9BRVAifQ.CeNeLr5KGFIE_DXsExkrT5vkMmBEI7BdGShSq_-AJfpyoHIZH1ZYDDTS026Rw1h25lKA2CBolTiUEbo3fWc0TP3rx_HcQ2UojdkOOpGUMy7GLNktz7JOE1_ZwTivf7x07XkvZAwqQS_lL2SbPIYMYuDLjGEBGBwzxvhaK3FFz_fHBrwf7-UbysfzBu3YXLfiFb8bxkCoyIKm1o22fq-pIccF0quMSJmjk3SpfGZP5so4-7kuJN03rNTtf7EHFAfj_m9Q0KFfcMpuBBYCfjAkk2tsHrboF0u28hagssfBXfwk85v9jbDIK3AbLJCbHeDgueacSojwneSrQriKdBCQ4g.V2IaIZmqqePHeZVH.iXYiQohygmCeN0j3FESN-4gEfTXI_ZF8ybzruQbj9FMg29sQ9xAYWXAZwHqOOxvcqWklZhDa9oXaqYcRvfC7b7K6LOrUWfcLKrz1FQTUpwC8NHwB_iuzTEiG58IOFrDkAIvfJlG-NiscX0W7umsToxpy9hWrjy1AiLQePcOgjHVQWd0CNIkPtJiW9ue8wqR5MZU_zWcXnWdEpse3BXIEskwEbrgBP224ZMh3FXcrdPs33JOfkgAUSj8PK4GTCo4pvWpv7W4MI10tW4d8N024-MI8eYqVLD6dcgPy6fj9-kMKdveRa-mRP5JolVFqo7UpIzepaUtENFpIOEaX3_orK-vcbMCaI6rKqOhQ3VEVxPVGD71w9LsAbDFthc62Mkc05AAkbHLBfGrMWFTCLUXevFRyYU44rGM44gO39XA5cFBRtAEUn4gMd32jSuvgQntJnp-8w8nghx5NJ5saRmZ8wKAK2z7xhZ2GgY76RzMwMsuoeLi7-B2dSrYxBnCdojuyFiWBHIiaQ8v8tPT7pQX8WnKtIHJeCPvkAS-P9ASJpcfpffyrrglHVj1_GEUkiKuijSTSDTuv61h3h8CGa0Qv5U1F9eNPQK25mTbsTpPl19YIZl8FyyVdp6Wkx8NNi29p7qSjmDNmGex5laVGl9xp3UYZxajtOPDOS8LEw8I_w2nrGFzWEBpZfbs6Scns5Ubz60jl-eRBB4nLR-TBk7bzDWst7lypdtDH4OF_Wf-SBnVyw0GnoeeZdpIgF63SWKZ1GDBqJeo27Mmj0Xhk9Zq2lQ1n34bSzXSSHbCFXpTpHWw1Mo6jHyd2XWe2Ndd71tPCdcCKW6YDyTzxFpP4S19YSqOen9HHzEbrwzUAqQFN49lLTR7RJeSunVu2TpyG77ovgwOpxKmMr-CujFECgXDpZFn3p5guv5kkDe624a4s0q3WT5YHMuWW3Npnc3iO9w94xQGRUq6oC-9SRuzXGooJXBEaPeHBhnam2ZVURQYM0gJr0FiFFWCLorLR2tOm6I5ykYpatgwTmyko9mRebWBcazQ6bjBPPXpkZ61VIsmalZrqylEHX5I9ZC9QN_CHlSuKOC_TgDLabsu5PubZX4RM6EXfBPgd5JnrBLyuaoJrAHJRdY4vskKXOOZfwz0TyqIPsWFSGTP9QQdqCfiVaKXV7za6OXhZ9gTNo8CmLdLAU1BzgH5wRhpmxkRspUWJ0zVE4adB8OORfy2gPZCFNAIU9osD_N1Jlg5WuLA1ea07xNODSPpp3F59P-thF2v76nLgfw.aV3Eo9zw4iupANcFH9zl3A",
-        "IdToken": "eyJraWQiOiJmQzVGdTM3VDh1R3hUVEhCRndiQzR6UVRmRHFLNTlKYXkyTlhzaXFwV0l3PSIsImFsZyI6IlJTMjU2In0.eyJzdWIiOiJmNGRiOTNjYy02OWQ2LTQyZjgtOWNlNy04OTU3NzZmMTc3ZjUiLCJhdWQiOiIzbmJpcmo0Y2JkMm5ja2tjaTA2cnA5Mzk5NCIsImV2ZW50X2lkIjoiY2YwNjBlMWEtY2M4NC0xMWU4LTk5OGYtMWI0ODIzZDMyZmFiIiwidG9rZW5fdXNlIjoiaWQiLCJhdXRoX3RpbWUiOjE1MzkxNzMxNDEsImlzcyI6Imh0dHBzOlwvXC9jb2duaXRvLWlkcC5ldS13ZXN0LTEuYW1hem9uYXdzLmNvbVwvZXUtd2VzdC0xX3h1V2xrc2J4diIsImNvZ25pdG86dXNlcm5hbWUiOiJyb290IiwiY3VzdG9tOnRlbmFudF9pZCI6IjAwMDAwMDAwLTAwMDAtMDAwMC0wMDAwLTAwMDAwMDAwMDAwMCIsImV4cCI6MTUzOTE3Njc0MSwiaWF0IjoxNTM5MTczMTQxLCJlbWFpbCI6ImdhbHRvbkBldmVydHouY29tIn0.PH0K2LZNdjmDOXfVwry9mV5sVf_ko3t3odJKoPuLu6BlvoIUnAj3YPFGoN_sRmo0iO0Lcu74q5Wd2NeoMexD3kWRKrHIBs9wjlFfg4vy2_HI0hscW1lkq2q7PcMzdjndX8nh-gNZia66AhFL8vwytV0a83NVtFOCcEf_3RFS-m7lkkuynQEOT5gugt4-WiUy1RjBknj-Xh5Bg-GOPsR1FBTU2JxejZ1la5tJk8O2JNYZNEyQAFM4DwDOHNyYRmUlEZYEZYNNu_ppFSp1DJnXeXy4061tTCW7jmCO5BUgTPSiZrPmnsV5NU-XUqC_3AllaQMKtP0soewN0llPHfQETw",
-    }
+    yield JWTS
 
 
-# Sample APIGatewayEvent
 @pytest.fixture()
-def api_gateway_event():
-    def _api_gateway_event(path: str, method: str, path_params: dict = None, body: str = None):
-        request_id = str(uuid.uuid4())
-
-        request_context = {
-            "httpMethod": method,
-            "requestId": request_id,
-            "path": path,
-            "extendedRequestId": None,
-            "resourceId": "123456",
-            "apiId": "1234567890",
-            "stage": "prod",
-            "resourcePath": path,
-            "authorizer": {
-                "jwt_claims": {
-                    "sub": "f4db93cc-69d6-42f8-9ce7-895776f177f5",
-                    "aud": "3nbirj4cbd2nckkci06rp93994",
-                    "event_id": "cf060e1a-cc84-11e8-998f-1b4823d32fab",
-                    "token_use": "id",
-                    "auth_time": 1539173141,
-                    "iss": "https://cognito-idp.eu-west-1.amazonaws.com/eu-west-1_xuWlksbxv",
-                    "cognito:username": "root",
-                    "custom:tenant_id": "00000000-0000-0000-0000-000000000000",
-                    "exp": 1539176741,
-                    "iat": 1539173141,
-                    "email": "galton@evertz.com",
+def dynamodb_table():
+    with mock_aws():
+        table = boto3.resource("dynamodb", region_name="us-east-1").create_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=[
+                {"AttributeName": "pk", "AttributeType": "S"},
+                {"AttributeName": "gsi_pk", "AttributeType": "S"},
+                {"AttributeName": "item_id", "AttributeType": "S"},
+            ],
+            KeySchema=[{"AttributeName": "pk", "KeyType": "HASH"}],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "gsi",
+                    "KeySchema": [
+                        {"AttributeName": "gsi_pk", "KeyType": "HASH"},
+                        {"AttributeName": "item_id", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
                 }
-            },
-            "identity": {
-                "accountId": None,
-                "apiKey": None,
-                "userArn": None,
-                "cognitoAuthenticationProvider": None,
-                "cognitoIdentityPoolId": None,
-                "userAgent": "Custom User Agent String",
-                "caller": None,
-                "cognitoAuthenticationType": None,
-                "sourceIp": "127.0.0.1",
-                "user": None,
-            },
-            "accountId": "123456789012",
-            "domainName": "evertz.io",
-            "domainPrefix": "",
-            "routeKey": "test",
-            "protocol": "HTTPS",
-            "time": datetime.datetime.now().timestamp(),
-            "timeEpoch": datetime.datetime.now(),
-            "requestTime": str(datetime.datetime.now().timestamp()),
-            "requestTimeEpoch": datetime.datetime.now(),
-            "http": {
-                "method": method,
-                "path": path,
-                "protocol": "HTTPS",
-                "sourceIp": "127.0.0.1",
-                "userAgent": "Mozilla",
-            },
-        }
-
-        event = {
-            "body": body,
-            "httpMethod": method,
-            "resource": path,
-            "queryStringParameters": {"foo": "bar"},
-            "requestContext": request_context,
-            "headers": {
-                "Accept-Language": "en-US,en;q=0.8",
-                "Accept-Encoding": "gzip, deflate, sdch",
-                "X-Forwarded-Port": "443",
-                "CloudFront-Viewer-Country": "US",
-                "X-Amz-Cf-Id": "aaaaaaaaaae3VYQb9jd-nvCd-de396Uhbp027Y2JvkCPNLmGJHqlaA==",
-                "CloudFront-Is-Tablet-Viewer": "false",
-                "User-Agent": "Custom User Agent String",
-                "Via": "1.1 08f323deadbeefa7af34d5feb414ce27.cloudfront.net (CloudFront)",
-                "CloudFront-Is-Desktop-Viewer": "true",
-                "CloudFront-Is-SmartTV-Viewer": "false",
-                "CloudFront-Is-Mobile-Viewer": "false",
-                "X-Forwarded-For": "127.0.0.1, 127.0.0.2",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                "Upgrade-Insecure-Requests": "1",
-                "Host": "1234567890.execute-api.us-east-1.amazonaws.com",
-                "X-Forwarded-Proto": "https",
-                "Cache-Control": "max-age=0",
-                "CloudFront-Forwarded-Proto": "https",
-            },
-            "multiValueHeaders": {},
-            "stageVariables": None,
-            "path": path,
-            "pathParameters": path_params,
-            "isBase64Encoded": False,
-            "version": "1.1",
-            "rawPath": path,
-            "rawQueryString": "test",
-            "routeKey": "test",
-        }
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield table
 
-        class Context(object):
-            aws_request_id = event["requestContext"]["requestId"]
 
-        return event, Context()
-
-    return _api_gateway_event
+# Sample APIGatewayEvent
+@pytest.fixture()
+def api_gateway_event():
+    return build_api_gateway_event
 
 
 @pytest.fixture()
@@ -139,9 +63,77 @@ def create_correct_item_event(jwts, api_gateway_event):
     yield event, context
 
 
+@pytest.fixture()
+def update_item_event(jwts, api_gateway_event):
+    path_params = ItemIdPathParam(item_id=ITEM_ID)
+    event, context = api_gateway_event(
+        path=f"/items/{ITEM_ID}", method="PATCH", path_params=path_params.dict(), body='{"text": "Changed"}'
+    )
+    event["headers"]["Authorization"] = jwts["IdToken"]
+    yield event, context
+
+
 @pytest.fixture()
 def get_not_existing_item_event(jwts, api_gateway_event):
     path_params = ItemIdPathParam(item_id="does-not-exist")
     event, context = api_gateway_event(path="/get_item/does-not-exist", method="GET", path_params=path_params.dict())
     event["headers"]["Authorization"] = jwts["IdToken"]
     yield event, context
+
+
+@pytest.fixture()
+def get_items_event(jwts, api_gateway_event):
+    event, context = api_gateway_event(
+        path="/items", method="GET", query_params={"ids": f"{ITEM_ID},does-not-exist,{ITEM_ID}"}
+    )
+    event["headers"]["Authorization"] = jwts["IdToken"]
+    yield event, context
+
+
+@pytest.fixture()
+def create_items_event(jwts, api_gateway_event):
+    items = [Item(success=True, text="Hello").dict(), Item(success=False, text="World").dict()]
+    event, context = api_gateway_event(
+        path="/items:batch", method="POST", body=json.dumps(items), query_params={"check_conflicts": "true"}
+    )
+    event["headers"]["Authorization"] = jwts["IdToken"]
+    yield event, context
+
+
+@pytest.fixture()
+def list_items_event(jwts, api_gateway_event):
+    event, context = api_gateway_event(path="/items", method="GET", query_params={"limit": "1"})
+    event["headers"]["Authorization"] = jwts["IdToken"]
+    yield event, context
+
+
+@pytest.fixture()
+def get_item_stats_event(jwts, api_gateway_event):
+    event, context = api_gateway_event(path="/items/stats", method="GET")
+    event["headers"]["Authorization"] = jwts["IdToken"]
+    yield event, context
+
+
+@pytest.fixture()
+def stream_event():
+    def _modified(text: str, modified_at: str) -> dict:
+        return {
+            "success": True,
+            "text": text,
+            "modification_info": {"last_modified_at": modified_at, "last_modified_by": "USER_ID"},
+        }
+
+    records = [
+        build_stream_record("INSERT", f"{TENANT_ID}#item#1", new_data=_modified("one", "2024-01-01T00:00:01")),
+        build_stream_record("INSERT", f"{TENANT_ID}#item#2", new_data=_modified("two", "2024-01-01T00:00:03")),
+        build_stream_record(
+            "MODIFY",
+            f"{TENANT_ID}#item#1",
+            new_data=_modified("ONE", "2024-01-01T00:00:02"),
+            old_data=_modified("one", "2024-01-01T00:00:01"),
+        ),
+        build_stream_record("REMOVE", f"{TENANT_ID}#item#3", old_data=_modified("three", "2024-01-01T00:00:00")),
+        build_stream_record("INSERT", "OTHER_TENANT#item#1", new_data=_modified("other", "2024-01-01T00:00:00")),
+        build_stream_record("MODIFY", f"{TENANT_ID}#stats", new_data={}),
+    ]
+    yield {"Records": records}, None
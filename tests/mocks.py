@@ -1,7 +1,8 @@
-from typing import Any, Mapping
+from typing import Any, Iterable, Mapping, Optional
 
-from db import Db, ItemKeys, ItemType
-from errors import ItemConflict, ItemNotFound
+from db import Db, IdempotencyKey, ItemKeys, ItemType, ItemUpdate
+from errors import IdempotencyKeyReused, ItemConflict, ItemNotFound, ItemVersionMismatch
+from ids import IdRange
 from tests.data.data_constants import ITEM_ID, TENANT_ID
 
 
@@ -10,7 +11,9 @@ class MockDb(Db):
         super().__init__()
 
     @staticmethod
-    def get_item(item_type: ItemType, tenant_id: str, item_id: str, fields=None) -> dict[str, Any]:
+    def get_item(
+        item_type: ItemType, tenant_id: str, item_id: str, fields=None, consistent: bool = False
+    ) -> dict[str, Any]:
         if (
             ItemKeys.get_keys(item_type=ItemType.ITEM, tenant_id=TENANT_ID, item_id=ITEM_ID).primary
             == ItemKeys.get_keys(item_type=ItemType.ITEM, tenant_id=tenant_id, item_id=item_id).primary
@@ -28,3 +31,72 @@ class MockDb(Db):
             return {"success": True, "text": "Hello"}
         else:
             raise ItemConflict(item_type.value, tenant_id, item_id)
+
+    # request hash and response by tenant and idempotency key
+    idempotency_records: dict[tuple[str, str], tuple[str, dict]] = {}
+
+    @staticmethod
+    def put_item_idempotent(
+        item_type: ItemType, tenant_id: str, item_id: str, item_data: Mapping[str, Any], idempotency_key: IdempotencyKey
+    ) -> tuple[dict[str, Any], bool]:
+        request_hash, response = MockDb.idempotency_records.setdefault(
+            (tenant_id, idempotency_key.key), (idempotency_key.request_hash, dict(item_data))
+        )
+        if request_hash != idempotency_key.request_hash:
+            raise IdempotencyKeyReused(tenant_id, idempotency_key.key)
+        return response, response["id"] != item_id
+
+    @staticmethod
+    def batch_get_items(
+        item_type: ItemType, tenant_id: str, item_ids: Iterable[str], fields=None
+    ) -> dict[str, dict[str, Any]]:
+        return {
+            item_id: {"success": True, "text": "some test text", "id": item_id, "version": 1}
+            for item_id in item_ids
+            if ItemKeys.get_keys(item_type=ItemType.ITEM, tenant_id=TENANT_ID, item_id=ITEM_ID).primary
+            == ItemKeys.get_keys(item_type=ItemType.ITEM, tenant_id=tenant_id, item_id=item_id).primary
+        }
+
+    @staticmethod
+    def put_items(
+        item_type: ItemType, tenant_id: str, items: Mapping[str, Mapping[str, Any]], check_conflicts: bool = False
+    ) -> list[str]:
+        return [
+            item_id
+            for item_id in items
+            if check_conflicts
+            and ItemKeys.get_keys(item_type=ItemType.ITEM, tenant_id=TENANT_ID, item_id=ITEM_ID).primary
+            == ItemKeys.get_keys(item_type=ItemType.ITEM, tenant_id=tenant_id, item_id=item_id).primary
+        ]
+
+    @staticmethod
+    def update_item(item_type: ItemType, tenant_id: str, item_id: str, update: ItemUpdate) -> dict[str, Any]:
+        if (
+            ItemKeys.get_keys(item_type=ItemType.ITEM, tenant_id=TENANT_ID, item_id=ITEM_ID).primary
+            != ItemKeys.get_keys(item_type=ItemType.ITEM, tenant_id=tenant_id, item_id=item_id).primary
+        ):
+            raise ItemNotFound(item_type.value, tenant_id, item_id)
+        if update.expected_version not in (None, 1):
+            raise ItemVersionMismatch(item_type.value, tenant_id, item_id)
+        return {"success": True, "text": "some test text", **update.changes, "version": 2}
+
+    @staticmethod
+    def query_items(
+        item_type: ItemType, tenant_id: str, limit: int, cursor: Optional[str] = None, fields=None
+    ) -> tuple[list[dict[str, Any]], Optional[str]]:
+        if tenant_id != TENANT_ID:
+            return [], None
+        return [{"success": True, "text": "some test text", "id": ITEM_ID, "version": 1}][:limit], None
+
+    @staticmethod
+    def query_items_in_range(
+        item_type: ItemType, tenant_id: str, limit: int, id_range: IdRange
+    ) -> tuple[list[dict[str, Any]], Optional[str]]:
+        if tenant_id != TENANT_ID:
+            return [], None
+        return [{"success": True, "text": "some test text", "id": ITEM_ID, "version": 1}][:limit], None
+
+    @staticmethod
+    def get_stats(tenant_id: str) -> dict[str, Any]:
+        count = 1 if tenant_id == TENANT_ID else 0
+        return {"counts": {ItemType.ITEM.value: count}, "last_modified": None, "updated_at": None}
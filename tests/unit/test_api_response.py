@@ -0,0 +1,51 @@
+import json
+from decimal import Decimal
+from http import HTTPStatus
+
+from api_response import build_response, dumps, etag_matches, etag_version, item_body, item_etag, items_body
+
+
+class TestApiResponse:
+    def test_trusted_item_body_matches_model(self):
+        item = {"success": True, "text": "Hello", "id": "1", "modification_info": {}}
+        assert json.loads(item_body(item, trusted=True)) == json.loads(item_body(item, trusted=False))
+
+    def test_trusted_items_body_matches_model(self):
+        items = [
+            {"success": True, "text": "Hello", "id": "1", "version": 2, "modification_info": {"created_by": "user"}},
+            {"success": False, "text": "World", "id": "2", "internal": "skipped"},
+        ]
+        body = json.loads(items_body(items, {"cursor": None}, trusted=True))
+        assert body == json.loads(items_body(items, {"cursor": None}, trusted=False))
+        assert [item["id"] for item in body["data"]] == ["1", "2"]
+        assert body["data"][1] == {"success": False, "text": "World", "id": "2"}
+
+    def test_dumps_decimals(self):
+        assert json.loads(dumps({"count": Decimal("2"), "ratio": Decimal("0.5")})) == {"count": 2, "ratio": 0.5}
+
+    def test_build_response_headers_not_shared(self):
+        response = build_response(HTTPStatus.OK, "{}")
+        response["headers"]["X-Extra"] = "1"
+        assert build_response(HTTPStatus.OK, "{}")["headers"] == {"Content-Type": "application/vnd.api+json"}
+
+    def test_item_etag(self):
+        assert item_etag({"version": Decimal("3")}) == item_etag({"success": True, "version": 3}) == '"v3"'
+        assert item_etag({"success": True, "text": "Hello"}) == item_etag({"success": True, "text": "Hello", "id": "1"})
+        assert item_etag({"success": True, "text": "Hello"}) != item_etag({"success": True, "text": "World"})
+
+    def test_etag_matches(self):
+        assert etag_matches('"v1"', '"v1"')
+        assert etag_matches('"v0", W/"v1"', '"v1"')
+        assert etag_matches("*", '"v1"')
+        assert not etag_matches('"v2"', '"v1"')
+
+    def test_etag_version(self):
+        assert etag_version('"v3"') == 3
+        assert etag_version(" * ") is None
+        assert etag_version('"0123456789abcdef0123456789abcdef"') == 0
+        assert etag_version('W/"v3"') == 0
+
+    def test_trusted_partial_item_body_matches_model(self):
+        item = {"text": "Hello", "version": 1}
+        assert item_body(item, trusted=True, fields=["text"]) == item_body(item, trusted=False, fields=["text"])
+        assert json.loads(item_body(item, trusted=True, fields=["text", "success"])) == {"text": "Hello"}
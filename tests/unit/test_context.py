@@ -0,0 +1,32 @@
+import json
+import logging
+from unittest.mock import MagicMock, patch
+
+import context
+from context import JsonFormatter, Lazy, logger, sample_log_level
+
+
+class TestContext:
+    def test_json_formatter_fields(self):
+        record = logging.makeLogRecord(
+            {"msg": "Getting item", "levelname": "INFO", "item_id": "abc", "count": 3, "data": {"text": "x" * 20}}
+        )
+        entry = json.loads(JsonFormatter(max_field_length=10).format(record))
+        assert entry["message"] == "Getting it...[2 more]"
+        assert entry["item_id"] == "abc"
+        assert entry["count"] == 3
+        assert entry["data"] == "{'text': '...[22 more]"
+
+    def test_lazy_not_rendered_when_level_disabled(self):
+        render = MagicMock(return_value="payload")
+        logger.setLevel(logging.INFO)
+        logger.debug("Payload", extra={"payload": Lazy(render)})
+        render.assert_not_called()
+
+    def test_sample_log_level(self):
+        with patch.object(context, "LOG_DEBUG_SAMPLE_RATE", 0.5), patch("context.random.random", return_value=0.1):
+            sample_log_level()
+        assert logger.level == logging.DEBUG
+        with patch.object(context, "LOG_DEBUG_SAMPLE_RATE", 0.5), patch("context.random.random", return_value=0.9):
+            sample_log_level()
+        assert logger.level == logging.getLevelName(context.LOG_LEVEL)
@@ -0,0 +1,266 @@
+import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+from config import TABLE_NAME
+from context import deadline
+from db import Db, IdempotencyKey, ItemType, ItemUpdate, TableCache, table_cache
+from errors import (
+    DatabaseThrottled,
+    IdempotencyKeyReused,
+    InvalidCursor,
+    ItemNotFound,
+    ItemsUnprocessed,
+    ItemVersionMismatch,
+)
+from tests.data.data_constants import ITEM_ID, TENANT_ID
+
+
+@pytest.fixture()
+def database(dynamodb_table):
+    table_cache.clear()
+    with patch("db.restricted_table", return_value=dynamodb_table):
+        yield Db()
+    table_cache.clear()
+
+
+class TestDb:
+    def test_table_cache(self, database):
+        database.put_item(ItemType.ITEM, TENANT_ID, ITEM_ID, {"text": "Hello"})
+        database.get_item(ItemType.ITEM, TENANT_ID, ITEM_ID)
+
+        assert table_cache.stats() == {"hits": 1, "misses": 1, "refreshes": 0, "size": 1}
+
+    def test_table_cache_refresh_and_eviction(self, dynamodb_table):
+        cache = TableCache(max_size=1, ttl=10, refresh_margin=10)
+        with patch("db.restricted_table", return_value=dynamodb_table) as mock_restricted_table:
+            cache.get("table", TENANT_ID)
+            cache.get("table", TENANT_ID)
+            cache.get("table", "other-tenant")
+
+        assert mock_restricted_table.call_count == 3
+        assert cache.stats() == {"hits": 0, "misses": 2, "refreshes": 1, "size": 1}
+
+    def test_table_cache_credentials_expiry(self):
+        table = MagicMock()
+        table.meta.client._request_signer._credentials._expiry_time = datetime.datetime.fromtimestamp(
+            1000.0 + 400, tz=datetime.timezone.utc
+        )
+        cache = TableCache(max_size=1, ttl=3600, refresh_margin=300)
+        with patch("db.restricted_table", return_value=table) as mock_restricted_table, patch(
+            "db.time.time", return_value=1000.0
+        ), patch("db.time.monotonic", return_value=0.0) as monotonic:
+            cache.get("table", TENANT_ID)
+            monotonic.return_value = 90.0
+            cache.get("table", TENANT_ID)
+            # the credentials expire in 400 seconds, long before the configured ttl
+            monotonic.return_value = 110.0
+            cache.get("table", TENANT_ID)
+
+        assert mock_restricted_table.call_count == 2
+        assert cache.stats() == {"hits": 1, "misses": 1, "refreshes": 1, "size": 1}
+
+    def test_batch_get_items(self, database):
+        item_ids = [f"{index:08d}-0000-0000-0000-000000000000" for index in range(150)]
+        for item_id in item_ids:
+            database.put_item(ItemType.ITEM, TENANT_ID, item_id, {"success": True, "text": item_id})
+
+        items = database.batch_get_items(ItemType.ITEM, TENANT_ID, item_ids + [ITEM_ID, item_ids[0]])
+        assert len(items) == 150
+        assert items[item_ids[-1]] == {"success": True, "text": item_ids[-1]}
+        assert ITEM_ID not in items
+
+    def test_batch_get_items_other_tenant(self, database):
+        database.put_item(ItemType.ITEM, TENANT_ID, ITEM_ID, {"success": True, "text": "Hello"})
+
+        assert database.batch_get_items(ItemType.ITEM, "other-tenant", [ITEM_ID]) == {}
+
+    def test_batch_get_items_fields(self, database):
+        database.put_item(ItemType.ITEM, TENANT_ID, ITEM_ID, {"success": True, "text": "Hello"})
+
+        assert database.batch_get_items(ItemType.ITEM, TENANT_ID, [ITEM_ID], fields=["text"]) == {
+            ITEM_ID: {"text": "Hello"}
+        }
+
+    def test_put_items(self, database):
+        items = {f"{index:08d}-0000-0000-0000-000000000000": {"text": str(index)} for index in range(60)}
+
+        assert database.put_items(ItemType.ITEM, TENANT_ID, items) == []
+        assert database.batch_get_items(ItemType.ITEM, TENANT_ID, items) == items
+
+    def test_put_items_unprocessed_past_deadline(self, database, dynamodb_table):
+        def unprocessed(RequestItems, **kwargs):
+            return {"UnprocessedItems": RequestItems}
+
+        deadline.start(MagicMock(get_remaining_time_in_millis=MagicMock(return_value=100)))
+        try:
+            with patch.object(
+                dynamodb_table.meta.client, "batch_write_item", side_effect=unprocessed
+            ) as batch_write, patch("resilience.time.sleep") as sleep, pytest.raises(ItemsUnprocessed):
+                database.put_items(ItemType.ITEM, TENANT_ID, {ITEM_ID: {"text": "Hello"}})
+        finally:
+            deadline.start(None)
+        # the invocation has no time left for another attempt, so it fails without waiting
+        batch_write.assert_called_once()
+        sleep.assert_not_called()
+        assert TABLE_NAME in batch_write.call_args.kwargs["RequestItems"]
+
+    def test_put_items_check_conflicts(self, database):
+        database.put_item(ItemType.ITEM, TENANT_ID, ITEM_ID, {"text": "existing"})
+        items = {ITEM_ID: {"text": "new"}, "a1f5e5e4-2b1c-4a0e-9d4f-0c5f3f7d2a11": {"text": "new"}}
+
+        assert database.put_items(ItemType.ITEM, TENANT_ID, items, check_conflicts=True) == [ITEM_ID]
+        assert database.batch_get_items(ItemType.ITEM, TENANT_ID, items) == {
+            ITEM_ID: {"text": "existing"},
+            "a1f5e5e4-2b1c-4a0e-9d4f-0c5f3f7d2a11": {"text": "new"},
+        }
+
+    def test_query_items_pages(self, database):
+        items = {f"{index:08d}-0000-0000-0000-000000000000": {"text": str(index)} for index in range(5)}
+        database.put_items(ItemType.ITEM, TENANT_ID, items)
+        database.put_item(ItemType.ITEM, "other-tenant", ITEM_ID, {"text": "other"})
+
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = database.query_items(ItemType.ITEM, TENANT_ID, limit=2, cursor=cursor, fields=["text"])
+            pages.append(page)
+            if cursor is None:
+                break
+        assert pages == [[{"text": "0"}, {"text": "1"}], [{"text": "2"}, {"text": "3"}], [{"text": "4"}]]
+
+    def test_query_items_sharded(self, database, dynamodb_table):
+        items = {f"{index:08d}-0000-0000-0000-000000000000": {"text": str(index)} for index in range(12)}
+        database.put_items(ItemType.ITEM, TENANT_ID, dict(list(items.items())[:4]))
+        # items written before the number of shards was raised stay in shard 0
+        with patch("shards.GSI_SHARDS", 4):
+            database.put_items(ItemType.ITEM, TENANT_ID, dict(list(items.items())[4:]))
+
+            pages = []
+            cursor = None
+            while True:
+                page, cursor = database.query_items(ItemType.ITEM, TENANT_ID, limit=5, cursor=cursor, fields=["text"])
+                pages.append(page)
+                if cursor is None:
+                    break
+            exported = [item for item, _ in database.iter_items(ItemType.ITEM, TENANT_ID, page_size=2)]
+
+        shards = {item["gsi_pk"] for item in dynamodb_table.scan()["Items"]}
+        assert len(shards) > 1
+        assert [len(page) for page in pages] == [5, 5, 2]
+        assert [item["text"] for page in pages for item in page] == [str(index) for index in range(12)]
+        assert exported == list(items.values())
+
+    def test_query_items_invalid_cursor(self, database):
+        with pytest.raises(InvalidCursor):
+            database.query_items(ItemType.ITEM, TENANT_ID, limit=2, cursor="%%%")
+
+    def test_update_stats(self, database):
+        newer = {"at": "2024-01-01T00:00:02", "by": "USER_ID", "item_id": ITEM_ID}
+        older = {"at": "2024-01-01T00:00:01", "by": "USER_ID", "item_id": "older"}
+
+        assert database.get_stats(TENANT_ID)["counts"] == {"item": 0}
+        database.update_stats(TENANT_ID, {ItemType.ITEM: 2}, newer)
+        database.update_stats(TENANT_ID, {ItemType.ITEM: -1}, older)
+
+        stats = database.get_stats(TENANT_ID)
+        assert stats["counts"] == {"item": 1}
+        assert stats["last_modified"] == newer
+
+    def test_compressed_item_data(self, database, dynamodb_table):
+        large = {"success": True, "text": "Hello " * 1000, "count": 3}
+        small = {"success": True, "text": "Hello"}
+        with patch("db.DATA_COMPRESSION_THRESHOLD", 1024):
+            database.put_item(ItemType.ITEM, TENANT_ID, ITEM_ID, large)
+            database.put_items(ItemType.ITEM, TENANT_ID, {"small": small})
+
+        stored = dynamodb_table.get_item(Key={"pk": f"{TENANT_ID}#item#{ITEM_ID}"})["Item"]
+        assert "data" not in stored
+        assert stored["data_codec"] == "zlib+json"
+        assert len(stored["data_compressed"].value) < 100
+        assert database.get_item(ItemType.ITEM, TENANT_ID, ITEM_ID) == large
+        assert database.get_item(ItemType.ITEM, TENANT_ID, ITEM_ID, fields=["text"]) == {"text": large["text"]}
+        assert database.batch_get_items(ItemType.ITEM, TENANT_ID, [ITEM_ID, "small"], fields=["success"]) == {
+            ITEM_ID: {"success": True},
+            "small": {"success": True},
+        }
+        assert database.query_items(ItemType.ITEM, TENANT_ID, limit=10, fields=["count"]) == ([{"count": 3}, {}], None)
+
+    def test_put_item_idempotent(self, database, dynamodb_table):
+        key = IdempotencyKey("retry-me", "hash")
+        item = {"success": True, "text": "Hello", "id": ITEM_ID}
+
+        assert database.put_item_idempotent(ItemType.ITEM, TENANT_ID, ITEM_ID, item, key) == (item, False)
+        assert database.put_item_idempotent(ItemType.ITEM, TENANT_ID, "second-id", item, key) == (item, True)
+        with pytest.raises(ItemNotFound):
+            database.get_item(ItemType.ITEM, TENANT_ID, "second-id")
+        with pytest.raises(IdempotencyKeyReused):
+            database.put_item_idempotent(
+                ItemType.ITEM, TENANT_ID, "third-id", item, IdempotencyKey("retry-me", "other")
+            )
+
+        record = dynamodb_table.get_item(Key={"pk": f"{TENANT_ID}#idempotency#retry-me"})["Item"]
+        assert "gsi_pk" not in record
+        assert record["expires_at"] > 0
+
+    def test_put_item_idempotent_expired(self, database):
+        item = {"success": True, "text": "Hello"}
+        with patch("db.IDEMPOTENCY_TTL", -1):
+            database.put_item_idempotent(ItemType.ITEM, TENANT_ID, ITEM_ID, item, IdempotencyKey("retry-me", "hash"))
+
+        assert database.put_item_idempotent(
+            ItemType.ITEM, TENANT_ID, "second-id", item, IdempotencyKey("retry-me", "other")
+        ) == (item, False)
+
+    def test_put_item_idempotent_throttled(self, database, dynamodb_table):
+        cancelled = ClientError(
+            {
+                "Error": {"Code": "TransactionCanceledException"},
+                "CancellationReasons": [{"Code": "None"}, {"Code": "ThrottlingError"}],
+            },
+            "TransactWriteItems",
+        )
+        with patch.object(dynamodb_table.meta.client, "transact_write_items", side_effect=cancelled):
+            with pytest.raises(DatabaseThrottled):
+                database.put_item_idempotent(
+                    ItemType.ITEM, TENANT_ID, ITEM_ID, {"text": "Hello"}, IdempotencyKey("retry-me", "hash")
+                )
+
+    def test_update_item(self, database):
+        created = {"created_at": "2024-01-01T00:00:00", "created_by": "creator"}
+        database.put_item(
+            ItemType.ITEM,
+            TENANT_ID,
+            ITEM_ID,
+            {"success": True, "text": "Hello", "version": 1, "modification_info": created},
+        )
+
+        update = ItemUpdate(
+            {"text": "Changed"}, modified_by="editor", modified_at="2024-01-02T00:00:00", expected_version=1
+        )
+        item = database.update_item(ItemType.ITEM, TENANT_ID, ITEM_ID, update)
+        assert item == {
+            "success": True,
+            "text": "Changed",
+            "version": 2,
+            "modification_info": {**created, "last_modified_at": "2024-01-02T00:00:00", "last_modified_by": "editor"},
+        }
+        with pytest.raises(ItemVersionMismatch):
+            database.update_item(ItemType.ITEM, TENANT_ID, ITEM_ID, update)
+        with pytest.raises(ItemNotFound):
+            database.update_item(ItemType.ITEM, TENANT_ID, "does-not-exist", update)
+
+    def test_update_compressed_item(self, database):
+        with patch("db.DATA_COMPRESSION_THRESHOLD", 1):
+            database.put_item(ItemType.ITEM, TENANT_ID, ITEM_ID, {"success": True, "text": "Hello"})
+            update = ItemUpdate({"text": "Changed"}, modified_by="editor", modified_at="2024-01-02T00:00:00")
+            database.update_item(ItemType.ITEM, TENANT_ID, ITEM_ID, update)
+
+        item = database.get_item(ItemType.ITEM, TENANT_ID, ITEM_ID)
+        assert (item["text"], item["version"], item["modification_info"]["last_modified_by"]) == (
+            "Changed",
+            1,
+            "editor",
+        )
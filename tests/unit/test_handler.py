@@ -1,9 +1,17 @@
 import json
+import time
 from functools import wraps
 from http import HTTPStatus
 from unittest.mock import patch
 
-from tests.data.data_constants import ITEM_ID
+import pytest
+
+from db import ItemType, table_cache
+from errors import DatabaseThrottled
+from models import ItemModel, LightItemModel
+from rate_limit import TABLE, TenantRateLimiter, rate_limit
+from tests.data.data_constants import ITEM_ID, TENANT_ID
+from tests.data.events import id_token
 from tests.mocks import MockDb
 
 
@@ -24,6 +32,16 @@ def mock_decorator(*args, **kwargs):
 patch("evertz_io_observability.decorators.start_span", mock_decorator).start()
 
 import handler
+from cache import identity_cache, item_cache, token_expiry
+
+
+@pytest.fixture(autouse=True)
+def clear_item_cache():
+    item_cache.clear()
+    identity_cache.clear()
+    yield
+    item_cache.clear()
+    identity_cache.clear()
 
 
 class TestHandler:
@@ -50,6 +68,81 @@ class TestHandler:
         assert "errors" in body
         assert body["errors"][0]["code"] == "ItemNotFound"
 
+    @patch("handler.Db")
+    def test_get_item_not_modified(self, mock_db, get_correct_item_event):
+        event, context = get_correct_item_event
+
+        mock_db.return_value = MockDb()
+        etag = handler.get_item(event, context)["headers"]["ETag"]
+        event["headers"]["if-none-match"] = etag
+        response = handler.get_item(event, context)
+        assert response["statusCode"] == HTTPStatus.NOT_MODIFIED
+        assert response["headers"]["ETag"] == etag
+        assert response["body"] == ""
+
+        event["headers"]["if-none-match"] = '"stale"'
+        response = handler.get_item(event, context)
+        assert response["statusCode"] == HTTPStatus.OK
+        assert response["headers"]["ETag"] == etag
+
+    @patch("handler.Db")
+    def test_get_item_fields(self, mock_db, get_correct_item_event):
+        event, context = get_correct_item_event
+
+        mock_db.return_value = MockDb()
+        event["queryStringParameters"] = {"fields": "text"}
+        response = handler.get_item(event, context)
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"]) == {"text": "some test text"}
+
+        # the ETag is the one of the whole item, so conditional requests of the fieldset get 304
+        event["headers"]["If-None-Match"] = response["headers"]["ETag"]
+        assert handler.get_item(event, context)["statusCode"] == HTTPStatus.NOT_MODIFIED
+        del event["headers"]["If-None-Match"]
+
+        event["queryStringParameters"] = {"fields": "text,secret"}
+        response = handler.get_item(event, context)
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        assert json.loads(response["body"])["errors"][0]["code"] == "InvalidFields"
+
+    @pytest.mark.parametrize("fields", ["", ",", " , "])
+    @patch("handler.Db")
+    def test_get_item_empty_fields(self, mock_db, get_correct_item_event, fields):
+        event, context = get_correct_item_event
+        event["queryStringParameters"] = {"fields": fields}
+
+        mock_db.return_value = MockDb()
+        response = handler.get_item(event, context)
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        assert json.loads(response["body"])["errors"][0]["code"] == "InvalidFields"
+
+    @patch("handler.Db")
+    def test_update_item(self, mock_db, update_item_event):
+        event, context = update_item_event
+
+        mock_db.return_value = MockDb()
+        event["headers"]["If-Match"] = '"v1"'
+        response = handler.update_item(event, context)
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"]) == {"success": True, "text": "Changed"}
+        assert response["headers"]["ETag"] == '"v2"'
+
+        event["headers"]["If-Match"] = '"v2"'
+        response = handler.update_item(event, context)
+        assert response["statusCode"] == HTTPStatus.PRECONDITION_FAILED
+        assert json.loads(response["body"])["errors"][0]["code"] == "ItemVersionMismatch"
+
+        # weak ETags never satisfy If-Match, even of the current version
+        event["headers"]["If-Match"] = 'W/"v1"'
+        with patch.object(MockDb, "update_item") as mock_update_item:
+            response = handler.update_item(event, context)
+        mock_update_item.assert_not_called()
+        assert response["statusCode"] == HTTPStatus.PRECONDITION_FAILED
+
+        event["body"] = '{"text": null}'
+        response = handler.update_item(event, context)
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+
     @patch("handler.Db")
     def test_create_item_success(self, mock_db, create_correct_item_event):
         event, context = create_correct_item_event
@@ -63,14 +156,256 @@ class TestHandler:
         assert headers["Content-Type"] == "application/vnd.api+json"
 
     @patch("handler.Db")
-    @patch("uuid.uuid4")
-    def test_create_item_conflict(self, mock_uuid4, mock_db, create_correct_item_event):
+    @patch("service.new_item_id")
+    def test_create_item_conflict(self, mock_new_item_id, mock_db, create_correct_item_event):
         event, context = create_correct_item_event
 
         mock_db.return_value = MockDb()
-        mock_uuid4.return_value = ITEM_ID
+        mock_new_item_id.return_value = ITEM_ID
         response = handler.create_item(event, context)
         assert response["statusCode"] == HTTPStatus.CONFLICT
         body = json.loads(response["body"])
         assert "errors" in body
         assert body["errors"][0]["code"] == "ItemConflict"
+
+    @patch("handler.Db")
+    def test_get_items_success(self, mock_db, get_items_event):
+        event, context = get_items_event
+
+        mock_db.return_value = MockDb()
+        response = handler.get_items(event, context)
+        assert response["statusCode"] == HTTPStatus.OK
+        body = json.loads(response["body"])
+        # listed items keep their id, so they can be fetched and updated
+        assert body["data"] == [{"success": True, "text": "some test text", "id": ITEM_ID, "version": 1}]
+        assert body["meta"] == {"not_found": ["does-not-exist"]}
+        headers = response["headers"]
+        assert headers["Content-Type"] == "application/vnd.api+json"
+
+    @pytest.mark.parametrize("ids", ["", ",", ",".join(str(index) for index in range(101))])
+    @patch("handler.Db")
+    def test_get_items_invalid_ids(self, mock_db, get_items_event, ids):
+        event, context = get_items_event
+        event["queryStringParameters"] = {"ids": ids}
+
+        mock_db.return_value = MockDb()
+        response = handler.get_items(event, context)
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        error = json.loads(response["body"])["errors"][0]
+        assert error["code"] == "InvalidQueryParameters"
+        assert error["detail"] == "Query parameters [ids] are not valid."
+
+    @patch("handler.Db")
+    def test_create_items_success(self, mock_db, create_items_event):
+        event, context = create_items_event
+
+        mock_db.return_value = MockDb()
+        response = handler.create_items(event, context)
+        assert response["statusCode"] == HTTPStatus.OK
+        body = json.loads(response["body"])
+        assert [item["text"] for item in body["data"]] == ["Hello", "World"]
+        assert body["meta"] == {"conflicts": []}
+
+    @patch("handler.Db")
+    @patch("service.new_item_id")
+    def test_create_items_conflict(self, mock_new_item_id, mock_db, create_items_event):
+        event, context = create_items_event
+
+        mock_db.return_value = MockDb()
+        mock_new_item_id.side_effect = [ITEM_ID, "a1f5e5e4-2b1c-4a0e-9d4f-0c5f3f7d2a11"]
+        response = handler.create_items(event, context)
+        assert response["statusCode"] == HTTPStatus.OK
+        body = json.loads(response["body"])
+        assert [item["text"] for item in body["data"]] == ["World"]
+        assert body["meta"]["conflicts"][0]["code"] == "ItemConflict"
+
+    @patch("handler.Db")
+    def test_get_item_cached(self, mock_db, get_correct_item_event):
+        event, context = get_correct_item_event
+
+        mock_db.return_value = MockDb()
+        handler.get_item(event, context)
+        with patch.object(MockDb, "get_item") as mock_get_item:
+            response = handler.get_item(event, context)
+        mock_get_item.assert_not_called()
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"]) == {"success": True, "text": "some test text"}
+        assert item_cache.stats() == {"hits": 1, "misses": 1}
+
+    @patch("handler.Db")
+    def test_create_item_populates_cache(self, mock_db, create_correct_item_event):
+        event, context = create_correct_item_event
+
+        mock_db.return_value = MockDb()
+        body = json.loads(handler.create_item(event, context)["body"])
+        assert item_cache.get(ItemType.ITEM, TENANT_ID, body["id"]) == body
+
+    @patch("handler.Db")
+    def test_create_item_idempotent(self, mock_db, create_correct_item_event):
+        event, context = create_correct_item_event
+        event["headers"]["idempotency-key"] = "retry-me"
+
+        mock_db.return_value = MockDb()
+        MockDb.idempotency_records.clear()
+        first = handler.create_item(event, context)
+        item_cache.clear()
+        replayed = handler.create_item(event, context)
+        with patch.object(MockDb, "put_item_idempotent") as mock_put_item_idempotent:
+            cached = handler.create_item(event, context)
+        mock_put_item_idempotent.assert_not_called()
+
+        assert "Idempotent-Replayed" not in first["headers"]
+        for response in (replayed, cached):
+            assert response["statusCode"] == HTTPStatus.OK
+            assert response["body"] == first["body"]
+            assert response["headers"]["Idempotent-Replayed"] == "true"
+
+        event["body"] = json.dumps({"success": True, "text": "Other"})
+        response = handler.create_item(event, context)
+        assert response["statusCode"] == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert json.loads(response["body"])["errors"][0]["code"] == "IdempotencyKeyReused"
+
+    @patch("handler.Db")
+    @patch.object(item_cache, "negative_ttl", 5)
+    def test_get_item_not_found_cached(self, mock_db, get_not_existing_item_event):
+        event, context = get_not_existing_item_event
+
+        mock_db.return_value = MockDb()
+        handler.get_item(event, context)
+        with patch.object(MockDb, "get_item") as mock_get_item:
+            response = handler.get_item(event, context)
+        mock_get_item.assert_not_called()
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
+
+    @patch("handler.Db")
+    def test_get_item_stats_success(self, mock_db, get_item_stats_event):
+        event, context = get_item_stats_event
+
+        mock_db.return_value = MockDb()
+        response = handler.get_item_stats(event, context)
+        assert response["statusCode"] == HTTPStatus.OK
+        body = json.loads(response["body"])
+        assert body == {"counts": {"item": 1}, "last_modified": None, "updated_at": None}
+
+    @patch("handler.Db")
+    def test_get_item_stats_table_rate_limit(self, mock_db, dynamodb_table, get_item_stats_event):
+        event, context = get_item_stats_event
+
+        mock_db.return_value = MockDb()
+        limiter = TenantRateLimiter(rate_limit(1, 1), {}, mode=TABLE)
+        table_cache.clear()
+        with patch("service.tenant_rate_limiter", limiter), patch(
+            "db.restricted_table", return_value=dynamodb_table
+        ), patch("rate_limit.time.time", return_value=30.0):
+            responses = [handler.get_item_stats(event, context) for _ in range(2)]
+        table_cache.clear()
+        # the read counts the request in the table through the restricted table of its tenant
+        assert [response["statusCode"] for response in responses] == [HTTPStatus.OK, HTTPStatus.TOO_MANY_REQUESTS]
+        assert responses[1]["headers"]["Retry-After"] == "1"
+        windows = dynamodb_table.scan()["Items"]
+        assert [window["pk"] for window in windows] == [f"{TENANT_ID}#rate_limit#30"]
+
+    @patch("handler.Db")
+    def test_list_items_success(self, mock_db, list_items_event):
+        event, context = list_items_event
+
+        mock_db.return_value = MockDb()
+        response = handler.get_items(event, context)
+        assert response["statusCode"] == HTTPStatus.OK
+        body = json.loads(response["body"])
+        assert body == {
+            "data": [{"success": True, "text": "some test text", "id": ITEM_ID, "version": 1}],
+            "meta": {"cursor": None},
+        }
+
+    @patch("handler.Db")
+    def test_list_items_created_range(self, mock_db, list_items_event):
+        event, context = list_items_event
+        event["queryStringParameters"] = {"created_after": "2024-01-01T00:00:00Z"}
+
+        mock_db.return_value = MockDb()
+        response = handler.get_items(event, context)
+        assert response["statusCode"] == HTTPStatus.OK
+        assert [item["id"] for item in json.loads(response["body"])["data"]] == [ITEM_ID]
+
+    @pytest.mark.parametrize("limit", ["abc", "0", "101"])
+    @patch("handler.Db")
+    def test_list_items_invalid_limit(self, mock_db, list_items_event, limit):
+        event, context = list_items_event
+        event["queryStringParameters"] = {"limit": limit}
+
+        mock_db.return_value = MockDb()
+        response = handler.get_items(event, context)
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        error = json.loads(response["body"])["errors"][0]
+        assert error["code"] == "InvalidQueryParameters"
+        assert error["detail"] == "Query parameters [limit] are not valid."
+
+    @pytest.mark.parametrize("name", ["created_after", "created_before"])
+    @patch("handler.Db")
+    def test_list_items_invalid_created_range(self, mock_db, list_items_event, name):
+        event, context = list_items_event
+        event["queryStringParameters"] = {name: "notadate"}
+
+        mock_db.return_value = MockDb()
+        response = handler.get_items(event, context)
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        error = json.loads(response["body"])["errors"][0]
+        assert error["code"] == "InvalidQueryParameters"
+        assert error["detail"] == f"Query parameters [{name}] are not valid."
+
+    @patch("handler.Db")
+    def test_get_item_throttled(self, mock_db, get_correct_item_event):
+        event, context = get_correct_item_event
+
+        mock_db.return_value = MockDb()
+        with patch.object(MockDb, "get_item", side_effect=DatabaseThrottled(0.2)):
+            response = handler.get_item(event, context)
+        assert response["statusCode"] == HTTPStatus.TOO_MANY_REQUESTS
+        assert response["headers"]["Retry-After"] == "1"
+        assert json.loads(response["body"])["errors"][0]["code"] == "DatabaseThrottled"
+
+
+class TestLightEventParsing:
+    def test_light_event_matches_full_event(self, create_correct_item_event):
+        event, _ = create_correct_item_event
+
+        full = ItemModel.model_validate(event)
+        light = LightItemModel.model_validate(event)
+        assert light.body == full.body
+        assert light.headers == full.headers
+        assert light.requestContext.requestId == full.requestContext.requestId
+        assert light.raw_event is event
+
+    def test_identity_from_raw_event(self, create_correct_item_event):
+        event, _ = create_correct_item_event
+
+        with patch("handler.get_identity_from_event") as mock_get_identity:
+            handler._identity(LightItemModel.model_validate(event))
+        mock_get_identity.assert_called_once_with(event=event, verify=False)
+
+
+class TestIdentityCache:
+    def test_identity_cached_until_token_expires(self, create_correct_item_event):
+        event, _ = create_correct_item_event
+        expires_at = int(time.time()) + 60
+        event["headers"]["Authorization"] = id_token(TENANT_ID, "user", expires_at)
+        parsed = LightItemModel.model_validate(event)
+
+        first = handler._identity(parsed)
+        assert handler._identity(parsed) is first
+        assert identity_cache.stats() == {"hits": 1, "misses": 1}
+        with patch("cache.time.time", return_value=expires_at):
+            assert handler._identity(parsed) is not first
+        assert identity_cache.stats() == {"hits": 1, "misses": 2}
+
+    def test_expired_token_not_cached(self, create_correct_item_event):
+        event, _ = create_correct_item_event
+        parsed = LightItemModel.model_validate(event)
+
+        assert handler._identity(parsed) is not handler._identity(parsed)
+        assert identity_cache.stats() == {"hits": 0, "misses": 2}
+
+    def test_token_expiry(self):
+        assert token_expiry("Bearer " + id_token(TENANT_ID, "user", 2000000000)) == 2000000000
+        assert token_expiry("not-a-token") is None
@@ -0,0 +1,38 @@
+import datetime
+import uuid
+from unittest.mock import patch
+
+from ids import IdRange, TimeOrderedIds, first_id, is_time_ordered, last_id
+
+CREATED_AT = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+CREATED_AT_NS = int(CREATED_AT.timestamp()) * 1_000_000_000
+
+
+class TestIds:
+    def test_time_ordered_ids(self):
+        generator = TimeOrderedIds()
+        with patch("ids.time.time_ns", return_value=CREATED_AT_NS):
+            same_ms = [str(generator.new()) for _ in range(5000)]
+        with patch("ids.time.time_ns", return_value=CREATED_AT_NS - 1_000_000):
+            clock_back = str(generator.new())
+
+        assert all(uuid.UUID(item_id).version == 7 for item_id in same_ms)
+        assert same_ms == sorted(same_ms) and len(set(same_ms)) == len(same_ms)
+        assert same_ms[-1] < clock_back
+        assert first_id(CREATED_AT) <= same_ms[0] <= last_id(CREATED_AT)
+
+    def test_is_time_ordered(self):
+        assert is_time_ordered(first_id(CREATED_AT))
+        assert not is_time_ordered(str(uuid.uuid4()))
+        assert not is_time_ordered("not-an-id")
+
+    def test_created_range(self):
+        created_before = CREATED_AT + datetime.timedelta(seconds=1)
+        id_range = IdRange.created(CREATED_AT.replace(tzinfo=None), created_before, None)
+
+        assert id_range.contains(first_id(CREATED_AT))
+        assert id_range.contains(last_id(created_before - datetime.timedelta(milliseconds=1)))
+        assert not id_range.contains(first_id(created_before))
+        assert not id_range.contains(str(uuid.UUID(first_id(CREATED_AT)[:14] + "4" + first_id(CREATED_AT)[15:])))
+        assert IdRange.created(created_before, CREATED_AT, None).is_empty()
+        assert not IdRange(after=first_id(CREATED_AT)).is_empty()
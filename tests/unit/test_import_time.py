@@ -0,0 +1,48 @@
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+from build_scripts import import_time
+
+
+def importtime_report(handler_us: int) -> str:
+    return "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |   json",
+            f"import time:       500 | {handler_us:10d} | handler",
+        ]
+    )
+
+
+def completed(stderr: str) -> subprocess.CompletedProcess:
+    return subprocess.CompletedProcess(args=[], returncode=0, stdout="", stderr=stderr)
+
+
+class TestImportTime:
+    def test_measure_keeps_fastest_run(self):
+        runs = [completed(importtime_report(3000)), completed(importtime_report(2000))]
+        with patch("build_scripts.import_time.subprocess.run", side_effect=runs):
+            imports = {entry.name: entry for entry in import_time.measure("handler", repeat=2)}
+        assert imports["handler"].cumulative_us == 2000
+        assert imports["handler"].depth == 0
+        assert imports["json"].depth == 1
+
+    def test_measure_sets_region(self):
+        with patch("build_scripts.import_time.subprocess.run", return_value=completed(importtime_report(2000))) as run:
+            import_time.measure("deployment_hooks", repeat=1)
+        assert run.call_args.kwargs["env"]["AWS_DEFAULT_REGION"]
+
+    @pytest.mark.parametrize("budget_ms, exits", [("5", False), ("1", True)])
+    def test_budget(self, budget_ms, exits):
+        argv = ["import_time.py", "handler", "--repeat", "1", "--budget-ms", budget_ms]
+        with patch(
+            "build_scripts.import_time.subprocess.run", return_value=completed(importtime_report(2000))
+        ), patch.object(sys, "argv", argv):
+            if exits:
+                with pytest.raises(SystemExit) as exit_info:
+                    import_time.main()
+                assert exit_info.value.code == 1
+            else:
+                import_time.main()
@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+from db import GSI_PK_KEY, PK_KEY, ItemType
+from maintenance import CapacityRateLimiter, backfill_global_secondary, parallel_scan
+from tests.data.data_constants import ITEM_ID, TENANT_ID
+
+
+class TestMaintenance:
+    def test_backfill_global_secondary(self, dynamodb_table, tmp_path):
+        for index in range(5):
+            dynamodb_table.put_item(Item={PK_KEY: f"{TENANT_ID}#item#{index}", "item_id": str(index)})
+        dynamodb_table.put_item(Item={PK_KEY: f"other-tenant#item#{ITEM_ID}", "item_id": ITEM_ID})
+
+        stats = parallel_scan(
+            backfill_global_secondary(dynamodb_table),
+            total_segments=1,
+            checkpoint_path=str(tmp_path / "checkpoint.json"),
+            page_size=2,
+            table=dynamodb_table,
+        )
+        assert stats.items == {(TENANT_ID, ItemType.ITEM): 5, ("other-tenant", ItemType.ITEM): 1}
+        items = dynamodb_table.scan()["Items"]
+        assert all(item[GSI_PK_KEY] == item[PK_KEY].rsplit("#", 1)[0] for item in items)
+
+    def test_backfill_write_throttled(self, dynamodb_table):
+        dynamodb_table.put_item(Item={PK_KEY: f"{TENANT_ID}#item#{ITEM_ID}", "item_id": ITEM_ID})
+        throttled = ClientError({"Error": {"Code": "ThrottlingException"}}, "UpdateItem")
+        written = {"ConsumedCapacity": {"CapacityUnits": 1.0}}
+        with patch.object(dynamodb_table, "update_item", side_effect=[throttled, written]) as mock_update_item, patch(
+            "maintenance.time.sleep"
+        ), patch.object(CapacityRateLimiter, "throttled", autospec=True) as mock_throttled, patch(
+            "resilience.circuit_breaker"
+        ) as circuit_breaker:
+            stats = parallel_scan(backfill_global_secondary(dynamodb_table), total_segments=1, table=dynamodb_table)
+        # the write is sent again after the pause and its capacity is limited together with the scan
+        assert mock_update_item.call_count == 2
+        # the offline job never touches the circuit breaker of request handling
+        assert not circuit_breaker.method_calls
+        mock_throttled.assert_called_once()
+        assert stats.consumed_capacity >= 1.0
+
+    def test_resume_from_checkpoint(self, dynamodb_table, tmp_path):
+        for index in range(6):
+            dynamodb_table.put_item(Item={PK_KEY: f"{TENANT_ID}#item#{index}", "item_id": str(index)})
+        checkpoint_path = str(tmp_path / "checkpoint.json")
+        seen = []
+
+        def failing_callback(tenant_id, item_type, item):
+            if len(seen) == 3:
+                raise RuntimeError("crash")
+            seen.append(item[PK_KEY])
+
+        try:
+            parallel_scan(
+                failing_callback, total_segments=1, checkpoint_path=checkpoint_path, page_size=2, table=dynamodb_table
+            )
+        except RuntimeError:
+            pass
+
+        stats = parallel_scan(
+            lambda tenant_id, item_type, item: seen.append(item[PK_KEY]),
+            total_segments=1,
+            checkpoint_path=checkpoint_path,
+            page_size=2,
+            table=dynamodb_table,
+        )
+        # the first page is not read again, the interrupted page is processed again
+        assert sum(stats.items.values()) == 4
+        assert len(set(seen)) == 6
+
+    def test_rate_limiter_backs_off_on_throttling(self, dynamodb_table):
+        throttled = ClientError({"Error": {"Code": "ProvisionedThroughputExceededException"}}, "Scan")
+        with patch.object(dynamodb_table, "scan", side_effect=[throttled, {"Items": []}]), patch(
+            "maintenance.time.sleep"
+        ), patch.object(CapacityRateLimiter, "throttled", autospec=True) as mock_throttled:
+            parallel_scan(lambda *args: None, total_segments=1, table=dynamodb_table)
+        mock_throttled.assert_called_once()
+
+    def test_rate_limiter_waits_for_capacity(self):
+        limiter = CapacityRateLimiter(capacity_per_second=10, step=0)
+        with patch("maintenance.time.sleep") as mock_sleep:
+            limiter.consume(10)
+            limiter.consume(10)
+        assert mock_sleep.call_args[0][0] > 0.9
+        limiter.throttled()
+        assert limiter.rate == 5
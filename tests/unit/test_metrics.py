@@ -0,0 +1,79 @@
+import io
+import json
+from unittest.mock import patch
+
+from db import Db, ItemType, table_cache
+from metrics import (
+    DYNAMODB,
+    RESTRICTED_TABLE,
+    RESTRICTED_TABLE_CACHE_HITS,
+    RESTRICTED_TABLE_CACHE_MISSES,
+    MetricsRecorder,
+    instrument,
+)
+from tests.data.data_constants import ITEM_ID, TENANT_ID
+
+
+def _entries(output: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+class TestMetrics:
+    def test_emf_entry(self):
+        recorder = MetricsRecorder(output=io.StringIO())
+        for _ in range(2):
+            recorder.start("get_item")
+            with recorder.stage(DYNAMODB):
+                pass
+            with recorder.stage(DYNAMODB):
+                pass
+            recorder.add_capacity({"TableName": "table", "CapacityUnits": 0.5})
+            recorder.add_capacity([{"TableName": "table", "CapacityUnits": 1.0}])
+            recorder.flush()
+
+        cold, warm = _entries(recorder.output)
+        assert cold["operation"] == "get_item"
+        assert (cold["cold_start"], warm["cold_start"]) == ("true", "false")
+        assert cold["dynamodb_count"] == 2
+        assert cold["consumed_capacity"] == 1.5
+        definition = cold["_aws"]["CloudWatchMetrics"][0]
+        assert definition["Dimensions"] == [["operation", "cold_start"]]
+        assert {metric["Name"] for metric in definition["Metrics"]} == {
+            "duration",
+            "dynamodb",
+            "dynamodb_count",
+            "consumed_capacity",
+        }
+
+    def test_instrumented_database_calls(self, dynamodb_table):
+        output = io.StringIO()
+        table_cache.clear()
+        with patch("db.restricted_table", return_value=dynamodb_table), patch("metrics.metrics.output", output):
+
+            @instrument("test_operation")
+            def _handler(event, context):
+                Db.put_item(ItemType.ITEM, TENANT_ID, ITEM_ID, {"text": "Hello"})
+                return Db.get_item(ItemType.ITEM, TENANT_ID, ITEM_ID)
+
+            assert _handler({}, None) == {"text": "Hello"}
+        table_cache.clear()
+
+        (entry,) = _entries(output)
+        assert entry["operation"] == "test_operation"
+        assert entry[f"{DYNAMODB}_count"] == 2
+        assert entry[f"{RESTRICTED_TABLE}_count"] == 2
+        assert (entry[RESTRICTED_TABLE_CACHE_MISSES], entry[RESTRICTED_TABLE_CACHE_HITS]) == (1, 1)
+        assert entry["consumed_capacity"] > 0
+
+    def test_counters(self):
+        recorder = MetricsRecorder(output=io.StringIO())
+        recorder.start("get_item")
+        recorder.add_count("identity_cache_hits")
+        recorder.add_count("identity_cache_hits")
+        recorder.flush()
+
+        (entry,) = _entries(recorder.output)
+        assert entry["identity_cache_hits"] == 2
+        assert entry["consumed_capacity"] == 0
+        names = {metric["Name"] for metric in entry["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+        assert {"identity_cache_hits", "consumed_capacity"} <= names
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+import pytest
+
+from db import Db, table_cache
+from errors import TenantRateLimited
+from rate_limit import TABLE, TenantRateLimiter, parse_limits, rate_limit
+from service import Service
+from tests.data.data_constants import TENANT_ID
+
+OTHER_TENANT_ID = "other-tenant"
+
+
+class TestRateLimit:
+    def test_parse_limits(self):
+        assert parse_limits('{"a": {"rate": 10}, "b": {"rate": 2, "burst": 5}}') == {
+            "a": rate_limit(10, 10),
+            "b": rate_limit(2, 5),
+        }
+
+    def test_local_limit(self):
+        limiter = TenantRateLimiter(rate_limit(10, 3), {OTHER_TENANT_ID: rate_limit(0)})
+        with patch("rate_limit.time.monotonic", return_value=100.0) as monotonic:
+            limiter.acquire(TENANT_ID, 2)
+            limiter.acquire(TENANT_ID)
+            with pytest.raises(TenantRateLimited) as error:
+                limiter.acquire(TENANT_ID)
+            assert error.value.retry_after == pytest.approx(0.1)
+
+            # the tenant without limit is not affected by the other tenant's requests
+            for _ in range(10):
+                limiter.acquire(OTHER_TENANT_ID)
+
+            monotonic.return_value = 100.2
+            limiter.acquire(TENANT_ID)
+
+    def test_table_limit(self, dynamodb_table):
+        table_cache.clear()
+        limiters = [TenantRateLimiter(rate_limit(1, 3), {}, mode=TABLE) for _ in range(2)]
+        with patch("db.restricted_table", return_value=dynamodb_table), patch(
+            "rate_limit.time.time", return_value=30.0
+        ):
+            limiters[0].acquire(TENANT_ID, 2)
+            limiters[1].acquire(TENANT_ID)
+            with pytest.raises(TenantRateLimited) as error:
+                limiters[1].acquire(TENANT_ID)
+            assert error.value.retry_after == 3
+
+            # the full window is remembered, the table is not asked again until it ends
+            with patch.object(Db, "add_rate_limit_usage") as add_rate_limit_usage:
+                with pytest.raises(TenantRateLimited):
+                    limiters[1].acquire(TENANT_ID)
+            add_rate_limit_usage.assert_not_called()
+            limiters[1].acquire(OTHER_TENANT_ID, 3)
+        table_cache.clear()
+
+    def test_service_rejects_before_database(self):
+        limiter = TenantRateLimiter(rate_limit(1, 1), {})
+        with patch("service.tenant_rate_limiter", limiter), patch.object(Db, "get_stats") as get_stats:
+            service = Service(Db(), TENANT_ID, "user")
+            service.get_stats()
+            with pytest.raises(TenantRateLimited):
+                service.get_stats()
+        get_stats.assert_called_once()
@@ -0,0 +1,113 @@
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import boto3
+import pytest
+import yaml
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+
+import resilience
+from context import deadline
+from errors import DatabaseThrottled, DatabaseUnavailable
+from metrics import metrics
+from resilience import DB_RETRIES, DB_THROTTLED, CircuitBreaker, backoff, call_with_retries
+
+TEMPLATE = Path(__file__).parents[2] / "templates" / "template.yaml"
+
+
+class _TemplateLoader(yaml.SafeLoader):
+    """Loads CloudFormation templates, ignoring the values of intrinsic functions"""
+
+
+_TemplateLoader.add_multi_constructor("!", lambda loader, suffix, node: None)
+
+
+def _throttled() -> ClientError:
+    return ClientError({"Error": {"Code": "ProvisionedThroughputExceededException"}}, "GetItem")
+
+
+@pytest.fixture(autouse=True)
+def circuit_breaker():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=5)
+    with patch.object(resilience, "circuit_breaker", breaker), patch("resilience.time.sleep") as sleep:
+        metrics.start("test")
+        deadline.start(None)
+        yield breaker, sleep
+
+
+class TestResilience:
+    def test_retried_until_success(self, circuit_breaker):
+        _, sleep = circuit_breaker
+        send = MagicMock(side_effect=[_throttled(), _throttled(), {"Item": {}}])
+
+        assert call_with_retries(send) == {"Item": {}}
+        assert send.call_count == 3
+        assert sleep.call_count == 2
+        assert metrics._counters[DB_THROTTLED] == 2
+        assert metrics._counters[DB_RETRIES] == 2
+
+    def test_other_errors_not_retried(self):
+        send = MagicMock(side_effect=ClientError({"Error": {"Code": "ValidationException"}}, "GetItem"))
+
+        with pytest.raises(ClientError):
+            call_with_retries(send)
+        send.assert_called_once()
+
+    def test_no_retry_past_deadline(self):
+        send = MagicMock(side_effect=_throttled())
+
+        deadline.start(MagicMock(get_remaining_time_in_millis=MagicMock(return_value=100)))
+        with pytest.raises(DatabaseThrottled):
+            call_with_retries(send)
+        send.assert_called_once()
+
+    def test_backoff_stops_at_deadline(self, circuit_breaker):
+        _, sleep = circuit_breaker
+        assert backoff(0)
+        sleep.assert_called_once()
+
+        deadline.start(MagicMock(get_remaining_time_in_millis=MagicMock(return_value=100)))
+        assert not backoff(0)
+        sleep.assert_called_once()
+
+    def test_sdk_retries_disabled(self, monkeypatch):
+        with open(TEMPLATE, encoding="utf-8") as template_file:
+            template = yaml.load(template_file, _TemplateLoader)
+        for name, value in template["Globals"]["Function"]["Environment"]["Variables"].items():
+            if name.startswith("AWS_"):
+                monkeypatch.setenv(name, value)
+        client = boto3.session.Session(region_name="us-east-1").client("dynamodb")
+        sent = []
+
+        def throttle(request, **kwargs):
+            sent.append(request)
+            body = b'{"__type":"ProvisionedThroughputExceededException","message":"throttled"}'
+            return AWSResponse(request.url, 400, {}, MagicMock(stream=MagicMock(return_value=[body])))
+
+        client.meta.events.register("before-send.dynamodb", throttle)
+        with patch("botocore.endpoint.time.sleep") as sleep, pytest.raises(ClientError) as error:
+            client.get_item(TableName="table", Key={"pk": {"S": "key"}})
+        # the request is sent once, throttling is left to call_with_retries
+        assert len(sent) == 1
+        sleep.assert_not_called()
+        assert error.value.response["Error"]["Code"] == "ProvisionedThroughputExceededException"
+
+    def test_circuit_breaker(self, circuit_breaker):
+        breaker, _ = circuit_breaker
+        send = MagicMock(side_effect=_throttled())
+
+        for _ in range(breaker.threshold):
+            with pytest.raises(DatabaseThrottled):
+                call_with_retries(send)
+        attempts = send.call_count
+        with pytest.raises(DatabaseUnavailable) as error:
+            call_with_retries(send)
+        assert send.call_count == attempts
+        assert 0 < error.value.retry_after <= breaker.reset_timeout
+
+        # after the reset timeout a single trial request closes the breaker again
+        breaker.opened_at -= breaker.reset_timeout
+        send = MagicMock(side_effect=lambda: {"open": breaker.allow()})
+        assert call_with_retries(send) == {"open": False}
+        assert breaker.stats() == {"open": False, "failures": 0}
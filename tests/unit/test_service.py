@@ -0,0 +1,127 @@
+import datetime
+import io
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from api_response import item_etag
+from cache import InMemoryBackend, ItemCache
+from db import Db, ItemType, ItemUpdate, table_cache
+from errors import ItemVersionMismatch
+from ids import TimeOrderedIds
+from service import Service
+from tests.data.data_constants import TENANT_ID
+
+
+@pytest.fixture()
+def service(dynamodb_table):
+    table_cache.clear()
+    with patch("db.restricted_table", return_value=dynamodb_table):
+        yield Service(Db(), TENANT_ID, "user")
+    table_cache.clear()
+
+
+class TestService:
+    def test_list_items_created_range(self, service):
+        start = datetime.datetime(2024, 1, 1)
+        legacy_id = "00000000-0000-4000-8000-000000000000"
+        service.database.put_item(ItemType.ITEM, TENANT_ID, legacy_id, {"text": "legacy"})
+        with patch("ids.time_ordered_ids", TimeOrderedIds()), patch("ids.time.time_ns") as time_ns:
+            for second in range(5):
+                created_at = start + datetime.timedelta(seconds=second)
+                time_ns.return_value = int(created_at.replace(tzinfo=datetime.timezone.utc).timestamp()) * 10**9
+                service.create_item({"text": str(second)})
+
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = service.list_items(
+                limit=2,
+                cursor=cursor,
+                created_after=start + datetime.timedelta(seconds=1),
+                created_before=start + datetime.timedelta(seconds=4),
+            )
+            pages.append([item["text"] for item in page])
+            if cursor is None:
+                break
+        assert pages == [["1", "2"], ["3"]]
+
+        items, _ = service.list_items(limit=10, created_before=start + datetime.timedelta(seconds=1))
+        assert [item["text"] for item in items] == ["0"]
+        items, _ = service.list_items(limit=10)
+        assert [item["text"] for item in items] == ["legacy", "0", "1", "2", "3", "4"]
+
+    def test_get_item_etag_revalidates_cache(self, service):
+        service.cache = ItemCache(InMemoryBackend(10), ttl=60)
+        item = service.create_item({"success": True, "text": "Hello"})
+        assert service.get_item_etag(item["id"]) == '"v1"'
+
+        # another container changes the item, the cached copy of this container is not current anymore
+        update = ItemUpdate(changes={"text": "Changed"}, modified_by="other", modified_at="2024-01-01T00:00:00")
+        service.database.update_item(ItemType.ITEM, TENANT_ID, item["id"], update)
+        assert service.get_item_etag(item["id"]) == '"v2"'
+        assert service.get_item(item["id"])["text"] == "Changed"
+
+    def test_get_item_with_etag_fields(self, service):
+        legacy_id = "00000000-0000-4000-8000-000000000000"
+        service.database.put_item(ItemType.ITEM, TENANT_ID, legacy_id, {"success": True, "text": "legacy"})
+        item, etag = service.get_item_with_etag(legacy_id, fields=["text"])
+        assert item == {"text": "legacy"}
+        assert etag == service.get_item_etag(legacy_id) == item_etag(service.get_item(legacy_id))
+
+    def test_update_item_stored_before_versions(self, service):
+        legacy_id = "00000000-0000-4000-8000-000000000000"
+        item = {"success": True, "text": "legacy", "modification_info": {"created_by": "user"}}
+        service.database.put_item(ItemType.ITEM, TENANT_ID, legacy_id, item)
+        etag = service.get_item_etag(legacy_id)
+
+        with pytest.raises(ItemVersionMismatch):
+            service.update_item(legacy_id, {"text": "Changed"}, if_match='"0123456789abcdef0123456789abcdef"')
+        # If-Match uses the strong comparison, the weak form of the current ETag does not match
+        with pytest.raises(ItemVersionMismatch):
+            service.update_item(legacy_id, {"text": "Changed"}, if_match=f"W/{etag}")
+        changed = service.update_item(legacy_id, {"text": "Changed"}, if_match=etag)
+        assert changed["text"] == "Changed"
+        assert item_etag(changed) == '"v1"'
+        # the ETag the item had before the update is stale
+        with pytest.raises(ItemVersionMismatch):
+            service.update_item(legacy_id, {"text": "Again"}, if_match=etag)
+
+    def test_export_items(self, service):
+        items = {f"{index:08d}-0000-0000-0000-000000000000": {"number": index} for index in range(7)}
+        service.database.put_items(ItemType.ITEM, TENANT_ID, items)
+
+        output = io.StringIO()
+        assert service.export_items(output, page_size=3) is None
+        assert [json.loads(line) for line in output.getvalue().splitlines()] == list(items.values())
+
+    def test_export_items_resume(self, service):
+        items = {f"{index:08d}-0000-0000-0000-000000000000": {"number": index} for index in range(7)}
+        service.database.put_items(ItemType.ITEM, TENANT_ID, items)
+
+        output = io.StringIO()
+        cursor = None
+        for _ in items:
+            cursor = service.export_items(output, page_size=2, cursor=cursor, deadline=time.monotonic())
+            assert cursor is not None
+        assert service.export_items(output, page_size=2, cursor=cursor) is None
+        assert [json.loads(line) for line in output.getvalue().splitlines()] == list(items.values())
+
+    def test_get_item_etag_reads_version_only(self, service):
+        item = service.create_item({"success": True, "text": "Hello"})
+
+        with patch.object(Service, "get_item") as mock_get_item:
+            assert service.get_item_etag(item["id"]) == '"v1"'
+        mock_get_item.assert_not_called()
+
+    def test_get_item_etag_without_version(self, service):
+        service.database.put_item(ItemType.ITEM, TENANT_ID, "legacy", {"success": True, "text": "Hello"})
+
+        assert service.get_item_etag("legacy") == item_etag({"success": True, "text": "Hello"})
+
+    def test_get_item_fields(self, service):
+        item = service.create_item({"success": True, "text": "Hello " * 100})
+
+        assert service.get_item(item["id"], fields=["success"]) == {"success": True, "version": 1}
@@ -0,0 +1,50 @@
+from functools import wraps
+from unittest.mock import patch
+
+from db import Db, ItemType, table_cache
+from models import StreamModel
+from tests.data.data_constants import TENANT_ID
+
+
+def mock_decorator(*args, **kwargs):
+    """Decorate by doing nothing."""
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
+
+
+# PATCH THE DECORATOR HERE
+patch("evertz_io_observability.decorators.start_span", mock_decorator).start()
+
+import stream_handler
+
+
+class TestStreamHandler:
+    def test_aggregate(self, stream_event):
+        event, _ = stream_event
+
+        changes = stream_handler.aggregate(StreamModel(**event).Records)
+
+        assert set(changes) == {TENANT_ID, "OTHER_TENANT"}
+        assert changes[TENANT_ID].counts == {ItemType.ITEM: 1}
+        assert changes[TENANT_ID].last_modified == {"at": "2024-01-01T00:00:03", "by": "USER_ID", "item_id": "2"}
+        assert changes["OTHER_TENANT"].counts == {ItemType.ITEM: 1}
+
+    def test_process_stream(self, dynamodb_table, stream_event):
+        event, context = stream_event
+
+        table_cache.clear()
+        with patch("db.restricted_table", return_value=dynamodb_table):
+            stream_handler.process_stream(event, context)
+            stream_handler.process_stream(event, context)
+            stats = Db.get_stats(TENANT_ID)
+        table_cache.clear()
+
+        assert stats["counts"] == {"item": 2}
+        assert stats["last_modified"]["item_id"] == "2"